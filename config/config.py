@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 import os
 
 class Settings(BaseSettings):
@@ -17,6 +17,10 @@ class Settings(BaseSettings):
     
     # File Upload
     MAX_FILE_SIZE: int = 10485760  # 10MB
+    MAX_VIDEO_FILE_SIZE: int = 104857600  # 100MB
+    BLOB_GC_HOUR: int = 4
+    BLOB_GC_GRACE_HOURS: int = 24  # unreferenced blobs are kept this long before deletion
+    RESUMABLE_UPLOAD_EXPIRY_HOURS: int = 24  # incomplete uploads idle this long are deleted
     UPLOAD_DIR: str = "app/static/uploads"
     ALLOWED_EXTENSIONS: str = "pdf,doc,docx,jpg,jpeg,png,mp4,avi,mov"
     
@@ -24,6 +28,45 @@ class Settings(BaseSettings):
     MESSAGE_RETENTION_DAYS: int = 30
     CHAT_CLEANUP_HOUR: int = 2
     
+    # Analytics
+    ANALYTICS_ROLLUP_HOUR: int = 3
+    ATTENDANCE_ALERT_THRESHOLD: float = 75.0
+    ATTENDANCE_ALERT_MIN_SESSIONS: int = 5
+    
+    # Attendance tap ingestion (RFID/biometric gate readers)
+    ATTENDANCE_TAP_TOKEN: Optional[str] = None  # ingestion is disabled until set
+    ATTENDANCE_TAP_FLUSH_SECONDS: int = 10
+    ATTENDANCE_TAP_BUFFER_SIZE: int = 50000
+    ATTENDANCE_TAP_MAX_BATCH_LINES: int = 5000  # per POST; larger batches get 413
+    ATTENDANCE_TAP_MAX_BATCH_BYTES: int = 1024 * 1024
+    ATTENDANCE_TAP_FLUSH_CHUNK: int = 1000
+    ATTENDANCE_TAP_MAP_REFRESH_SECONDS: int = 300
+    ATTENDANCE_TAP_LATE_AFTER: str = "08:30"  # cutoff for courses without a schedule
+    ATTENDANCE_TAP_GRACE_MINUTES: int = 10
+    
+    # Fees
+    FEE_APPLY_CHUNK_SIZE: int = 2000  # students per transaction when applying a fee structure
+    FEE_RECONCILE_NAME_CUTOFF: float = 0.9  # name similarity needed to post a statement line without a reference
+    FEE_ANALYTICS_CACHE_SECONDS: int = 600  # upper bound on staleness from writes in other worker processes
+    
+    # Test answer autosave
+    TEST_AUTOSAVE_FLUSH_SECONDS: int = 5
+    TEST_AUTOSAVE_MAX_PENDING: int = 20000  # attempts with unflushed answers
+    
+    # Test grading queue
+    TEST_GRADING_BATCH_SIZE: int = 500
+    TEST_GRADING_WORKERS: int = 4
+    TEST_GRADING_POLL_SECONDS: int = 30  # picks up rows queued by other processes
+    
+    # Deadline scheduler
+    DEADLINE_HORIZON_HOURS: int = 24  # deadlines held in memory ahead of now
+    DEADLINE_CATCHUP_HOURS: int = 24  # deadlines missed while the app was down
+    DEADLINE_RESYNC_SECONDS: int = 60  # reload edits from other workers / retry the scheduler lock
+    
+    # Assignment similarity (near-duplicate detection)
+    SIMILARITY_THRESHOLD: float = 0.5  # estimated Jaccard similarity reported as a near-duplicate
+    SIMILARITY_INDEX_BATCH_SIZE: int = 500
+    
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:8000,http://127.0.0.1:8000"
     
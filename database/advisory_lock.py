@@ -0,0 +1,77 @@
+import fcntl
+import os
+import tempfile
+import zlib
+from sqlalchemy import text
+from database.database import engine
+
+class AdvisoryLock:
+    """Non-blocking lock that lets one process out of many own a job.
+
+    On PostgreSQL this is a session advisory lock held on a dedicated
+    autocommit connection, so it covers workers on every host and is freed
+    by the server if the process dies. Other databases fall back to an
+    flock on a file in the temp directory, which covers the workers of one
+    host.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._key = zlib.crc32(f"{engine.url}:{name}".encode())
+        self._connection = None
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._connection is not None or self._file is not None
+
+    def try_acquire(self) -> bool:
+        if self.held:
+            return True
+
+        if engine.dialect.name == "postgresql":
+            connection = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            try:
+                acquired = connection.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": self._key}
+                ).scalar()
+            except Exception:
+                connection.close()
+                raise
+            if acquired:
+                self._connection = connection
+            else:
+                connection.close()
+            return bool(acquired)
+
+        lock_file = open(os.path.join(tempfile.gettempdir(), f"{self.name}-{self._key}.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def check(self) -> bool:
+        """Whether the lock is still held; a dropped connection loses it"""
+        if self._connection is not None:
+            try:
+                self._connection.execute(text("SELECT 1"))
+            except Exception:
+                self.release()
+                return False
+        return self.held
+
+    def release(self):
+        if self._connection is not None:
+            try:
+                self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self._key})
+            except Exception:
+                pass  # closing the session frees it anyway
+            finally:
+                self._connection.close()
+                self._connection = None
+        if self._file is not None:
+            self._file.close()  # closing the descriptor drops the flock
+            self._file = None
@@ -0,0 +1,19 @@
+from sqlalchemy.orm import Session
+
+def dialect_insert(db: Session, model):
+    """Return an INSERT construct that supports ON CONFLICT for the bound database.
+
+    PostgreSQL and SQLite both expose ``on_conflict_do_update`` /
+    ``on_conflict_do_nothing`` with the same signature, so callers can build
+    upserts once and run them against either backend.
+    """
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upserts are not supported for the '{dialect}' dialect")
+
+    return insert(model)
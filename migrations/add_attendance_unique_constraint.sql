@@ -0,0 +1,13 @@
+-- Migration: One attendance row per student, course and date
+-- Date: 2026-10-18
+
+-- Remove duplicates, keeping the most recently inserted row
+DELETE FROM attendance a
+USING attendance b
+WHERE a.student_id = b.student_id
+  AND a.course_id = b.course_id
+  AND a.date = b.date
+  AND a.id < b.id;
+
+ALTER TABLE attendance
+    ADD CONSTRAINT uq_attendance_student_course_date UNIQUE (student_id, course_id, date);
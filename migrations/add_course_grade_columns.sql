@@ -0,0 +1,9 @@
+-- Migration: Add weighted course grade columns to student_course_averages
+-- Date: 2026-10-18
+-- The grade type totals and grading policy tables are created by create_all;
+-- run the academic summary refresh job afterwards to populate the new columns.
+
+ALTER TABLE student_course_averages ADD COLUMN IF NOT EXISTS course_percentage FLOAT NOT NULL DEFAULT 0;
+ALTER TABLE student_course_averages ADD COLUMN IF NOT EXISTS letter_grade VARCHAR(5);
+
+CREATE INDEX IF NOT EXISTS ix_course_average_course_grade ON student_course_averages (course_id, course_percentage);
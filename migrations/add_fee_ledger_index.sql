@@ -0,0 +1,4 @@
+-- Migration: Composite index for keyset pagination of the fee ledger
+-- Date: 2026-10-18
+
+CREATE INDEX IF NOT EXISTS ix_fee_records_due_date_id ON fee_records (due_date, id);
@@ -0,0 +1,15 @@
+-- Migration: One fee record per student, fee structure and fee type
+-- Date: 2026-10-19
+
+-- Remove duplicates from concurrent applications, keeping the row with
+-- the most paid (the oldest of equals)
+DELETE FROM fee_records a
+USING fee_records b
+WHERE a.student_id = b.student_id
+  AND a.fee_structure_id = b.fee_structure_id
+  AND a.fee_type = b.fee_type
+  AND (COALESCE(b.paid_amount, 0) > COALESCE(a.paid_amount, 0)
+       OR (COALESCE(b.paid_amount, 0) = COALESCE(a.paid_amount, 0) AND b.id < a.id));
+
+ALTER TABLE fee_records
+    ADD CONSTRAINT uq_fee_records_student_structure_type UNIQUE (student_id, fee_structure_id, fee_type);
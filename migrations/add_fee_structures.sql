@@ -0,0 +1,6 @@
+-- Migration: Link fee records to the fee structure that generated them
+-- Date: 2026-10-18
+-- The fee_structures table itself is created by create_all on startup.
+
+ALTER TABLE fee_records ADD COLUMN IF NOT EXISTS fee_structure_id INTEGER REFERENCES fee_structures(id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS ix_fee_records_fee_structure_id ON fee_records (fee_structure_id);
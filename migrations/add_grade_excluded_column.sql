@@ -0,0 +1,4 @@
+-- Migration: Add exclusion flag to grades (drop_lowest marks grades instead of deleting them)
+-- Date: 2026-10-19
+
+ALTER TABLE grades ADD COLUMN IF NOT EXISTS excluded BOOLEAN NOT NULL DEFAULT FALSE;
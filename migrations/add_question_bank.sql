@@ -0,0 +1,6 @@
+-- Migration: Question bank and per-student drawn papers
+-- Date: 2026-10-19
+-- The bank_questions and student_papers tables are created by create_all on startup.
+
+ALTER TABLE tests ADD COLUMN IF NOT EXISTS sampling_rules JSON;
+ALTER TABLE tests ADD COLUMN IF NOT EXISTS paper_seed INTEGER;
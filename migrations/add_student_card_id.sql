@@ -0,0 +1,5 @@
+-- Migration: Add RFID/biometric card id to students for gate tap ingestion
+-- Date: 2026-10-18
+
+ALTER TABLE students ADD COLUMN IF NOT EXISTS card_id VARCHAR(64);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_students_card_id ON students (card_id);
@@ -0,0 +1,4 @@
+-- Migration: Partial index over submitted, unscored test submissions (grading queue)
+-- Date: 2026-10-18
+
+CREATE INDEX IF NOT EXISTS ix_test_submissions_grading_queue ON test_submissions (submitted_at) WHERE score IS NULL;
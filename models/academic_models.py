@@ -0,0 +1,81 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, UniqueConstraint, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from database.database import Base
+
+class StudentCourseAverage(Base):
+    """Running score totals per student per course, maintained on grade writes"""
+    __tablename__ = "student_course_averages"
+    __table_args__ = (
+        UniqueConstraint("student_id", "course_id", name="uq_course_average_student_course"),
+        Index("ix_course_average_course_percentage", "course_id", "average_percentage"),
+        Index("ix_course_average_course_grade", "course_id", "course_percentage"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    max_score_sum = Column(Float, nullable=False, default=0.0)
+    grade_count = Column(Integer, nullable=False, default=0)
+    average_percentage = Column(Float, nullable=False, default=0.0)
+    course_percentage = Column(Float, nullable=False, default=0.0)  # weighted by the course's grading policy
+    letter_grade = Column(String(5))
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    student = relationship("Student")
+    course = relationship("Course")
+
+class StudentGradeTypeTotal(Base):
+    """Running score totals per student, course and grade type (midterm, quiz, ...)"""
+    __tablename__ = "student_grade_type_totals"
+    __table_args__ = (
+        UniqueConstraint("student_id", "course_id", "grade_type", name="uq_grade_type_total_student_course_type"),
+        Index("ix_grade_type_total_course", "course_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False)
+    grade_type = Column(String(50), nullable=False, default="")  # normalized, see utils.grading.grade_type_key
+    score_sum = Column(Float, nullable=False, default=0.0)
+    max_score_sum = Column(Float, nullable=False, default=0.0)
+    grade_count = Column(Integer, nullable=False, default=0)
+
+class CourseGradingPolicy(Base):
+    """Weight of one grade type in a course's final grade; a course without
+    rows falls back to the plain score-weighted average"""
+    __tablename__ = "course_grading_policies"
+    __table_args__ = (
+        UniqueConstraint("course_id", "grade_type", name="uq_grading_policy_course_type"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False, index=True)
+    grade_type = Column(String(50), nullable=False)
+    weight = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class StudentAcademicSummary(Base):
+    """Credit-weighted GPA per student; grade_level/section are copied from
+    the student so ranking and top-k queries are served by the indexes below"""
+    __tablename__ = "student_academic_summaries"
+    __table_args__ = (
+        Index("ix_academic_summary_gpa", "weighted_gpa"),
+        Index("ix_academic_summary_grade_gpa", "grade_level", "weighted_gpa"),
+        Index("ix_academic_summary_section_gpa", "grade_level", "section", "weighted_gpa"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), unique=True, nullable=False)
+    grade_level = Column(String(20))
+    section = Column(String(10))
+    weighted_gpa = Column(Float, nullable=False, default=0.0)
+    average_percentage = Column(Float, nullable=False, default=0.0)
+    total_credits = Column(Float, nullable=False, default=0.0)
+    course_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    student = relationship("Student")
@@ -0,0 +1,53 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Date, UniqueConstraint
+from datetime import datetime
+from database.database import Base
+
+class GradeDailyRollup(Base):
+    """Letter-grade buckets and score totals per course per day"""
+    __tablename__ = "grade_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("course_id", "day", name="uq_grade_rollup_course_day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False, index=True)
+    day = Column(Date, nullable=False, index=True)
+    count_a = Column(Integer, nullable=False, default=0)
+    count_b = Column(Integer, nullable=False, default=0)
+    count_c = Column(Integer, nullable=False, default=0)
+    count_d = Column(Integer, nullable=False, default=0)
+    count_f = Column(Integer, nullable=False, default=0)
+    grade_count = Column(Integer, nullable=False, default=0)
+    percentage_sum = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AttendanceDailyRollup(Base):
+    """Attendance status counts per grade level per day"""
+    __tablename__ = "attendance_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("grade_level", "day", name="uq_attendance_rollup_grade_day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    grade_level = Column(String(20), nullable=False, default="")  # "" when student has no grade level
+    day = Column(Date, nullable=False, index=True)
+    present_count = Column(Integer, nullable=False, default=0)
+    absent_count = Column(Integer, nullable=False, default=0)
+    late_count = Column(Integer, nullable=False, default=0)
+    total_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DepartmentMonthlyRollup(Base):
+    """Score totals per teaching department per calendar month"""
+    __tablename__ = "department_monthly_rollups"
+    __table_args__ = (
+        UniqueConstraint("department", "year", "month", name="uq_department_rollup_month"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    department = Column(String(100), nullable=False)  # "General" when course has no teacher/department
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    grade_count = Column(Integer, nullable=False, default=0)
+    percentage_sum = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
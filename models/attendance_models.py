@@ -0,0 +1,84 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Float, UniqueConstraint, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from database.database import Base
+
+class StudentCourseAttendance(Base):
+    """Running attendance counters per student per course, maintained on attendance writes"""
+    __tablename__ = "student_course_attendance"
+    __table_args__ = (
+        UniqueConstraint("student_id", "course_id", name="uq_course_attendance_student_course"),
+        Index("ix_course_attendance_course_percentage", "course_id", "attendance_percentage"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False)
+    present_count = Column(Integer, nullable=False, default=0)
+    absent_count = Column(Integer, nullable=False, default=0)
+    late_count = Column(Integer, nullable=False, default=0)
+    total_count = Column(Integer, nullable=False, default=0)
+    attendance_percentage = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    student = relationship("Student")
+    course = relationship("Course")
+
+class StudentAttendanceSummary(Base):
+    """Attendance counters per student across all courses; grade_level is
+    copied from the student so grade-wide range scans use the index below"""
+    __tablename__ = "student_attendance_summaries"
+    __table_args__ = (
+        Index("ix_attendance_summary_percentage", "attendance_percentage"),
+        Index("ix_attendance_summary_grade_percentage", "grade_level", "attendance_percentage"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), unique=True, nullable=False)
+    grade_level = Column(String(20))
+    present_count = Column(Integer, nullable=False, default=0)
+    absent_count = Column(Integer, nullable=False, default=0)
+    late_count = Column(Integer, nullable=False, default=0)
+    total_count = Column(Integer, nullable=False, default=0)
+    attendance_percentage = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    student = relationship("Student")
+
+class AttendanceAlert(Base):
+    """Emitted when a student's attendance crosses the alert threshold;
+    course_id is NULL for the student's overall attendance"""
+    __tablename__ = "attendance_alerts"
+    __table_args__ = (
+        Index("ix_attendance_alert_course_created", "course_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"))
+    event = Column(String(20), nullable=False)  # below_threshold, recovered
+    threshold = Column(Float, nullable=False)
+    attendance_percentage = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    # Relationships
+    student = relationship("Student")
+    course = relationship("Course")
+
+class AttendanceMonthBitmap(Base):
+    """One month of a student's attendance in a course, 2 bits per day
+    (see utils.attendance_bits); maintained alongside the attendance table"""
+    __tablename__ = "attendance_month_bitmaps"
+    __table_args__ = (
+        UniqueConstraint("student_id", "course_id", "year", "month", name="uq_attendance_bitmap_student_course_month"),
+        Index("ix_attendance_bitmap_month", "year", "month"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    status_bits = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from datetime import datetime
+from database.database import Base
+
+class StoredBlob(Base):
+    """One stored upload, keyed by content hash and shared by every row whose
+    file_path points at it (notes, videos, assignments, submissions, chat)"""
+    __tablename__ = "blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, nullable=False)
+    path = Column(String(500), unique=True, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    mime_type = Column(String(100))
+    ref_count = Column(Integer, nullable=False, default=0)
+    released_at = Column(DateTime, index=True)  # when ref_count last dropped to 0
+    created_at = Column(DateTime, default=datetime.utcnow)
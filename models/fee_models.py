@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey
+from datetime import datetime
+from database.database import Base
+
+class ReconciledStatementLine(Base):
+    """A bank statement line already posted by reconciliation. The unique
+    line_key stops a re-imported statement from posting the line again."""
+    __tablename__ = "reconciled_statement_lines"
+
+    id = Column(Integer, primary_key=True, index=True)
+    line_key = Column(String(64), unique=True, nullable=False)
+    fee_id = Column(Integer, ForeignKey("fee_records.id", ondelete="SET NULL"), index=True)
+    amount = Column(Float, nullable=False)
+    payment_date = Column(Date)
+    reference = Column(String(255))
+    posted_at = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,4 @@
-﻿from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Date, Time, Enum as SQLEnum
+﻿from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Date, Time, Enum as SQLEnum, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -45,6 +45,7 @@ class Student(Base):
     enrollment_date = Column(Date, default=datetime.utcnow)
     grade_level = Column(String(20))
     section = Column(String(10))
+    card_id = Column(String(64), unique=True, index=True)  # RFID/biometric reader id
     
     # Relationships
     user = relationship("User", back_populates="student_profile")
@@ -179,6 +180,9 @@ class AssignmentSubmission(Base):
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        UniqueConstraint("student_id", "course_id", "date", name="uq_attendance_student_course_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
@@ -203,16 +207,49 @@ class Grade(Base):
     grade = Column(String(5))  # A, B+, B, etc.
     remarks = Column(Text)
     date = Column(Date, default=datetime.utcnow)
+    excluded = Column(Boolean, default=False, nullable=False)  # dropped by drop_lowest; kept but not counted
     
     # Relationships
     student = relationship("Student", back_populates="grades")
     course = relationship("Course", back_populates="grades")
 
+class FeeStructure(Base):
+    __tablename__ = "fee_structures"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    grade_level = Column(String(20), nullable=False)
+    academic_year = Column(String(20))
+    tuition_fee = Column(Float, default=0.0)
+    registration_fee = Column(Float, default=0.0)
+    library_fee = Column(Float, default=0.0)
+    sports_fee = Column(Float, default=0.0)
+    lab_fee = Column(Float, default=0.0)
+    activity_fee = Column(Float, default=0.0)
+    other_charges = Column(Float, default=0.0)
+    total_amount = Column(Float, default=0.0)
+    status = Column(String(20), default="active")  # active, inactive
+    description = Column(Text)
+    due_date = Column(Date)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Background application to the grade's students
+    application_status = Column(String(20), default="queued")  # queued, running, completed, failed
+    students_total = Column(Integer, default=0)
+    students_applied = Column(Integer, default=0)
+    records_created = Column(Integer, default=0)
+    application_error = Column(Text)
+    applied_at = Column(DateTime)
+
 class FeeRecord(Base):
     __tablename__ = "fee_records"
+    __table_args__ = (
+        Index("ix_fee_records_due_date_id", "due_date", "id"),  # ledger keyset pagination
+        UniqueConstraint("student_id", "fee_structure_id", "fee_type", name="uq_fee_records_student_structure_type"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    fee_structure_id = Column(Integer, ForeignKey("fee_structures.id", ondelete="SET NULL"), index=True)
     fee_type = Column(String(100), nullable=False)  # tuition, library, sports, etc.
     amount = Column(Float, nullable=False)
     due_date = Column(Date, nullable=False)
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, LargeBinary, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from database.database import Base
+
+class SubmissionFingerprint(Base):
+    """MinHash signature of an assignment submission's text (see
+    utils.minhash) and the SHA-256 of its uploaded file, written at submit time"""
+    __tablename__ = "submission_fingerprints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    submission_id = Column(Integer, ForeignKey("assignment_submissions.id", ondelete="CASCADE"), nullable=False, unique=True)
+    assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="CASCADE"), nullable=False, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False, index=True)
+    signature = Column(LargeBinary)  # NUM_PERM little-endian uint32, NULL when there is no text
+    shingle_count = Column(Integer, nullable=False, default=0)
+    file_sha256 = Column(String(64), index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    submission = relationship("AssignmentSubmission")
+
+class SubmissionLSHBand(Base):
+    """One LSH bucket of a fingerprint; submissions sharing a (band, bucket)
+    are near-duplicate candidates"""
+    __tablename__ = "submission_lsh_bands"
+    __table_args__ = (
+        Index("ix_submission_lsh_assignment_bucket", "assignment_id", "band", "bucket"),
+        Index("ix_submission_lsh_course_bucket", "course_id", "band", "bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    submission_id = Column(Integer, ForeignKey("assignment_submissions.id", ondelete="CASCADE"), nullable=False, index=True)
+    assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="CASCADE"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False)
+    band = Column(Integer, nullable=False)
+    bucket = Column(BigInteger, nullable=False)
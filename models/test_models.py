@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, JSON, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, JSON, Index, UniqueConstraint, Enum as SQLEnum, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -24,6 +24,9 @@ class Test(Base):
     duration = Column(Integer, nullable=False)  # in minutes
     total_points = Column(Float, default=0.0)
     is_active = Column(Boolean, default=True)
+    # Question-bank tests: [{"count", "tags", "difficulty"}, ...] drawn per student
+    sampling_rules = Column(JSON)
+    paper_seed = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -50,6 +53,13 @@ class TestQuestion(Base):
 
 class TestSubmission(Base):
     __tablename__ = "test_submissions"
+    __table_args__ = (
+        # Submitted but not yet scored rows are the grading queue
+        Index(
+            "ix_test_submissions_grading_queue", "submitted_at",
+            sqlite_where=text("score IS NULL"), postgresql_where=text("score IS NULL")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     test_id = Column(Integer, ForeignKey("tests.id", ondelete="CASCADE"), nullable=False)
@@ -67,3 +77,45 @@ class TestSubmission(Base):
     # Relationships
     test = relationship("Test", back_populates="submissions")
     student = relationship("Student", back_populates="test_submissions")
+
+class QuestionDifficulty(str, enum.Enum):
+    EASY = "easy"
+    MEDIUM = "medium"
+    HARD = "hard"
+
+class BankQuestion(Base):
+    """Reusable question in a course's question bank"""
+    __tablename__ = "bank_questions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False, index=True)
+    teacher_id = Column(Integer, ForeignKey("teachers.id", ondelete="SET NULL"))
+    question_text = Column(Text, nullable=False)
+    question_type = Column(SQLEnum(QuestionType), nullable=False)
+    options = Column(JSON)
+    correct_answer = Column(Text)
+    points = Column(Float, default=1.0)
+    difficulty = Column(SQLEnum(QuestionDifficulty), default=QuestionDifficulty.MEDIUM, nullable=False)
+    tags = Column(JSON, default=list)
+    is_active = Column(Boolean, default=True)  # retired questions stay for papers that used them
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class StudentPaper(Base):
+    """A student's drawn paper for a question-bank test.
+
+    question_ids are bank question ids in display order; option_orders[i]
+    is the displayed-to-original option permutation of question i (null
+    for non-MCQ questions).
+    """
+    __tablename__ = "student_papers"
+    __table_args__ = (
+        UniqueConstraint("test_id", "student_id", name="uq_student_papers_test_student"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    test_id = Column(Integer, ForeignKey("tests.id", ondelete="CASCADE"), nullable=False)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    question_ids = Column(JSON, nullable=False)
+    option_orders = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,398 @@
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, case, insert, literal, update
+from typing import List, Optional, Dict, Tuple, Iterable
+from datetime import datetime
+from collections import defaultdict
+import numpy as np
+from database.upsert import dialect_insert
+from models.models import Grade, Student, Course
+from models.academic_models import (
+    StudentCourseAverage, StudentAcademicSummary, StudentGradeTypeTotal, CourseGradingPolicy
+)
+from utils.grading import percentage_to_points, percentages_to_letters, grade_type_key
+
+REFRESH_CHUNK_SIZE = 500
+
+class AcademicSummaryRepository:
+    """Maintains per-student course averages, weighted GPA and rank indexes.
+
+    Course averages are kept as additive score/max-score totals, overall and
+    per grade type, so a grade write only touches the affected (student,
+    course) rows. The course grade is then recomputed for that pair from its
+    per-type totals and the course's grading policy, and the student's GPA
+    from their handful of course grades. Ranks are not
+    stored: they are answered with an indexed count of students with a
+    higher GPA in the same scope.
+    """
+
+    @staticmethod
+    def apply_grade_changes(db: Session, changes: List[Tuple[Optional[Dict], Optional[Dict]]]):
+        """Fold grade (old, new) snapshots into course averages and GPA.
+
+        Does not commit; the caller's transaction owns the write.
+        """
+        deltas = defaultdict(lambda: [0.0, 0.0, 0])
+        type_deltas = defaultdict(lambda: [0.0, 0.0, 0])
+        for old, new in changes:
+            for snapshot, sign in ((old, -1), (new, 1)):
+                if not snapshot:
+                    continue
+                key = (snapshot['student_id'], snapshot['course_id'])
+                type_key = key + (grade_type_key(snapshot.get('grade_type')),)
+                for delta in (deltas[key], type_deltas[type_key]):
+                    delta[0] += sign * snapshot['score']
+                    delta[1] += sign * snapshot['max_score']
+                    delta[2] += sign
+
+        rows = [{
+            'student_id': student_id,
+            'course_id': course_id,
+            'score_sum': score_sum,
+            'max_score_sum': max_sum,
+            'grade_count': count,
+            'average_percentage': score_sum / max_sum * 100 if max_sum > 0 else 0.0,
+            'updated_at': datetime.utcnow()
+        } for (student_id, course_id), (score_sum, max_sum, count) in deltas.items()
+            if score_sum or max_sum or count]
+
+        if not rows:
+            return
+
+        stmt = dialect_insert(db, StudentCourseAverage).values(rows)
+        new_score = StudentCourseAverage.score_sum + stmt.excluded.score_sum
+        new_max = StudentCourseAverage.max_score_sum + stmt.excluded.max_score_sum
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=['student_id', 'course_id'],
+            set_={
+                'score_sum': new_score,
+                'max_score_sum': new_max,
+                'grade_count': StudentCourseAverage.grade_count + stmt.excluded.grade_count,
+                'average_percentage': case((new_max > 0, new_score * 100 / new_max), else_=0.0),
+                'updated_at': stmt.excluded.updated_at
+            }
+        ))
+
+        type_rows = [{
+            'student_id': student_id,
+            'course_id': course_id,
+            'grade_type': grade_type,
+            'score_sum': score_sum,
+            'max_score_sum': max_sum,
+            'grade_count': count
+        } for (student_id, course_id, grade_type), (score_sum, max_sum, count) in type_deltas.items()
+            if score_sum or max_sum or count]
+
+        if type_rows:
+            stmt = dialect_insert(db, StudentGradeTypeTotal).values(type_rows)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=['student_id', 'course_id', 'grade_type'],
+                set_={
+                    'score_sum': StudentGradeTypeTotal.score_sum + stmt.excluded.score_sum,
+                    'max_score_sum': StudentGradeTypeTotal.max_score_sum + stmt.excluded.max_score_sum,
+                    'grade_count': StudentGradeTypeTotal.grade_count + stmt.excluded.grade_count
+                }
+            ))
+
+        student_ids = {row['student_id'] for row in rows}
+        db.query(StudentCourseAverage).filter(
+            StudentCourseAverage.student_id.in_(student_ids),
+            StudentCourseAverage.grade_count <= 0
+        ).delete(synchronize_session=False)
+        db.query(StudentGradeTypeTotal).filter(
+            StudentGradeTypeTotal.student_id.in_(student_ids),
+            StudentGradeTypeTotal.grade_count <= 0
+        ).delete(synchronize_session=False)
+
+        AcademicSummaryRepository.recompute_course_grades(
+            db, pairs={(row['student_id'], row['course_id']) for row in rows}
+        )
+        AcademicSummaryRepository.refresh_students(db, student_ids)
+
+    @staticmethod
+    def recompute_course_grades(db: Session, course_id: int = None,
+                                pairs: Iterable[Tuple[int, int]] = None):
+        """Recompute stored course grades from per-type totals and policy weights.
+
+        Pass pairs for the incremental path (only those student/course rows
+        are touched) or course_id for a whole-course recompute after a policy
+        change; with neither, every course is recomputed. Does not commit.
+        """
+        query = db.query(
+            StudentCourseAverage.id,
+            StudentGradeTypeTotal.course_id,
+            StudentGradeTypeTotal.grade_type,
+            StudentGradeTypeTotal.score_sum,
+            StudentGradeTypeTotal.max_score_sum
+        ).join(StudentCourseAverage, (
+            (StudentCourseAverage.student_id == StudentGradeTypeTotal.student_id)
+            & (StudentCourseAverage.course_id == StudentGradeTypeTotal.course_id)
+        ))
+
+        if pairs is not None:
+            pairs = set(pairs)
+            if not pairs:
+                return
+            query = query.filter(
+                StudentGradeTypeTotal.student_id.in_({sid for sid, _ in pairs}),
+                StudentGradeTypeTotal.course_id.in_({cid for _, cid in pairs})
+            ).add_columns(StudentGradeTypeTotal.student_id)
+            rows = [r[:5] for r in query.all() if (r[5], r[1]) in pairs]
+        elif course_id is not None:
+            rows = query.filter(StudentGradeTypeTotal.course_id == course_id).all()
+        else:
+            rows = query.all()
+
+        if not rows:
+            return
+
+        weights = {
+            (cid, grade_type): weight for cid, grade_type, weight in
+            db.query(CourseGradingPolicy.course_id, CourseGradingPolicy.grade_type, CourseGradingPolicy.weight)
+            .filter(CourseGradingPolicy.course_id.in_({r[1] for r in rows})).all()
+        }
+
+        average_ids, index = np.unique(np.array([r[0] for r in rows], dtype=np.int64), return_inverse=True)
+        score_sums = np.array([r[3] for r in rows], dtype=float)
+        max_sums = np.array([r[4] for r in rows], dtype=float)
+        type_weights = np.array([weights.get((r[1], r[2]), 0.0) for r in rows], dtype=float)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            type_percentages = np.where(max_sums > 0, score_sums * 100 / max_sums, 0.0)
+            # Weights are renormalized over the types a student actually has grades in
+            weighted = np.bincount(index, type_weights * type_percentages) / np.bincount(index, type_weights)
+            pooled = np.bincount(index, score_sums) * 100 / np.bincount(index, max_sums)
+            percentages = np.round(np.where(np.isfinite(weighted), weighted, np.nan_to_num(pooled)), 2)
+
+        letters = percentages_to_letters(percentages)
+        db.execute(update(StudentCourseAverage), [{
+            'id': int(average_id),
+            'course_percentage': float(percentage),
+            'letter_grade': letter
+        } for average_id, percentage, letter in zip(average_ids, percentages, letters)])
+
+    @staticmethod
+    def refresh_students(db: Session, student_ids: Iterable[int]):
+        """Recompute weighted GPA for the given students from their course averages"""
+        student_ids = list(student_ids)
+        if not student_ids:
+            return
+
+        averages = db.query(
+            StudentCourseAverage.student_id,
+            StudentCourseAverage.course_percentage,
+            Course.credits
+        ).join(Course, StudentCourseAverage.course_id == Course.id)\
+         .filter(StudentCourseAverage.student_id.in_(student_ids)).all()
+
+        totals = defaultdict(lambda: [0.0, 0.0, 0.0, 0])
+        for student_id, percentage, credits in averages:
+            weight = float(credits) if credits else 1.0
+            total = totals[student_id]
+            total[0] += percentage_to_points(percentage) * weight
+            total[1] += percentage * weight
+            total[2] += weight
+            total[3] += 1
+
+        placement = dict(
+            (sid, (grade_level, section)) for sid, grade_level, section in
+            db.query(Student.id, Student.grade_level, Student.section)
+            .filter(Student.id.in_(list(totals))).all()
+        )
+
+        rows = [{
+            'student_id': student_id,
+            'grade_level': placement.get(student_id, (None, None))[0],
+            'section': placement.get(student_id, (None, None))[1],
+            'weighted_gpa': round(points / credits, 2),
+            'average_percentage': round(weighted_pct / credits, 2),
+            'total_credits': credits,
+            'course_count': count,
+            'updated_at': datetime.utcnow()
+        } for student_id, (points, weighted_pct, credits, count) in totals.items()
+            if student_id in placement]
+
+        if rows:
+            stmt = dialect_insert(db, StudentAcademicSummary).values(rows)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=['student_id'],
+                set_={c: getattr(stmt.excluded, c) for c in rows[0] if c != 'student_id'}
+            ))
+
+        empty = [sid for sid in student_ids if sid not in totals]
+        if empty:
+            db.query(StudentAcademicSummary).filter(
+                StudentAcademicSummary.student_id.in_(empty)
+            ).delete(synchronize_session=False)
+
+    @staticmethod
+    def sync_student_placement(db: Session, student: Student):
+        """Copy a student's grade level and section onto their summary row"""
+        db.query(StudentAcademicSummary).filter(
+            StudentAcademicSummary.student_id == student.id
+        ).update({
+            'grade_level': student.grade_level,
+            'section': student.section
+        }, synchronize_session=False)
+
+    @staticmethod
+    def get_policy(db: Session, course_id: int) -> List[CourseGradingPolicy]:
+        return db.query(CourseGradingPolicy).filter(
+            CourseGradingPolicy.course_id == course_id
+        ).order_by(CourseGradingPolicy.weight.desc(), CourseGradingPolicy.grade_type).all()
+
+    @staticmethod
+    def set_policy(db: Session, course_id: int, weights: Dict[str, float]) -> List[CourseGradingPolicy]:
+        """Replace a course's grade type weights and recompute its course grades"""
+        db.query(CourseGradingPolicy).filter(
+            CourseGradingPolicy.course_id == course_id
+        ).delete(synchronize_session=False)
+
+        db.add_all([
+            CourseGradingPolicy(course_id=course_id, grade_type=grade_type, weight=weight)
+            for grade_type, weight in weights.items()
+        ])
+        db.flush()
+
+        AcademicSummaryRepository.recompute_course_grades(db, course_id=course_id)
+
+        student_ids = [sid for (sid,) in db.query(StudentCourseAverage.student_id).filter(
+            StudentCourseAverage.course_id == course_id
+        ).all()]
+        for i in range(0, len(student_ids), REFRESH_CHUNK_SIZE):
+            AcademicSummaryRepository.refresh_students(db, student_ids[i:i + REFRESH_CHUNK_SIZE])
+
+        db.commit()
+        return AcademicSummaryRepository.get_policy(db, course_id)
+
+    @staticmethod
+    def rebuild(db: Session):
+        """Recompute all course averages and summaries from the grades table"""
+        db.query(StudentAcademicSummary).delete(synchronize_session=False)
+        db.query(StudentGradeTypeTotal).delete(synchronize_session=False)
+        db.query(StudentCourseAverage).delete(synchronize_session=False)
+
+        score_sum = func.sum(Grade.score)
+        max_sum = func.sum(Grade.max_score)
+        averages = db.query(
+            Grade.student_id,
+            Grade.course_id,
+            score_sum,
+            max_sum,
+            func.count(Grade.id),
+            case((max_sum > 0, score_sum * 100 / max_sum), else_=0.0),
+            literal(datetime.utcnow())
+        ).filter(Grade.max_score > 0, Grade.excluded == False).group_by(Grade.student_id, Grade.course_id)
+
+        db.execute(insert(StudentCourseAverage).from_select(
+            ['student_id', 'course_id', 'score_sum', 'max_score_sum', 'grade_count',
+             'average_percentage', 'updated_at'],
+            averages.statement
+        ))
+
+        grade_type = func.lower(func.trim(func.coalesce(Grade.grade_type, '')))
+        type_totals = db.query(
+            Grade.student_id,
+            Grade.course_id,
+            grade_type,
+            func.sum(Grade.score),
+            func.sum(Grade.max_score),
+            func.count(Grade.id)
+        ).filter(Grade.max_score > 0, Grade.excluded == False).group_by(Grade.student_id, Grade.course_id, grade_type)
+
+        db.execute(insert(StudentGradeTypeTotal).from_select(
+            ['student_id', 'course_id', 'grade_type', 'score_sum', 'max_score_sum', 'grade_count'],
+            type_totals.statement
+        ))
+
+        AcademicSummaryRepository.recompute_course_grades(db)
+
+        student_ids = [sid for (sid,) in db.query(StudentCourseAverage.student_id).distinct().all()]
+        for i in range(0, len(student_ids), REFRESH_CHUNK_SIZE):
+            AcademicSummaryRepository.refresh_students(db, student_ids[i:i + REFRESH_CHUNK_SIZE])
+
+        db.commit()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_summary(db: Session, student_id: int) -> Optional[StudentAcademicSummary]:
+        return db.query(StudentAcademicSummary).filter(
+            StudentAcademicSummary.student_id == student_id
+        ).first()
+
+    @staticmethod
+    def get_course_averages(db: Session, student_id: int) -> List[StudentCourseAverage]:
+        return db.query(StudentCourseAverage).options(
+            joinedload(StudentCourseAverage.course)
+        ).filter(
+            StudentCourseAverage.student_id == student_id
+        ).order_by(StudentCourseAverage.course_percentage.desc()).all()
+
+    @staticmethod
+    def get_course_grades(db: Session, course_id: int) -> List[StudentCourseAverage]:
+        """Stored course grades for every graded student in a course, best first"""
+        return db.query(StudentCourseAverage).options(
+            joinedload(StudentCourseAverage.student)
+        ).filter(
+            StudentCourseAverage.course_id == course_id
+        ).order_by(
+            StudentCourseAverage.course_percentage.desc(),
+            StudentCourseAverage.student_id
+        ).all()
+
+    @staticmethod
+    def get_ranks(db: Session, student_id: int) -> Optional[Dict]:
+        """Competition rank (1 + number of higher GPAs) within section, grade level and school"""
+        summary = AcademicSummaryRepository.get_summary(db, student_id)
+        if not summary:
+            return None
+
+        def rank_and_size(*scope) -> Dict:
+            base = db.query(func.count(StudentAcademicSummary.id)).filter(*scope)
+            higher = base.filter(StudentAcademicSummary.weighted_gpa > summary.weighted_gpa).scalar()
+            return {'rank': higher + 1, 'out_of': base.scalar()}
+
+        same_grade = StudentAcademicSummary.grade_level == summary.grade_level
+        same_section = StudentAcademicSummary.section == summary.section
+
+        return {
+            'student_id': student_id,
+            'weighted_gpa': summary.weighted_gpa,
+            'average_percentage': summary.average_percentage,
+            'total_credits': summary.total_credits,
+            'course_count': summary.course_count,
+            'section': rank_and_size(same_grade, same_section),
+            'grade_level': rank_and_size(same_grade),
+            'school': rank_and_size()
+        }
+
+    @staticmethod
+    def get_top_students(db: Session, limit: int = 10, grade_level: str = None,
+                         section: str = None) -> List[StudentAcademicSummary]:
+        """Top students by weighted GPA; scoped queries walk the composite indexes"""
+        query = db.query(StudentAcademicSummary).options(
+            joinedload(StudentAcademicSummary.student)
+        )
+
+        if grade_level:
+            query = query.filter(StudentAcademicSummary.grade_level == grade_level)
+
+        if section:
+            query = query.filter(StudentAcademicSummary.section == section)
+
+        return query.order_by(
+            StudentAcademicSummary.weighted_gpa.desc(),
+            StudentAcademicSummary.student_id
+        ).limit(limit).all()
+
+    @staticmethod
+    def get_top_in_course(db: Session, course_id: int, limit: int = 10) -> List[StudentCourseAverage]:
+        return db.query(StudentCourseAverage).options(
+            joinedload(StudentCourseAverage.student)
+        ).filter(
+            StudentCourseAverage.course_id == course_id
+        ).order_by(
+            StudentCourseAverage.course_percentage.desc()
+        ).limit(limit).all()
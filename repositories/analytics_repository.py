@@ -0,0 +1,337 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, and_, cast, extract, insert, literal, Integer
+from typing import List, Optional, Dict, Tuple
+from datetime import date, datetime
+from collections import defaultdict
+from database.upsert import dialect_insert
+from models.models import Grade, Attendance, Student, Course, Teacher
+from models.analytics_models import GradeDailyRollup, AttendanceDailyRollup, DepartmentMonthlyRollup
+
+GRADE_BUCKETS = ['a', 'b', 'c', 'd', 'f']
+ATTENDANCE_STATUSES = ['present', 'absent', 'late']
+DEFAULT_DEPARTMENT = "General"
+
+def _as_date(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+def grade_bucket(percentage: float) -> str:
+    """Map a percentage to the A-F bucket used on the analytics page"""
+    if percentage >= 90:
+        return 'a'
+    if percentage >= 80:
+        return 'b'
+    if percentage >= 70:
+        return 'c'
+    if percentage >= 60:
+        return 'd'
+    return 'f'
+
+class AnalyticsRepository:
+    """Maintains and reads the authority analytics rollup tables.
+
+    Grade and attendance repositories pass (old, new) snapshots of every row
+    they write; the deltas are folded into the rollups in the caller's
+    transaction. ``rebuild_rollups`` recomputes everything from the raw
+    tables and is run periodically to repair drift (cascading deletes,
+    teachers changing department, etc).
+    """
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def attendance_snapshot(attendance: Attendance) -> Optional[Dict]:
+        if attendance is None:
+            return None
+        return {
+            'student_id': attendance.student_id,
+            'course_id': attendance.course_id,
+            'day': _as_date(attendance.date),
+            'status': attendance.status
+        }
+
+    # ------------------------------------------------------------------
+    # Incremental maintenance
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def apply_grade_changes(db: Session, changes: List[Tuple[Optional[Dict], Optional[Dict]]]):
+        """Fold grade (old, new) snapshots into the grade and department rollups.
+
+        Does not commit; the caller's transaction owns the write.
+        """
+        course_deltas = defaultdict(lambda: defaultdict(float))
+        for old, new in changes:
+            for snapshot, sign in ((old, -1), (new, 1)):
+                if not snapshot:
+                    continue
+                delta = course_deltas[(snapshot['course_id'], snapshot['day'])]
+                delta['count_' + grade_bucket(snapshot['percentage'])] += sign
+                delta['grade_count'] += sign
+                delta['percentage_sum'] += sign * snapshot['percentage']
+
+        if not course_deltas:
+            return
+
+        course_ids = {course_id for course_id, _ in course_deltas}
+        departments = dict(
+            db.query(Course.id, Teacher.department)
+            .outerjoin(Teacher, Course.teacher_id == Teacher.id)
+            .filter(Course.id.in_(course_ids))
+            .all()
+        )
+
+        grade_rows = []
+        department_deltas = defaultdict(lambda: defaultdict(float))
+        for (course_id, day), delta in course_deltas.items():
+            if not any(delta.values()):
+                continue
+            row = {'course_id': course_id, 'day': day, 'updated_at': datetime.utcnow()}
+            for bucket in GRADE_BUCKETS:
+                row['count_' + bucket] = int(delta['count_' + bucket])
+            row['grade_count'] = int(delta['grade_count'])
+            row['percentage_sum'] = delta['percentage_sum']
+            grade_rows.append(row)
+
+            department = departments.get(course_id) or DEFAULT_DEPARTMENT
+            month_delta = department_deltas[(department, day.year, day.month)]
+            month_delta['grade_count'] += delta['grade_count']
+            month_delta['percentage_sum'] += delta['percentage_sum']
+
+        if grade_rows:
+            stmt = dialect_insert(db, GradeDailyRollup).values(grade_rows)
+            counters = ['count_' + bucket for bucket in GRADE_BUCKETS] + ['grade_count', 'percentage_sum']
+            set_ = {c: getattr(GradeDailyRollup, c) + getattr(stmt.excluded, c) for c in counters}
+            set_['updated_at'] = stmt.excluded.updated_at
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=['course_id', 'day'], set_=set_
+            ))
+
+        department_rows = [
+            {
+                'department': department,
+                'year': year,
+                'month': month,
+                'grade_count': int(delta['grade_count']),
+                'percentage_sum': delta['percentage_sum'],
+                'updated_at': datetime.utcnow()
+            }
+            for (department, year, month), delta in department_deltas.items()
+            if any(delta.values())
+        ]
+        if department_rows:
+            stmt = dialect_insert(db, DepartmentMonthlyRollup).values(department_rows)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=['department', 'year', 'month'],
+                set_={
+                    'grade_count': DepartmentMonthlyRollup.grade_count + stmt.excluded.grade_count,
+                    'percentage_sum': DepartmentMonthlyRollup.percentage_sum + stmt.excluded.percentage_sum,
+                    'updated_at': stmt.excluded.updated_at
+                }
+            ))
+
+    @staticmethod
+    def apply_attendance_changes(db: Session, changes: List[Tuple[Optional[Dict], Optional[Dict]]]):
+        """Fold attendance (old, new) snapshots into the per-grade-level rollup.
+
+        Does not commit; the caller's transaction owns the write.
+        """
+        student_ids = {
+            snapshot['student_id']
+            for pair in changes for snapshot in pair if snapshot
+        }
+        if not student_ids:
+            return
+
+        grade_levels = dict(
+            db.query(Student.id, Student.grade_level)
+            .filter(Student.id.in_(student_ids))
+            .all()
+        )
+
+        deltas = defaultdict(lambda: defaultdict(int))
+        for old, new in changes:
+            for snapshot, sign in ((old, -1), (new, 1)):
+                if not snapshot:
+                    continue
+                key = (grade_levels.get(snapshot['student_id']) or "", snapshot['day'])
+                if snapshot['status'] in ATTENDANCE_STATUSES:
+                    deltas[key][snapshot['status'] + '_count'] += sign
+                deltas[key]['total_count'] += sign
+
+        rows = []
+        for (grade_level, day), delta in deltas.items():
+            if not any(delta.values()):
+                continue
+            row = {'grade_level': grade_level, 'day': day, 'updated_at': datetime.utcnow()}
+            for status in ATTENDANCE_STATUSES:
+                row[status + '_count'] = delta[status + '_count']
+            row['total_count'] = delta['total_count']
+            rows.append(row)
+
+        if not rows:
+            return
+
+        stmt = dialect_insert(db, AttendanceDailyRollup).values(rows)
+        counters = [status + '_count' for status in ATTENDANCE_STATUSES] + ['total_count']
+        set_ = {c: getattr(AttendanceDailyRollup, c) + getattr(stmt.excluded, c) for c in counters}
+        set_['updated_at'] = stmt.excluded.updated_at
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=['grade_level', 'day'], set_=set_
+        ))
+
+    # ------------------------------------------------------------------
+    # Full rebuild (periodic job)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def rebuild_rollups(db: Session):
+        """Recompute every rollup table from the raw grade and attendance rows"""
+        now = datetime.utcnow()
+        percentage = Grade.score / Grade.max_score * 100
+        thresholds = [(90, None), (80, 90), (70, 80), (60, 70), (None, 60)]
+
+        bucket_columns = []
+        for lower, upper in thresholds:
+            conditions = []
+            if lower is not None:
+                conditions.append(percentage >= lower)
+            if upper is not None:
+                conditions.append(percentage < upper)
+            bucket_columns.append(func.sum(case((and_(*conditions), 1), else_=0)))
+
+        db.query(GradeDailyRollup).delete(synchronize_session=False)
+        db.query(DepartmentMonthlyRollup).delete(synchronize_session=False)
+        db.query(AttendanceDailyRollup).delete(synchronize_session=False)
+
+        grade_select = db.query(
+            Grade.course_id,
+            Grade.date,
+            *bucket_columns,
+            func.count(Grade.id),
+            func.sum(percentage),
+            literal(now)
+        ).filter(
+            Grade.max_score > 0,
+            Grade.date.isnot(None),
+            Grade.excluded == False
+        ).group_by(Grade.course_id, Grade.date)
+
+        db.execute(insert(GradeDailyRollup).from_select(
+            ['course_id', 'day', 'count_a', 'count_b', 'count_c', 'count_d', 'count_f',
+             'grade_count', 'percentage_sum', 'updated_at'],
+            grade_select.statement
+        ))
+
+        department = func.coalesce(Teacher.department, DEFAULT_DEPARTMENT)
+        year = cast(extract('year', Grade.date), Integer)
+        month = cast(extract('month', Grade.date), Integer)
+        department_select = db.query(
+            department,
+            year,
+            month,
+            func.count(Grade.id),
+            func.sum(percentage),
+            literal(now)
+        ).join(Course, Grade.course_id == Course.id)\
+         .outerjoin(Teacher, Course.teacher_id == Teacher.id)\
+         .filter(Grade.max_score > 0, Grade.date.isnot(None), Grade.excluded == False)\
+         .group_by(department, year, month)
+
+        db.execute(insert(DepartmentMonthlyRollup).from_select(
+            ['department', 'year', 'month', 'grade_count', 'percentage_sum', 'updated_at'],
+            department_select.statement
+        ))
+
+        grade_level = func.coalesce(Student.grade_level, "")
+        attendance_select = db.query(
+            grade_level,
+            Attendance.date,
+            *[func.sum(case((Attendance.status == status, 1), else_=0)) for status in ATTENDANCE_STATUSES],
+            func.count(Attendance.id),
+            literal(now)
+        ).join(Student, Attendance.student_id == Student.id)\
+         .group_by(grade_level, Attendance.date)
+
+        db.execute(insert(AttendanceDailyRollup).from_select(
+            ['grade_level', 'day', 'present_count', 'absent_count', 'late_count',
+             'total_count', 'updated_at'],
+            attendance_select.statement
+        ))
+
+        db.commit()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_grade_distribution(db: Session) -> Dict[str, int]:
+        result = db.query(
+            *[func.coalesce(func.sum(getattr(GradeDailyRollup, 'count_' + b)), 0) for b in GRADE_BUCKETS]
+        ).first()
+        return {bucket.upper(): int(count) for bucket, count in zip(GRADE_BUCKETS, result)}
+
+    @staticmethod
+    def get_attendance_by_grade_level(db: Session) -> List[Dict]:
+        results = db.query(
+            AttendanceDailyRollup.grade_level,
+            func.sum(AttendanceDailyRollup.present_count).label('present'),
+            func.sum(AttendanceDailyRollup.total_count).label('total')
+        ).group_by(AttendanceDailyRollup.grade_level)\
+         .having(func.sum(AttendanceDailyRollup.total_count) > 0)\
+         .order_by(AttendanceDailyRollup.grade_level).all()
+
+        return [{
+            'grade_level': r.grade_level or "Unassigned",
+            'percentage': round(r.present / r.total * 100, 1)
+        } for r in results]
+
+    @staticmethod
+    def get_department_averages(db: Session) -> List[Dict]:
+        results = db.query(
+            DepartmentMonthlyRollup.department,
+            func.sum(DepartmentMonthlyRollup.percentage_sum).label('total'),
+            func.sum(DepartmentMonthlyRollup.grade_count).label('count')
+        ).group_by(DepartmentMonthlyRollup.department)\
+         .having(func.sum(DepartmentMonthlyRollup.grade_count) > 0)\
+         .order_by(DepartmentMonthlyRollup.department).all()
+
+        return [{
+            'department': r.department,
+            'average': round(r.total / r.count, 1)
+        } for r in results]
+
+    @staticmethod
+    def get_monthly_averages(db: Session) -> Dict[int, float]:
+        """Average percentage per calendar month (1-12), across all years"""
+        results = db.query(
+            DepartmentMonthlyRollup.month,
+            func.sum(DepartmentMonthlyRollup.percentage_sum).label('total'),
+            func.sum(DepartmentMonthlyRollup.grade_count).label('count')
+        ).group_by(DepartmentMonthlyRollup.month)\
+         .having(func.sum(DepartmentMonthlyRollup.grade_count) > 0).all()
+
+        return {r.month: round(r.total / r.count, 1) for r in results}
+
+    @staticmethod
+    def get_teacher_averages(db: Session) -> List[Dict]:
+        results = db.query(
+            Teacher.id,
+            Teacher.full_name,
+            Teacher.department,
+            func.sum(GradeDailyRollup.percentage_sum).label('total'),
+            func.sum(GradeDailyRollup.grade_count).label('count')
+        ).outerjoin(Course, Course.teacher_id == Teacher.id)\
+         .outerjoin(GradeDailyRollup, GradeDailyRollup.course_id == Course.id)\
+         .group_by(Teacher.id, Teacher.full_name, Teacher.department).all()
+
+        return [{
+            'teacher_id': r.id,
+            'name': r.full_name,
+            'department': r.department,
+            'average': round(r.total / r.count, 1) if r.count else 0
+        } for r in results]
@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from datetime import datetime
-from models.models import Assignment, AssignmentSubmission
+from models.models import Assignment, AssignmentSubmission, CourseEnrollment, Student
+from utils.deadline_queue import deadlines
 
 class AssignmentRepository:
     @staticmethod
@@ -33,6 +34,8 @@ class AssignmentRepository:
         db.add(assignment)
         db.commit()
         db.refresh(assignment)
+        if assignment.due_date > datetime.utcnow():
+            deadlines.schedule('assignment_due', assignment.id, assignment.due_date)
         return assignment
     
     @staticmethod
@@ -42,10 +45,13 @@ class AssignmentRepository:
                 setattr(assignment, key, value)
         db.commit()
         db.refresh(assignment)
+        if assignment.due_date > datetime.utcnow():
+            deadlines.schedule('assignment_due', assignment.id, assignment.due_date)
         return assignment
     
     @staticmethod
     def delete(db: Session, assignment: Assignment):
+        deadlines.cancel('assignment_due', assignment.id)
         db.delete(assignment)
         db.commit()
     
@@ -109,4 +115,25 @@ class AssignmentRepository:
         return db.query(Assignment).filter(
             Assignment.due_date < datetime.utcnow(),
             ~Assignment.id.in_(submitted_ids)
-        ).all()
\ No newline at end of file
+        ).all()
+    
+    @staticmethod
+    def get_due_between(db: Session, start: datetime, end: datetime) -> List[tuple]:
+        """(id, due_date) of assignments falling due in (start, end]"""
+        return db.query(Assignment.id, Assignment.due_date).filter(
+            Assignment.due_date > start,
+            Assignment.due_date <= end
+        ).all()
+    
+    @staticmethod
+    def get_missing_submitters(db: Session, assignment: Assignment) -> List[int]:
+        """User ids of students enrolled in the course who have not submitted"""
+        submitted = db.query(AssignmentSubmission.student_id).filter(
+            AssignmentSubmission.assignment_id == assignment.id
+        )
+        return [row[0] for row in db.query(Student.user_id).join(
+            CourseEnrollment, CourseEnrollment.student_id == Student.id
+        ).filter(
+            CourseEnrollment.course_id == assignment.course_id,
+            ~Student.id.in_(submitted)
+        ).all()]
@@ -0,0 +1,148 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, cast, insert, literal, extract, BigInteger, Integer
+from typing import List, Optional, Dict, Tuple
+from collections import defaultdict
+from database.upsert import dialect_insert
+from models.models import Attendance, Student
+from models.attendance_models import AttendanceMonthBitmap
+from utils.attendance_bits import STATUS_CODES, day_mask, set_day
+
+class AttendanceBitmapRepository:
+    """Keeps attendance_month_bitmaps in step with the attendance table.
+
+    A roll call touches one day, so every affected month row shares the
+    same slot mask; rows are upserted in one statement per distinct mask
+    with status_bits = (status_bits & ~mask) | new_bits, which leaves
+    concurrent writes to other days of the month intact.
+    """
+
+    @staticmethod
+    def apply_attendance_changes(db: Session, changes: List[Tuple[Optional[Dict], Optional[Dict]]]):
+        """Fold attendance (old, new) snapshots into month bitmaps.
+
+        Does not commit; the caller's transaction owns the write.
+        """
+        slots = defaultdict(dict)  # (student, course, year, month) -> {day: status or None}
+        for old, _ in changes:
+            if old:
+                slots[AttendanceBitmapRepository._key(old)][old['day'].day] = None
+        for _, new in changes:
+            if new:
+                slots[AttendanceBitmapRepository._key(new)][new['day'].day] = new['status']
+
+        by_mask = defaultdict(list)
+        for (student_id, course_id, year, month), days in slots.items():
+            mask = bits = 0
+            for day, status in days.items():
+                mask |= day_mask(day)
+                bits = set_day(bits, day, status)
+            by_mask[mask].append({
+                'student_id': student_id,
+                'course_id': course_id,
+                'year': year,
+                'month': month,
+                'status_bits': bits
+            })
+
+        for mask, rows in by_mask.items():
+            stmt = dialect_insert(db, AttendanceMonthBitmap).values(rows)
+            kept = AttendanceMonthBitmap.status_bits.op('&')(literal(~mask, BigInteger))
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=['student_id', 'course_id', 'year', 'month'],
+                set_={'status_bits': kept.self_group().op('|')(stmt.excluded.status_bits)}
+            ))
+
+        if slots:
+            db.query(AttendanceMonthBitmap).filter(
+                AttendanceMonthBitmap.student_id.in_({key[0] for key in slots}),
+                AttendanceMonthBitmap.status_bits == 0
+            ).delete(synchronize_session=False)
+
+    @staticmethod
+    def _key(snapshot: Dict) -> Tuple[int, int, int, int]:
+        day = snapshot['day']
+        return snapshot['student_id'], snapshot['course_id'], day.year, day.month
+
+    @staticmethod
+    def rebuild(db: Session):
+        """Recompute every month bitmap from the attendance table.
+
+        Day slots are disjoint (one row per student/course/date), so the
+        bitwise OR of a month is the SUM of code << 2*(day-1).
+        """
+        db.query(AttendanceMonthBitmap).delete(synchronize_session=False)
+
+        code = case(
+            *[(Attendance.status == status, value) for status, value in STATUS_CODES.items()],
+            else_=0
+        )
+        shift = (cast(extract('day', Attendance.date), Integer) - 1) * 2
+        year = cast(extract('year', Attendance.date), Integer)
+        month = cast(extract('month', Attendance.date), Integer)
+
+        months = db.query(
+            Attendance.student_id,
+            Attendance.course_id,
+            year,
+            month,
+            func.sum(cast(code, BigInteger).op('<<')(shift))
+        ).group_by(Attendance.student_id, Attendance.course_id, year, month)
+
+        db.execute(insert(AttendanceMonthBitmap).from_select(
+            ['student_id', 'course_id', 'year', 'month', 'status_bits'],
+            months.statement
+        ))
+        db.query(AttendanceMonthBitmap).filter(
+            AttendanceMonthBitmap.status_bits == 0
+        ).delete(synchronize_session=False)
+
+        db.commit()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_student_months(db: Session, student_id: int, start: Tuple[int, int],
+                           end: Tuple[int, int], course_id: int = None) -> List[Tuple[int, int, int, int]]:
+        """(course_id, year, month, status_bits) for a student between two (year, month)s inclusive"""
+        ordinal = AttendanceMonthBitmap.year * 12 + AttendanceMonthBitmap.month
+        query = db.query(
+            AttendanceMonthBitmap.course_id,
+            AttendanceMonthBitmap.year,
+            AttendanceMonthBitmap.month,
+            AttendanceMonthBitmap.status_bits
+        ).filter(
+            AttendanceMonthBitmap.student_id == student_id,
+            ordinal >= start[0] * 12 + start[1],
+            ordinal <= end[0] * 12 + end[1]
+        )
+
+        if course_id:
+            query = query.filter(AttendanceMonthBitmap.course_id == course_id)
+
+        return query.order_by(AttendanceMonthBitmap.year, AttendanceMonthBitmap.month).all()
+
+    @staticmethod
+    def get_course_month(db: Session, course_id: int, year: int, month: int) -> List[Tuple[int, int]]:
+        """(student_id, status_bits) for every student of a course in one month"""
+        return db.query(
+            AttendanceMonthBitmap.student_id,
+            AttendanceMonthBitmap.status_bits
+        ).filter(
+            AttendanceMonthBitmap.course_id == course_id,
+            AttendanceMonthBitmap.year == year,
+            AttendanceMonthBitmap.month == month
+        ).all()
+
+    @staticmethod
+    def get_school_month(db: Session, year: int, month: int) -> List[Tuple[int, Optional[str], int]]:
+        """(student_id, grade_level, status_bits) for every bitmap of one month"""
+        return db.query(
+            AttendanceMonthBitmap.student_id,
+            Student.grade_level,
+            AttendanceMonthBitmap.status_bits
+        ).join(Student, AttendanceMonthBitmap.student_id == Student.id).filter(
+            AttendanceMonthBitmap.year == year,
+            AttendanceMonthBitmap.month == month
+        ).all()
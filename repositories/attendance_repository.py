@@ -1,10 +1,21 @@
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, and_
+from database.upsert import dialect_insert
 from typing import List, Optional, Dict
 from datetime import date, datetime, timedelta
-from models.models import Attendance, Student, Course
+from models.models import Attendance, Course
+from repositories.analytics_repository import AnalyticsRepository
+from repositories.attendance_summary_repository import AttendanceSummaryRepository
+from repositories.attendance_bitmap_repository import AttendanceBitmapRepository
 
 class AttendanceRepository:
+    @staticmethod
+    def _sync_derived(db: Session, changes: List[tuple]):
+        """Propagate (old, new) attendance snapshots to derived tables before commit"""
+        AnalyticsRepository.apply_attendance_changes(db, changes)
+        AttendanceSummaryRepository.apply_attendance_changes(db, changes)
+        AttendanceBitmapRepository.apply_attendance_changes(db, changes)
+    
     @staticmethod
     def get_by_id(db: Session, attendance_id: int) -> Optional[Attendance]:
         return db.query(Attendance).filter(Attendance.id == attendance_id).first()
@@ -22,6 +33,10 @@ class AttendanceRepository:
     def create(db: Session, attendance_data: dict) -> Attendance:
         attendance = Attendance(**attendance_data)
         db.add(attendance)
+        db.flush()
+        AttendanceRepository._sync_derived(
+            db, [(None, AnalyticsRepository.attendance_snapshot(attendance))]
+        )
         db.commit()
         db.refresh(attendance)
         return attendance
@@ -31,23 +46,123 @@ class AttendanceRepository:
         """Create multiple attendance records at once"""
         records = [Attendance(**data) for data in attendance_list]
         db.add_all(records)
+        db.flush()
+        AttendanceRepository._sync_derived(
+            db, [(None, AnalyticsRepository.attendance_snapshot(r)) for r in records]
+        )
         db.commit()
         for record in records:
             db.refresh(record)
         return records
     
+    @staticmethod
+    def upsert_bulk(db: Session, attendance_list: List[dict]) -> List[Dict]:
+        """Insert or update a roll call in one statement and one transaction.
+
+        Rows are keyed on (student_id, course_id, date); on conflict the
+        status is overwritten and remarks only when a new one is given.
+        Later entries for the same key win. The resulting rows come back via
+        RETURNING as plain dicts, so nothing is reloaded after the commit.
+        """
+        rows = {}
+        for data in attendance_list:
+            rows[(data['student_id'], data['course_id'], data['date'])] = {
+                'student_id': data['student_id'],
+                'course_id': data['course_id'],
+                'date': data['date'],
+                'status': data['status'],
+                'remarks': data.get('remarks')
+            }
+        if not rows:
+            return []
+        
+        # Previous statuses feed the rollup deltas; fetched in one projected query
+        existing = db.query(
+            Attendance.student_id, Attendance.course_id, Attendance.date, Attendance.status
+        ).filter(
+            Attendance.student_id.in_({key[0] for key in rows}),
+            Attendance.course_id.in_({key[1] for key in rows}),
+            Attendance.date.in_({key[2] for key in rows})
+        ).all()
+        old = {
+            (student_id, course_id, day): {
+                'student_id': student_id, 'course_id': course_id, 'day': day, 'status': status
+            }
+            for student_id, course_id, day, status in existing
+            if (student_id, course_id, day) in rows
+        }
+        
+        stmt = dialect_insert(db, Attendance).values(list(rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['student_id', 'course_id', 'date'],
+            set_={
+                'status': stmt.excluded.status,
+                'remarks': func.coalesce(stmt.excluded.remarks, Attendance.remarks)
+            }
+        ).returning(*Attendance.__table__.columns)
+        
+        records = [dict(row) for row in db.execute(stmt).mappings()]
+        
+        AttendanceRepository._sync_derived(db, [(
+            old.get((r['student_id'], r['course_id'], r['date'])),
+            {'student_id': r['student_id'], 'course_id': r['course_id'], 'day': r['date'], 'status': r['status']}
+        ) for r in records])
+        db.commit()
+        return records
+    
+    @staticmethod
+    def insert_missing_bulk(db: Session, attendance_list: List[dict]) -> List[Dict]:
+        """Insert rows for (student_id, course_id, date) keys that have none yet.
+
+        Existing rows, e.g. a teacher's absent or excused mark, are left
+        untouched (ON CONFLICT DO NOTHING). Only the inserted rows come back.
+        """
+        rows = {}
+        for data in attendance_list:
+            rows.setdefault((data['student_id'], data['course_id'], data['date']), {
+                'student_id': data['student_id'],
+                'course_id': data['course_id'],
+                'date': data['date'],
+                'status': data['status'],
+                'remarks': data.get('remarks')
+            })
+        if not rows:
+            return []
+        
+        stmt = dialect_insert(db, Attendance).values(list(rows.values()))
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=['student_id', 'course_id', 'date']
+        ).returning(*Attendance.__table__.columns)
+        
+        records = [dict(row) for row in db.execute(stmt).mappings()]
+        
+        AttendanceRepository._sync_derived(db, [(
+            None,
+            {'student_id': r['student_id'], 'course_id': r['course_id'], 'day': r['date'], 'status': r['status']}
+        ) for r in records])
+        db.commit()
+        return records
+    
     @staticmethod
     def update(db: Session, attendance: Attendance, **kwargs) -> Attendance:
+        old = AnalyticsRepository.attendance_snapshot(attendance)
         for key, value in kwargs.items():
             if value is not None and hasattr(attendance, key):
                 setattr(attendance, key, value)
+        db.flush()
+        AttendanceRepository._sync_derived(
+            db, [(old, AnalyticsRepository.attendance_snapshot(attendance))]
+        )
         db.commit()
         db.refresh(attendance)
         return attendance
     
     @staticmethod
     def delete(db: Session, attendance: Attendance):
+        old = AnalyticsRepository.attendance_snapshot(attendance)
         db.delete(attendance)
+        db.flush()
+        AttendanceRepository._sync_derived(db, [(old, None)])
         db.commit()
     
     @staticmethod
@@ -125,27 +240,12 @@ class AttendanceRepository:
     def get_low_attendance_students(db: Session, course_id: int, 
                                    threshold: float = 75.0) -> List[Dict]:
         """Get students with attendance below threshold percentage"""
-        # Get all students enrolled in the course
-        from models.models import CourseEnrollment
-        
-        enrolled = db.query(Student).join(CourseEnrollment).filter(
-            CourseEnrollment.course_id == course_id
-        ).all()
+        rows = AttendanceSummaryRepository.get_low_in_course(db, course_id, threshold)
         
-        low_attendance = []
-        
-        for student in enrolled:
-            stats = AttendanceRepository.get_attendance_stats(
-                db, student.id, course_id
-            )
-            
-            if stats['percentage'] < threshold:
-                low_attendance.append({
-                    'student': student,
-                    'percentage': stats['percentage'],
-                    'present': stats['present'],
-                    'absent': stats['absent'],
-                    'total': stats['total']
-                })
-        
-        return sorted(low_attendance, key=lambda x: x['percentage'])
\ No newline at end of file
+        return [{
+            'student': student,
+            'percentage': c.attendance_percentage if c else 0,
+            'present': c.present_count if c else 0,
+            'absent': c.absent_count if c else 0,
+            'total': c.total_count if c else 0
+        } for student, c in rows]
@@ -0,0 +1,268 @@
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, case, insert, literal, or_
+from typing import List, Optional, Dict, Tuple
+from datetime import datetime
+from collections import defaultdict
+from config.config import settings
+from database.upsert import dialect_insert
+from models.models import Attendance, Student, CourseEnrollment
+from models.attendance_models import StudentCourseAttendance, StudentAttendanceSummary, AttendanceAlert
+
+COUNTED_STATUSES = ('present', 'absent', 'late')
+
+def _percentage(present, total):
+    return case((total > 0, present * 100.0 / total), else_=0.0)
+
+class AttendanceSummaryRepository:
+    """Maintains present/absent/late/total counters per (student, course) and
+    per student, plus threshold-crossing alerts.
+
+    Attendance writes pass (old, new) snapshots; the counters are adjusted
+    with additive upserts whose RETURNING clause hands back the new
+    percentage, which is compared to the previous value to detect students
+    crossing settings.ATTENDANCE_ALERT_THRESHOLD. "Below 75%" lookups are
+    range scans on the percentage indexes.
+    """
+
+    @staticmethod
+    def apply_attendance_changes(db: Session, changes: List[Tuple[Optional[Dict], Optional[Dict]]]):
+        """Fold attendance (old, new) snapshots into the counters and emit alerts.
+
+        Does not commit; the caller's transaction owns the write.
+        """
+        course_deltas = defaultdict(lambda: [0, 0, 0, 0])
+        student_deltas = defaultdict(lambda: [0, 0, 0, 0])
+        for old, new in changes:
+            for snapshot, sign in ((old, -1), (new, 1)):
+                if not snapshot:
+                    continue
+                for delta in (course_deltas[(snapshot['student_id'], snapshot['course_id'])],
+                              student_deltas[snapshot['student_id']]):
+                    if snapshot['status'] in COUNTED_STATUSES:
+                        delta[COUNTED_STATUSES.index(snapshot['status'])] += sign
+                    delta[3] += sign
+
+        course_deltas = {k: d for k, d in course_deltas.items() if any(d)}
+        student_deltas = {k: d for k, d in student_deltas.items() if any(d)}
+        if not course_deltas and not student_deltas:
+            return
+
+        now = datetime.utcnow()
+        crossings = []
+
+        if course_deltas:
+            previous = {
+                (sid, cid): (pct, total) for sid, cid, pct, total in db.query(
+                    StudentCourseAttendance.student_id,
+                    StudentCourseAttendance.course_id,
+                    StudentCourseAttendance.attendance_percentage,
+                    StudentCourseAttendance.total_count
+                ).filter(
+                    StudentCourseAttendance.student_id.in_({sid for sid, _ in course_deltas}),
+                    StudentCourseAttendance.course_id.in_({cid for _, cid in course_deltas})
+                ).all()
+            }
+            stmt = AttendanceSummaryRepository._additive_upsert(
+                db, StudentCourseAttendance, ['student_id', 'course_id'], [{
+                    'student_id': sid, 'course_id': cid, 'updated_at': now,
+                    **AttendanceSummaryRepository._counts(delta)
+                } for (sid, cid), delta in course_deltas.items()]
+            ).returning(
+                StudentCourseAttendance.student_id,
+                StudentCourseAttendance.course_id,
+                StudentCourseAttendance.attendance_percentage,
+                StudentCourseAttendance.total_count
+            )
+            for sid, cid, pct, total in db.execute(stmt).all():
+                crossings.append((sid, cid, previous.get((sid, cid)), (pct, total)))
+
+        if student_deltas:
+            grade_levels = dict(
+                db.query(Student.id, Student.grade_level).filter(Student.id.in_(list(student_deltas))).all()
+            )
+            previous = {
+                sid: (pct, total) for sid, pct, total in db.query(
+                    StudentAttendanceSummary.student_id,
+                    StudentAttendanceSummary.attendance_percentage,
+                    StudentAttendanceSummary.total_count
+                ).filter(StudentAttendanceSummary.student_id.in_(list(student_deltas))).all()
+            }
+            rows = [{
+                'student_id': sid, 'grade_level': grade_levels[sid], 'updated_at': now,
+                **AttendanceSummaryRepository._counts(delta)
+            } for sid, delta in student_deltas.items() if sid in grade_levels]
+            if rows:
+                stmt = AttendanceSummaryRepository._additive_upsert(
+                    db, StudentAttendanceSummary, ['student_id'], rows, extra_set=['grade_level']
+                ).returning(
+                    StudentAttendanceSummary.student_id,
+                    StudentAttendanceSummary.attendance_percentage,
+                    StudentAttendanceSummary.total_count
+                )
+                for sid, pct, total in db.execute(stmt).all():
+                    crossings.append((sid, None, previous.get(sid), (pct, total)))
+
+        AttendanceSummaryRepository._emit_alerts(db, crossings, now)
+
+        db.query(StudentCourseAttendance).filter(
+            StudentCourseAttendance.student_id.in_({sid for sid, _ in course_deltas}),
+            StudentCourseAttendance.total_count <= 0
+        ).delete(synchronize_session=False)
+        db.query(StudentAttendanceSummary).filter(
+            StudentAttendanceSummary.student_id.in_(list(student_deltas)),
+            StudentAttendanceSummary.total_count <= 0
+        ).delete(synchronize_session=False)
+
+    @staticmethod
+    def _counts(delta: List[int]) -> Dict:
+        present, absent, late, total = delta
+        return {
+            'present_count': present,
+            'absent_count': absent,
+            'late_count': late,
+            'total_count': total,
+            'attendance_percentage': present * 100.0 / total if total > 0 else 0.0
+        }
+
+    @staticmethod
+    def _additive_upsert(db: Session, model, index_elements: List[str], rows: List[Dict],
+                         extra_set: List[str] = ()):
+        stmt = dialect_insert(db, model).values(rows)
+        present = model.present_count + stmt.excluded.present_count
+        total = model.total_count + stmt.excluded.total_count
+        set_ = {
+            'present_count': present,
+            'absent_count': model.absent_count + stmt.excluded.absent_count,
+            'late_count': model.late_count + stmt.excluded.late_count,
+            'total_count': total,
+            'attendance_percentage': _percentage(present, total),
+            'updated_at': stmt.excluded.updated_at
+        }
+        for column in extra_set:
+            set_[column] = getattr(stmt.excluded, column)
+        return stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+
+    @staticmethod
+    def _emit_alerts(db: Session, crossings: List[tuple], now: datetime):
+        """Insert an alert for every counter that entered or left the below-threshold state.
+
+        A counter only counts as below the threshold once it has
+        ATTENDANCE_ALERT_MIN_SESSIONS records, so a first absence does not alert.
+        """
+        threshold = settings.ATTENDANCE_ALERT_THRESHOLD
+        min_sessions = settings.ATTENDANCE_ALERT_MIN_SESSIONS
+
+        def is_below(state) -> bool:
+            return bool(state) and state[1] >= min_sessions and state[0] < threshold
+
+        alerts = []
+        for student_id, course_id, old, new in crossings:
+            was_below, now_below = is_below(old), is_below(new)
+            if was_below == now_below:
+                continue
+            alerts.append({
+                'student_id': student_id,
+                'course_id': course_id,
+                'event': 'below_threshold' if now_below else 'recovered',
+                'threshold': threshold,
+                'attendance_percentage': round(new[0], 2),
+                'created_at': now
+            })
+
+        if alerts:
+            db.execute(insert(AttendanceAlert), alerts)
+
+    @staticmethod
+    def sync_student_placement(db: Session, student: Student):
+        """Copy a student's grade level onto their attendance summary"""
+        db.query(StudentAttendanceSummary).filter(
+            StudentAttendanceSummary.student_id == student.id
+        ).update({'grade_level': student.grade_level}, synchronize_session=False)
+
+    @staticmethod
+    def rebuild(db: Session):
+        """Recompute all attendance counters from the attendance table (alerts are kept)"""
+        db.query(StudentAttendanceSummary).delete(synchronize_session=False)
+        db.query(StudentCourseAttendance).delete(synchronize_session=False)
+
+        present = func.sum(case((Attendance.status == 'present', 1), else_=0))
+        absent = func.sum(case((Attendance.status == 'absent', 1), else_=0))
+        late = func.sum(case((Attendance.status == 'late', 1), else_=0))
+        total = func.count(Attendance.id)
+        columns = ['present_count', 'absent_count', 'late_count', 'total_count',
+                   'attendance_percentage', 'updated_at']
+        now = literal(datetime.utcnow())
+
+        per_course = db.query(
+            Attendance.student_id, Attendance.course_id,
+            present, absent, late, total, _percentage(present, total), now
+        ).group_by(Attendance.student_id, Attendance.course_id)
+        db.execute(insert(StudentCourseAttendance).from_select(
+            ['student_id', 'course_id'] + columns, per_course.statement
+        ))
+
+        per_student = db.query(
+            Attendance.student_id, Student.grade_level,
+            present, absent, late, total, _percentage(present, total), now
+        ).join(Student, Attendance.student_id == Student.id)\
+         .group_by(Attendance.student_id, Student.grade_level)
+        db.execute(insert(StudentAttendanceSummary).from_select(
+            ['student_id', 'grade_level'] + columns, per_student.statement
+        ))
+
+        db.commit()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_low_in_course(db: Session, course_id: int, threshold: float = None,
+                          limit: int = None) -> List[Tuple[Student, Optional[StudentCourseAttendance]]]:
+        """Enrolled students of a course below the threshold, lowest first, with
+        their counters. Students without attendance yet have no counter and
+        count as 0%; students no longer enrolled are left out."""
+        threshold = settings.ATTENDANCE_ALERT_THRESHOLD if threshold is None else threshold
+        query = db.query(Student, StudentCourseAttendance).join(
+            CourseEnrollment, CourseEnrollment.student_id == Student.id
+        ).outerjoin(
+            StudentCourseAttendance,
+            (StudentCourseAttendance.student_id == Student.id) & (StudentCourseAttendance.course_id == course_id)
+        ).filter(
+            CourseEnrollment.course_id == course_id,
+            or_(StudentCourseAttendance.id.is_(None), StudentCourseAttendance.attendance_percentage < threshold)
+        ).order_by(func.coalesce(StudentCourseAttendance.attendance_percentage, 0.0), Student.id)
+
+        return query.limit(limit).all() if limit else query.all()
+
+    @staticmethod
+    def get_low_students(db: Session, threshold: float = None, grade_level: str = None,
+                         limit: int = None) -> List[StudentAttendanceSummary]:
+        """Students below the threshold overall, school-wide or for one grade level"""
+        threshold = settings.ATTENDANCE_ALERT_THRESHOLD if threshold is None else threshold
+        query = db.query(StudentAttendanceSummary).options(
+            joinedload(StudentAttendanceSummary.student)
+        )
+
+        if grade_level:
+            query = query.filter(StudentAttendanceSummary.grade_level == grade_level)
+
+        query = query.filter(
+            StudentAttendanceSummary.attendance_percentage < threshold
+        ).order_by(StudentAttendanceSummary.attendance_percentage)
+
+        return query.limit(limit).all() if limit else query.all()
+
+    @staticmethod
+    def get_alerts(db: Session, course_ids: List[int] = None, since: datetime = None,
+                   limit: int = 100) -> List[AttendanceAlert]:
+        """Most recent alerts; course_ids restricts to course-level alerts of those courses"""
+        query = db.query(AttendanceAlert).options(joinedload(AttendanceAlert.student))
+
+        if course_ids is not None:
+            query = query.filter(AttendanceAlert.course_id.in_(course_ids))
+
+        if since:
+            query = query.filter(AttendanceAlert.created_at >= since)
+
+        return query.order_by(AttendanceAlert.created_at.desc(), AttendanceAlert.id.desc()).limit(limit).all()
@@ -0,0 +1,138 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import update, delete, case, func, bindparam
+from typing import Dict, List, Optional, Sequence
+from collections import Counter
+from datetime import datetime
+from models.blob_models import StoredBlob
+from models.models import Note, Video, Assignment, AssignmentSubmission
+from models.chat_models import ChatMessage
+
+# Every column that can point at a stored blob
+FILE_REFERENCES = [
+    Note.file_path,
+    Video.file_path,
+    Assignment.file_path,
+    AssignmentSubmission.file_path,
+    ChatMessage.file_path,
+]
+
+class BlobRepository:
+    @staticmethod
+    def get_by_sha256(db: Session, sha256: str) -> Optional[StoredBlob]:
+        return db.query(StoredBlob).filter(StoredBlob.sha256 == sha256).first()
+
+    @staticmethod
+    def create(db: Session, sha256: str, path: str, size: int, mime_type: Optional[str],
+               ref_count: int = 1) -> StoredBlob:
+        blob = StoredBlob(sha256=sha256, path=path, size=size, mime_type=mime_type, ref_count=ref_count)
+        db.add(blob)
+        db.commit()
+        db.refresh(blob)
+        return blob
+
+    @staticmethod
+    def add_references(db: Session, blob_id: int, count: int = 1) -> bool:
+        """Take references on a blob; False if it was garbage collected meanwhile"""
+        result = db.execute(
+            update(StoredBlob)
+            .where(StoredBlob.id == blob_id)
+            .values(ref_count=StoredBlob.ref_count + count, released_at=None)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    def release(db: Session, paths: Sequence[str]):
+        """Drop one reference per path; blobs reaching zero are stamped for collection"""
+        counts = Counter(paths)
+        if not counts:
+            return
+        table = StoredBlob.__table__
+        db.execute(
+            update(table)
+            .where(table.c.path == bindparam('b_path'), table.c.ref_count > 0)
+            .values(
+                ref_count=case(
+                    (table.c.ref_count > bindparam('b_count'), table.c.ref_count - bindparam('b_count')),
+                    else_=0
+                ),
+                released_at=case(
+                    (table.c.ref_count <= bindparam('b_count'), bindparam('b_now')),
+                    else_=table.c.released_at
+                )
+            ),
+            [{'b_path': path, 'b_count': count, 'b_now': datetime.utcnow()} for path, count in counts.items()]
+        )
+        db.commit()
+
+    @staticmethod
+    def count_references(db: Session, prefix: str, paths: Sequence[str] = None) -> Dict[str, int]:
+        """Referencing rows per blob path under prefix (optionally only the given paths)"""
+        counts: Dict[str, int] = Counter()
+        for column in FILE_REFERENCES:
+            query = db.query(column, func.count()).filter(column.like(f"{prefix}%"))
+            if paths is not None:
+                query = query.filter(column.in_(paths))
+            for path, count in query.group_by(column).all():
+                counts[path] += count
+        return counts
+
+    @staticmethod
+    def get_all(db: Session) -> List[tuple]:
+        """(id, path, ref_count, released_at) of every blob"""
+        return db.query(StoredBlob.id, StoredBlob.path, StoredBlob.ref_count, StoredBlob.released_at).all()
+
+    @staticmethod
+    def set_ref_counts_bulk(db: Session, rows: List[Dict]):
+        """Store corrected ref_count/released_at for many blobs in one executemany"""
+        if not rows:
+            return
+        table = StoredBlob.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam('b_id'))
+            .values(ref_count=bindparam('b_ref_count'), released_at=bindparam('b_released_at')),
+            [{
+                'b_id': row['id'],
+                'b_ref_count': row['ref_count'],
+                'b_released_at': row['released_at']
+            } for row in rows]
+        )
+        db.commit()
+
+    @staticmethod
+    def get_collectable(db: Session, released_before: datetime, limit: int) -> List[tuple]:
+        """(id, path) of unreferenced blobs released before the cutoff"""
+        return db.query(StoredBlob.id, StoredBlob.path).filter(
+            StoredBlob.ref_count == 0,
+            StoredBlob.released_at < released_before
+        ).order_by(StoredBlob.released_at).limit(limit).all()
+
+    @staticmethod
+    def delete_unreferenced(db: Session, blob_id: int) -> bool:
+        """Delete a blob row if it is still unreferenced; True if deleted"""
+        result = db.execute(
+            delete(StoredBlob).where(StoredBlob.id == blob_id, StoredBlob.ref_count == 0)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    def get_legacy_paths(db: Session, prefix: str) -> Dict[str, int]:
+        """Referenced file paths outside the blob store, with their reference counts"""
+        counts: Dict[str, int] = Counter()
+        for column in FILE_REFERENCES:
+            for path, count in db.query(column, func.count()).filter(
+                column.isnot(None),
+                column != '',
+                ~column.like(f"{prefix}%")
+            ).group_by(column).all():
+                counts[path] += count
+        return counts
+
+    @staticmethod
+    def repoint(db: Session, old_path: str, new_path: str):
+        """Point every reference to old_path at new_path"""
+        for column in FILE_REFERENCES:
+            db.execute(update(column.class_).where(column == old_path).values(file_path=new_path))
+        db.commit()
@@ -56,6 +56,19 @@ class CourseRepository:
             CourseEnrollment.course_id == course_id
         ).all()
     
+    @staticmethod
+    def get_enrolled_user_ids(db: Session, course_id: int) -> List[int]:
+        """User ids of the course's students, for pushing notifications"""
+        return [row[0] for row in db.query(Student.user_id).join(CourseEnrollment).filter(
+            CourseEnrollment.course_id == course_id
+        ).all()]
+    
+    @staticmethod
+    def get_enrolled_student_ids(db: Session, course_id: int) -> List[int]:
+        return [row[0] for row in db.query(CourseEnrollment.student_id).filter(
+            CourseEnrollment.course_id == course_id
+        ).all()]
+    
     @staticmethod
     def get_enrollment_count(db: Session, course_id: int) -> int:
         return db.query(CourseEnrollment).filter(
@@ -1,10 +1,28 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, and_, or_
-from typing import List, Optional, Dict
+from sqlalchemy import func, and_, or_, case, update, insert, bindparam
+from typing import Iterable, List, Optional, Dict, Set, Tuple
+from collections import defaultdict
 from datetime import date, datetime
 from models.models import FeeRecord, Student
+from models.fee_models import ReconciledStatementLine
+from utils.deadline_queue import deadlines, local_midnight_after
+
+UNPAID_STATUSES = ['pending', 'partial', 'overdue']
+
+# Bumped after every committed fee write so in-process caches of derived
+# fee reports can tell they are stale
+_generation = 0
 
 class FeeRepository:
+    @staticmethod
+    def mark_changed():
+        global _generation
+        _generation += 1
+    
+    @staticmethod
+    def generation() -> int:
+        return _generation
+    
     @staticmethod
     def search(db: Session, query: str) -> List[FeeRecord]:
         return db.query(FeeRecord).join(Student).filter(
@@ -15,6 +33,12 @@ class FeeRepository:
             )
         ).all()
 
+    @staticmethod
+    def schedule_due_date(due_date: date):
+        """Queue the overdue sweep for everything due on this date"""
+        if due_date:
+            deadlines.schedule('fee_due', due_date, local_midnight_after(due_date))
+    
     @staticmethod
     def get_by_id(db: Session, fee_id: int) -> Optional[FeeRecord]:
         return db.query(FeeRecord).filter(FeeRecord.id == fee_id).first()
@@ -24,7 +48,9 @@ class FeeRepository:
         fee = FeeRecord(**fee_data)
         db.add(fee)
         db.commit()
+        FeeRepository.mark_changed()
         db.refresh(fee)
+        FeeRepository.schedule_due_date(fee.due_date)
         return fee
     
     @staticmethod
@@ -33,8 +59,11 @@ class FeeRepository:
         fees = [FeeRecord(**data) for data in fees_list]
         db.add_all(fees)
         db.commit()
+        FeeRepository.mark_changed()
         for fee in fees:
             db.refresh(fee)
+        for due_date in {fee.due_date for fee in fees}:
+            FeeRepository.schedule_due_date(due_date)
         return fees
     
     @staticmethod
@@ -57,13 +86,16 @@ class FeeRepository:
             fee.status = 'overdue'
         
         db.commit()
+        FeeRepository.mark_changed()
         db.refresh(fee)
+        FeeRepository.schedule_due_date(fee.due_date)
         return fee
     
     @staticmethod
     def delete(db: Session, fee: FeeRecord):
         db.delete(fee)
         db.commit()
+        FeeRepository.mark_changed()
     
     @staticmethod
     def get_student_fees(db: Session, student_id: int, 
@@ -137,21 +169,116 @@ class FeeRepository:
             'pending_records': pending or 0
         }
     
+    @staticmethod
+    def _payment_values(table, amount, payment_date, today: date) -> Dict:
+        """SET clause adding `amount` to paid_amount and deriving status from
+        the new total, evaluated by the database against the current row"""
+        new_paid = func.coalesce(table.c.paid_amount, 0) + amount
+        return {
+            'paid_amount': new_paid,
+            'payment_date': payment_date,
+            'status': case(
+                (new_paid >= table.c.amount, 'paid'),
+                (table.c.due_date < today, 'overdue'),
+                (new_paid > 0, 'partial'),
+                else_='pending'
+            )
+        }
+    
     @staticmethod
     def record_payment(db: Session, fee_id: int, amount: float, 
-                      payment_date: date = None) -> FeeRecord:
-        """Record a payment for a fee"""
-        fee = FeeRepository.get_by_id(db, fee_id)
-        if not fee:
-            return None
-        
-        new_paid = fee.paid_amount + amount
-        
-        return FeeRepository.update(
-            db, fee,
-            paid_amount=new_paid,
-            payment_date=payment_date or date.today()
-        )
+                      payment_date: date = None) -> Optional[Dict]:
+        """Record a payment for a fee.
+        
+        A single UPDATE ... RETURNING, so concurrent payments against the
+        same fee both count. Returns the updated row, or None if the fee
+        does not exist.
+        """
+        table = FeeRecord.__table__
+        today = date.today()
+        row = db.execute(
+            update(table)
+            .where(table.c.id == fee_id)
+            .values(**FeeRepository._payment_values(table, amount, payment_date or today, today))
+            .returning(*table.columns)
+        ).mappings().first()
+        db.commit()
+        FeeRepository.mark_changed()
+        return dict(row) if row else None
+    
+    @staticmethod
+    def record_payments_bulk(db: Session, payments: List[Dict]) -> Dict:
+        """Post many payments ({fee_id, amount, payment_date?}) in one transaction.
+        
+        Payments to the same fee are summed first; each fee is then
+        incremented by one executemany UPDATE. Payments to unknown fees are
+        reported and skipped.
+        """
+        today = date.today()
+        totals = defaultdict(float)
+        dates = {}
+        for payment in payments:
+            fee_id = payment['fee_id']
+            totals[fee_id] += payment['amount']
+            paid_on = payment.get('payment_date') or today
+            dates[fee_id] = max(paid_on, dates.get(fee_id, paid_on))
+        
+        existing = set()
+        fee_ids = list(totals)
+        for i in range(0, len(fee_ids), 1000):
+            existing.update(row[0] for row in db.query(FeeRecord.id).filter(FeeRecord.id.in_(fee_ids[i:i + 1000])))
+        
+        rows = [
+            {'b_id': fee_id, 'b_amount': totals[fee_id], 'b_date': dates[fee_id]}
+            for fee_id in fee_ids if fee_id in existing
+        ]
+        if rows:
+            table = FeeRecord.__table__
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam('b_id'))
+                .values(**FeeRepository._payment_values(table, bindparam('b_amount'), bindparam('b_date'), today)),
+                rows
+            )
+        db.commit()
+        FeeRepository.mark_changed()
+        
+        return {
+            'posted': sum(1 for payment in payments if payment['fee_id'] in existing),
+            'fees_updated': len(rows),
+            'amount_posted': sum(row['b_amount'] for row in rows),
+            'unknown_fee_ids': sorted(set(fee_ids) - existing)
+        }
+    
+    @staticmethod
+    def get_reconciled_line_keys(db: Session, keys: Iterable[str]) -> Set[str]:
+        """The given statement line keys that have already been posted"""
+        keys = list(keys)
+        posted = set()
+        for i in range(0, len(keys), 1000):
+            posted.update(row[0] for row in db.query(ReconciledStatementLine.line_key).filter(
+                ReconciledStatementLine.line_key.in_(keys[i:i + 1000])
+            ))
+        return posted
+    
+    @staticmethod
+    def record_statement_payments(db: Session, lines: List[Dict]) -> Dict:
+        """Post matched statement lines ({line_key, fee_id, amount, date, reference}).
+        
+        The line keys are inserted in the same transaction as the payments,
+        so a line already posted by a concurrent import fails the unique
+        constraint (IntegrityError) instead of being paid twice.
+        """
+        db.execute(insert(ReconciledStatementLine), [{
+            'line_key': line['line_key'],
+            'fee_id': line['fee_id'],
+            'amount': line['amount'],
+            'payment_date': line['date'],
+            'reference': (line['reference'] or '')[:255] or None
+        } for line in lines])
+        return FeeRepository.record_payments_bulk(db, [
+            {'fee_id': line['fee_id'], 'amount': line['amount'], 'payment_date': line['date']} for line in lines
+        ])
     
     @staticmethod
     def get_payment_history(db: Session, student_id: int) -> List[FeeRecord]:
@@ -176,4 +303,173 @@ class FeeRepository:
             FeeRecord.status.in_(['pending', 'partial'])
         ).update({'status': 'overdue'}, synchronize_session=False)
         
-        db.commit()
\ No newline at end of file
+        db.commit()
+        FeeRepository.mark_changed()
+    
+    # ------------------------------------------------------------------
+    # Ledger
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _overdue_expr(today: date):
+        """SQL flag: unpaid and past due, whether or not the nightly status update has run"""
+        return or_(
+            FeeRecord.status == 'overdue',
+            and_(FeeRecord.status.in_(UNPAID_STATUSES), FeeRecord.due_date < today)
+        )
+    
+    @staticmethod
+    def _ledger_filters(query, today: date, status: str = None, grade: str = None,
+                        fee_type: str = None, due_from: date = None, due_to: date = None,
+                        search: str = None):
+        if status == 'overdue':
+            query = query.filter(FeeRepository._overdue_expr(today))
+        elif status:
+            query = query.filter(FeeRecord.status == status)
+        if grade:
+            query = query.filter(Student.grade_level == grade)
+        if fee_type:
+            query = query.filter(func.lower(FeeRecord.fee_type) == fee_type.lower())
+        if due_from:
+            query = query.filter(FeeRecord.due_date >= due_from)
+        if due_to:
+            query = query.filter(FeeRecord.due_date <= due_to)
+        if search:
+            query = query.filter(or_(
+                Student.full_name.ilike(f"%{search}%"),
+                Student.student_id.ilike(f"%{search}%"),
+                Student.parent_name.ilike(f"%{search}%")
+            ))
+        return query
+    
+    @staticmethod
+    def encode_cursor(row: Dict) -> str:
+        return f"{row['due_date'].isoformat()}:{row['id']}"
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[date, int]:
+        """Raises ValueError for a malformed cursor"""
+        due_date, fee_id = cursor.split(':')
+        return date.fromisoformat(due_date), int(fee_id)
+    
+    @staticmethod
+    def get_ledger_page(db: Session, after: Optional[Tuple[date, int]] = None, limit: int = 50,
+                        **filters) -> List[Dict]:
+        """One page of fee records joined with student fields, newest due date first.
+        
+        Keyset-paginated on (due_date, id): pass the last row's
+        (due_date, id) as `after` to get the next page.
+        """
+        today = date.today()
+        query = db.query(
+            FeeRecord.id,
+            FeeRecord.student_id.label('student_pk'),
+            Student.student_id,
+            Student.full_name.label('student_name'),
+            Student.grade_level.label('grade'),
+            Student.section,
+            FeeRecord.fee_type,
+            FeeRecord.amount,
+            FeeRecord.paid_amount,
+            (FeeRecord.amount - FeeRecord.paid_amount).label('balance'),
+            FeeRecord.due_date,
+            FeeRecord.payment_date,
+            FeeRecord.status,
+            FeeRecord.remarks,
+            case((FeeRepository._overdue_expr(today), True), else_=False).label('is_overdue')
+        ).join(Student, FeeRecord.student_id == Student.id)
+        
+        query = FeeRepository._ledger_filters(query, today, **filters)
+        if after:
+            due_date, fee_id = after
+            query = query.filter(or_(
+                FeeRecord.due_date < due_date,
+                and_(FeeRecord.due_date == due_date, FeeRecord.id < fee_id)
+            ))
+        
+        rows = query.order_by(FeeRecord.due_date.desc(), FeeRecord.id.desc()).limit(limit).all()
+        return [dict(row._mapping) for row in rows]
+    
+    @staticmethod
+    def get_ledger_totals(db: Session, **filters) -> Dict:
+        """Counts and amounts over every record matching the ledger filters, in one query"""
+        today = date.today()
+        overdue = FeeRepository._overdue_expr(today)
+        balance = FeeRecord.amount - FeeRecord.paid_amount
+        query = db.query(
+            func.count(FeeRecord.id),
+            func.coalesce(func.sum(FeeRecord.amount), 0),
+            func.coalesce(func.sum(FeeRecord.paid_amount), 0),
+            func.coalesce(func.sum(case((FeeRecord.status.in_(UNPAID_STATUSES), balance), else_=0)), 0),
+            func.coalesce(func.sum(case((overdue, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((overdue, balance), else_=0)), 0),
+            func.count(func.distinct(case((overdue, FeeRecord.student_id))))
+        ).join(Student, FeeRecord.student_id == Student.id)
+        
+        count, total_amount, total_paid, pending, overdue_count, overdue_amount, overdue_students = \
+            FeeRepository._ledger_filters(query, today, **filters).one()
+        
+        return {
+            'record_count': count,
+            'total_amount': total_amount,
+            'total_paid': total_paid,
+            'pending_amount': pending,
+            'overdue_count': overdue_count,
+            'overdue_amount': overdue_amount,
+            'overdue_students': overdue_students,
+            'collection_rate': round(total_paid / total_amount * 100, 1) if total_amount else 0.0
+        }
+    
+    @staticmethod
+    def get_unpaid_due_dates_between(db: Session, start: date, end: date) -> List[date]:
+        """Distinct due dates in [start, end] that still have unpaid fees"""
+        return [row[0] for row in db.query(FeeRecord.due_date).filter(
+            FeeRecord.due_date >= start,
+            FeeRecord.due_date <= end,
+            FeeRecord.status.in_(['pending', 'partial'])
+        ).distinct().all()]
+    
+    @staticmethod
+    def mark_overdue_on(db: Session, due_date: date) -> List[int]:
+        """Flip unpaid fees due on one date to overdue; returns the affected student ids"""
+        table = FeeRecord.__table__
+        rows = db.execute(
+            update(table)
+            .where(table.c.due_date == due_date, table.c.status.in_(['pending', 'partial']))
+            .values(status='overdue')
+            .returning(table.c.student_id)
+        ).all()
+        db.commit()
+        FeeRepository.mark_changed()
+        return [row[0] for row in rows]
+    
+    @staticmethod
+    def iter_open_balances(db: Session):
+        """(fee_id, student code, student name, balance) for every unpaid fee,
+        oldest due first, streamed without building ORM objects"""
+        return db.query(
+            FeeRecord.id,
+            Student.student_id,
+            Student.full_name,
+            FeeRecord.amount - func.coalesce(FeeRecord.paid_amount, 0)
+        ).join(Student, FeeRecord.student_id == Student.id).filter(
+            FeeRecord.status.in_(UNPAID_STATUSES)
+        ).order_by(FeeRecord.due_date, FeeRecord.id).yield_per(5000)
+    
+    @staticmethod
+    def iter_aging_rows(db: Session):
+        """(grade_level, section, fee_type, due_date, amount, paid_amount, status)
+        for every fee record, streamed in one query"""
+        return db.query(
+            Student.grade_level,
+            Student.section,
+            FeeRecord.fee_type,
+            FeeRecord.due_date,
+            FeeRecord.amount,
+            func.coalesce(FeeRecord.paid_amount, 0),
+            FeeRecord.status
+        ).join(Student, FeeRecord.student_id == Student.id).yield_per(10000)
+    
+    @staticmethod
+    def get_fee_types(db: Session) -> List[str]:
+        return [row[0] for row in db.query(FeeRecord.fee_type).distinct().order_by(FeeRecord.fee_type).all()]
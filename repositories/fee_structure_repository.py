@@ -1,6 +1,21 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from models.models import FeeStructure
+from sqlalchemy import select, literal, func, and_, Date, Float, Integer, String, Text
+from typing import List, Optional, Tuple
+from datetime import datetime
+from database.upsert import dialect_insert
+from models.models import FeeStructure, FeeRecord, Student
+from repositories.fee_repository import FeeRepository
+
+# (fee_type, FeeStructure column) for each component turned into a fee record
+FEE_COMPONENTS = [
+    ("Tuition", "tuition_fee"),
+    ("Registration", "registration_fee"),
+    ("Library", "library_fee"),
+    ("Sports", "sports_fee"),
+    ("Lab", "lab_fee"),
+    ("Activity", "activity_fee"),
+    ("Other", "other_charges")
+]
 
 class FeeStructureRepository:
     @staticmethod
@@ -11,6 +26,13 @@ class FeeStructureRepository:
     def get_by_id(db: Session, structure_id: int) -> Optional[FeeStructure]:
         return db.query(FeeStructure).filter(FeeStructure.id == structure_id).first()
     
+    @staticmethod
+    def get_unfinished(db: Session) -> List[FeeStructure]:
+        """Structures whose application was queued or interrupted mid-run"""
+        return db.query(FeeStructure).filter(
+            FeeStructure.application_status.in_(['queued', 'running'])
+        ).order_by(FeeStructure.id).all()
+    
     @staticmethod
     def create(db: Session, data: dict) -> FeeStructure:
         structure = FeeStructure(**data)
@@ -32,3 +54,73 @@ class FeeStructureRepository:
     def delete(db: Session, structure: FeeStructure):
         db.delete(structure)
         db.commit()
+    
+    @staticmethod
+    def components(structure: FeeStructure) -> List[Tuple[str, float]]:
+        """(fee_type, amount) for the structure's non-zero components"""
+        return [
+            (fee_type, getattr(structure, column) or 0.0)
+            for fee_type, column in FEE_COMPONENTS
+            if (getattr(structure, column) or 0.0) > 0
+        ]
+    
+    @staticmethod
+    def apply_to_students(db: Session, structure: FeeStructure, chunk_size: int):
+        """Create the structure's fee records for every student in its grade.
+        
+        Students are walked in primary-key chunks; each chunk is one
+        INSERT ... SELECT per fee component and one commit, with progress
+        recorded on the structure. Rows that already exist for the
+        (student, structure, fee_type) are skipped by its unique
+        constraint, so an interrupted run can simply be started again and
+        two runs at once cannot bill a student twice.
+        """
+        in_grade = Student.grade_level == structure.grade_level
+        structure.application_status = 'running'
+        structure.application_error = None
+        structure.students_total = db.query(func.count(Student.id)).filter(in_grade).scalar()
+        structure.students_applied = 0
+        structure.records_created = 0
+        db.commit()
+        
+        components = FeeStructureRepository.components(structure)
+        remarks = f"Fee for {structure.academic_year}" if structure.academic_year else "Fee"
+        last_id = 0
+        while True:
+            ids = [row[0] for row in db.query(Student.id).filter(
+                in_grade, Student.id > last_id
+            ).order_by(Student.id).limit(chunk_size).all()]
+            if not ids:
+                break
+            
+            in_chunk = and_(in_grade, Student.id > last_id, Student.id <= ids[-1])
+            created = 0
+            for fee_type, amount in components:
+                rows = select(
+                    Student.id,
+                    literal(structure.id, Integer),
+                    literal(fee_type, String),
+                    literal(amount, Float),
+                    literal(structure.due_date, Date),
+                    literal(0.0, Float),
+                    literal('pending', String),
+                    literal(f"{fee_type} {remarks}", Text)
+                ).where(in_chunk)
+                
+                result = db.execute(dialect_insert(db, FeeRecord).from_select(
+                    ['student_id', 'fee_structure_id', 'fee_type', 'amount',
+                     'due_date', 'paid_amount', 'status', 'remarks'],
+                    rows
+                ).on_conflict_do_nothing(index_elements=['student_id', 'fee_structure_id', 'fee_type']))
+                created += result.rowcount
+            
+            last_id = ids[-1]
+            structure.students_applied += len(ids)
+            structure.records_created += created
+            db.commit()
+            FeeRepository.mark_changed()
+        
+        structure.application_status = 'completed'
+        structure.applied_at = datetime.utcnow()
+        db.commit()
+        FeeRepository.schedule_due_date(structure.due_date)
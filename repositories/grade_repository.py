@@ -1,9 +1,37 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
-from typing import List, Optional, Dict
-from models.models import Grade
+from sqlalchemy import func, case, update
+from typing import List, Optional, Dict, Tuple
+from datetime import date, datetime
+from utils.grading import DEFAULT_LETTER_BANDS
+from itertools import chain
+import numpy as np
+from models.models import Grade, Student, CourseEnrollment
+from repositories.analytics_repository import AnalyticsRepository
+from repositories.academic_repository import AcademicSummaryRepository
 
 class GradeRepository:
+    @staticmethod
+    def snapshot(grade: Grade) -> Optional[Dict]:
+        """Capture the fields derived tables depend on (None for unscorable or excluded rows)"""
+        if grade is None or grade.excluded or not grade.max_score or grade.max_score <= 0:
+            return None
+        day = grade.date.date() if isinstance(grade.date, datetime) else grade.date
+        return {
+            'student_id': grade.student_id,
+            'course_id': grade.course_id,
+            'grade_type': grade.grade_type,
+            'day': day or date.today(),
+            'score': grade.score,
+            'max_score': grade.max_score,
+            'percentage': grade.score / grade.max_score * 100
+        }
+    
+    @staticmethod
+    def _sync_derived(db: Session, changes: List[tuple]):
+        """Propagate (old, new) grade snapshots to derived tables before commit"""
+        AnalyticsRepository.apply_grade_changes(db, changes)
+        AcademicSummaryRepository.apply_grade_changes(db, changes)
+    
     @staticmethod
     def get_by_id(db: Session, grade_id: int) -> Optional[Grade]:
         return db.query(Grade).filter(Grade.id == grade_id).first()
@@ -12,6 +40,8 @@ class GradeRepository:
     def create(db: Session, grade_data: dict) -> Grade:
         grade = Grade(**grade_data)
         db.add(grade)
+        db.flush()
+        GradeRepository._sync_derived(db, [(None, GradeRepository.snapshot(grade))])
         db.commit()
         db.refresh(grade)
         return grade
@@ -21,6 +51,10 @@ class GradeRepository:
         """Create multiple grades at once"""
         grades = [Grade(**data) for data in grades_list]
         db.add_all(grades)
+        db.flush()
+        GradeRepository._sync_derived(
+            db, [(None, GradeRepository.snapshot(g)) for g in grades]
+        )
         db.commit()
         for grade in grades:
             db.refresh(grade)
@@ -28,18 +62,120 @@ class GradeRepository:
     
     @staticmethod
     def update(db: Session, grade: Grade, **kwargs) -> Grade:
+        old = GradeRepository.snapshot(grade)
         for key, value in kwargs.items():
             if value is not None and hasattr(grade, key):
                 setattr(grade, key, value)
+        db.flush()
+        GradeRepository._sync_derived(db, [(old, GradeRepository.snapshot(grade))])
         db.commit()
         db.refresh(grade)
         return grade
     
     @staticmethod
     def delete(db: Session, grade: Grade):
+        old = GradeRepository.snapshot(grade)
         db.delete(grade)
+        db.flush()
+        GradeRepository._sync_derived(db, [(old, None)])
         db.commit()
     
+    @staticmethod
+    def apply_score_updates(db: Session, course_id: int, updates: List[Dict]):
+        """Write transformed scores/letters in one executemany UPDATE by primary key.
+
+        Each update carries the grade's id, student_id, grade_type, date,
+        max_score, old_score, score and grade so derived tables get (old, new) deltas
+        without reloading the rows.
+        """
+        if not updates:
+            return
+        
+        def snapshot(u: Dict, score: float) -> Dict:
+            return {
+                'student_id': u['student_id'],
+                'course_id': course_id,
+                'grade_type': u['grade_type'],
+                'day': u['date'] or date.today(),
+                'score': score,
+                'max_score': u['max_score'],
+                'percentage': score / u['max_score'] * 100
+            }
+        
+        db.execute(update(Grade), [
+            {'id': u['id'], 'score': u['score'], 'grade': u['grade']} for u in updates
+        ])
+        GradeRepository._sync_derived(db, [
+            (snapshot(u, u['old_score']), snapshot(u, u['score'])) for u in updates
+        ])
+        db.commit()
+    
+    @staticmethod
+    def set_excluded_bulk(db: Session, course_id: int, changes: List[Dict]):
+        """Set the exclusion flag of many grades in one executemany UPDATE.
+
+        Changes carry the same fields as apply_score_updates plus the new
+        'excluded' value; an excluded grade leaves the derived tables and a
+        restored one is counted again.
+        """
+        if not changes:
+            return
+        
+        def snapshot(c: Dict) -> Dict:
+            return {
+                'student_id': c['student_id'],
+                'course_id': course_id,
+                'grade_type': c['grade_type'],
+                'day': c['date'] or date.today(),
+                'score': c['score'],
+                'max_score': c['max_score'],
+                'percentage': c['score'] / c['max_score'] * 100
+            }
+        
+        db.execute(update(Grade), [{'id': c['id'], 'excluded': c['excluded']} for c in changes])
+        GradeRepository._sync_derived(db, [
+            (None, snapshot(c)) if not c['excluded'] else (snapshot(c), None) for c in changes
+        ])
+        db.commit()
+    
+    @staticmethod
+    def reband_letters(db: Session, course_id: int, grade_type: str = None,
+                       bands: List[Tuple[float, str]] = None) -> int:
+        """Re-assign letter grades from percentages with one set-based UPDATE"""
+        bands = sorted(bands or DEFAULT_LETTER_BANDS, reverse=True)
+        percentage = Grade.score * 100.0 / Grade.max_score
+        letter = case(
+            *[(percentage >= minimum, value) for minimum, value in bands],
+            else_=bands[-1][1]
+        )
+        
+        query = db.query(Grade).filter(
+            Grade.course_id == course_id, Grade.max_score > 0, Grade.excluded == False
+        )
+        if grade_type:
+            query = query.filter(Grade.grade_type == grade_type)
+        
+        updated = query.update({Grade.grade: letter}, synchronize_session=False)
+        db.commit()
+        return updated
+    
+    @staticmethod
+    def get_transform_rows(db: Session, course_id: int, grade_type: str = None,
+                           include_excluded: bool = False) -> List[tuple]:
+        """Scorable course grades as (id, student_id, date, score, max_score, grade, grade_type, excluded) tuples"""
+        query = db.query(
+            Grade.id, Grade.student_id, Grade.date, Grade.score, Grade.max_score, Grade.grade,
+            Grade.grade_type, Grade.excluded
+        ).filter(Grade.course_id == course_id, Grade.max_score > 0)
+        
+        if not include_excluded:
+            query = query.filter(Grade.excluded == False)
+        
+        if grade_type:
+            query = query.filter(Grade.grade_type == grade_type)
+        
+        return query.order_by(Grade.id).all()
+    
     @staticmethod
     def get_student_grades(db: Session, student_id: int, 
                           course_id: int = None) -> List[Grade]:
@@ -64,6 +200,49 @@ class GradeRepository:
         
         return query.order_by(Grade.date.desc()).all()
     
+    @staticmethod
+    def get_score_arrays(db: Session, course_id: int = None, grade_level: str = None,
+                         grade_type: str = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Fetch (student_ids, scores, max_scores) as parallel arrays in one projected query"""
+        query = db.query(Grade.student_id, Grade.score, Grade.max_score).filter(Grade.excluded == False)
+        
+        if course_id:
+            query = query.filter(Grade.course_id == course_id)
+        
+        if grade_level:
+            query = query.join(Student, Grade.student_id == Student.id).filter(
+                Student.grade_level == grade_level
+            )
+        
+        if grade_type:
+            query = query.filter(Grade.grade_type == grade_type)
+        
+        rows = query.all()
+        flat = np.fromiter(chain.from_iterable(rows), dtype=float, count=len(rows) * 3)
+        flat = flat.reshape(-1, 3)
+        return flat[:, 0].astype(np.int64), flat[:, 1], flat[:, 2]
+    
+    @staticmethod
+    def get_gradebook_rows(db: Session, course_id: int) -> List[tuple]:
+        """Enrolled students outer-joined to their course grades, as plain tuples:
+        (student pk, student code, name, grade_type, date, score, max_score)"""
+        return db.query(
+            Student.id,
+            Student.student_id,
+            Student.full_name,
+            Grade.grade_type,
+            Grade.date,
+            Grade.score,
+            Grade.max_score
+        ).join(
+            CourseEnrollment, CourseEnrollment.student_id == Student.id
+        ).outerjoin(
+            Grade,
+            (Grade.student_id == Student.id) & (Grade.course_id == course_id) & (Grade.excluded == False)
+        ).filter(
+            CourseEnrollment.course_id == course_id
+        ).all()
+    
     @staticmethod
     def get_grade_statistics(db: Session, student_id: int, 
                            course_id: int = None) -> Dict:
@@ -73,7 +252,7 @@ class GradeRepository:
             func.max(Grade.score / Grade.max_score * 100).label('highest'),
             func.min(Grade.score / Grade.max_score * 100).label('lowest'),
             func.count(Grade.id).label('total_grades')
-        ).filter(Grade.student_id == student_id)
+        ).filter(Grade.student_id == student_id, Grade.excluded == False)
         
         if course_id:
             query = query.filter(Grade.course_id == course_id)
@@ -96,7 +275,7 @@ class GradeRepository:
             func.max(Grade.score / Grade.max_score * 100).label('highest'),
             func.min(Grade.score / Grade.max_score * 100).label('lowest'),
             func.count(func.distinct(Grade.student_id)).label('total_students')
-        ).filter(Grade.course_id == course_id)
+        ).filter(Grade.course_id == course_id, Grade.excluded == False)
         
         if grade_type:
             query = query.filter(Grade.grade_type == grade_type)
@@ -112,24 +291,9 @@ class GradeRepository:
     
     @staticmethod
     def get_gpa(db: Session, student_id: int) -> float:
-        """Calculate GPA (simplified version)"""
-        grade_points = {
-            'A+': 4.0, 'A': 4.0, 'A-': 3.7,
-            'B+': 3.3, 'B': 3.0, 'B-': 2.7,
-            'C+': 2.3, 'C': 2.0, 'C-': 1.7,
-            'D': 1.0, 'F': 0.0
-        }
-        
-        grades = db.query(Grade).filter(
-            Grade.student_id == student_id,
-            Grade.grade.isnot(None)
-        ).all()
-        
-        if not grades:
-            return 0.0
-        
-        total_points = sum(grade_points.get(g.grade, 0) for g in grades)
-        return round(total_points / len(grades), 2)
+        """Credit-weighted GPA from the maintained academic summary"""
+        summary = AcademicSummaryRepository.get_summary(db, student_id)
+        return summary.weighted_gpa if summary else 0.0
     
     @staticmethod
     def get_grade_distribution(db: Session, course_id: int) -> Dict:
@@ -139,7 +303,8 @@ class GradeRepository:
             func.count(Grade.id).label('count')
         ).filter(
             Grade.course_id == course_id,
-            Grade.grade.isnot(None)
+            Grade.grade.isnot(None),
+            Grade.excluded == False
         ).group_by(Grade.grade).all()
         
         return {grade: count for grade, count in results}
@@ -147,27 +312,9 @@ class GradeRepository:
     @staticmethod
     def get_top_performers(db: Session, course_id: int, limit: int = 10) -> List[Dict]:
         """Get top performing students in a course"""
-        results = db.query(
-            Grade.student_id,
-            func.avg(Grade.score / Grade.max_score * 100).label('average')
-        ).filter(
-            Grade.course_id == course_id
-        ).group_by(
-            Grade.student_id
-        ).order_by(
-            func.avg(Grade.score / Grade.max_score * 100).desc()
-        ).limit(limit).all()
-        
-        top_performers = []
-        for student_id, average in results:
-            student = db.query(Grade.student).filter(
-                Grade.student_id == student_id
-            ).first()
-            
-            if student:
-                top_performers.append({
-                    'student': student.student,
-                    'average': round(average, 2)
-                })
-        
-        return top_performers
\ No newline at end of file
+        averages = AcademicSummaryRepository.get_top_in_course(db, course_id, limit)
+        
+        return [{
+            'student': a.student,
+            'average': round(a.course_percentage, 2)
+        } for a in averages]
@@ -0,0 +1,96 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from typing import Any, Dict, List, Optional, Set
+from models.test_models import BankQuestion, StudentPaper, QuestionDifficulty
+
+class QuestionBankRepository:
+    @staticmethod
+    def create(db: Session, question_data: Dict[str, Any]) -> BankQuestion:
+        question = BankQuestion(**question_data)
+        db.add(question)
+        db.commit()
+        db.refresh(question)
+        return question
+
+    @staticmethod
+    def get_by_id(db: Session, question_id: int) -> Optional[BankQuestion]:
+        return db.query(BankQuestion).filter(BankQuestion.id == question_id).first()
+
+    @staticmethod
+    def get_by_course(db: Session, course_id: int, tag: Optional[str] = None,
+                      difficulty: Optional[QuestionDifficulty] = None,
+                      include_retired: bool = False) -> List[BankQuestion]:
+        query = db.query(BankQuestion).filter(BankQuestion.course_id == course_id)
+        if difficulty:
+            query = query.filter(BankQuestion.difficulty == difficulty)
+        if not include_retired:
+            query = query.filter(BankQuestion.is_active == True)
+        questions = query.order_by(BankQuestion.id).all()
+        if tag:
+            tag = tag.strip().lower()
+            questions = [q for q in questions if tag in {t.strip().lower() for t in q.tags or []}]
+        return questions
+
+    @staticmethod
+    def update(db: Session, question: BankQuestion, **kwargs) -> BankQuestion:
+        for key, value in kwargs.items():
+            if hasattr(question, key):
+                setattr(question, key, value)
+        db.commit()
+        db.refresh(question)
+        return question
+
+    @staticmethod
+    def get_pool(db: Session, course_id: int) -> List[tuple]:
+        """(id, type, options, difficulty, tags, points) of the course's active questions"""
+        return db.query(
+            BankQuestion.id, BankQuestion.question_type, BankQuestion.options,
+            BankQuestion.difficulty, BankQuestion.tags, BankQuestion.points
+        ).filter(
+            BankQuestion.course_id == course_id,
+            BankQuestion.is_active == True
+        ).order_by(BankQuestion.id).all()
+
+    @staticmethod
+    def get_course_questions(db: Session, course_id: int) -> List[BankQuestion]:
+        """Every question of the course, retired ones included (drawn papers may use them)"""
+        return db.query(BankQuestion).filter(BankQuestion.course_id == course_id).all()
+
+    @staticmethod
+    def get_paper(db: Session, test_id: int, student_id: int) -> Optional[StudentPaper]:
+        return db.query(StudentPaper).filter(
+            StudentPaper.test_id == test_id,
+            StudentPaper.student_id == student_id
+        ).first()
+
+    @staticmethod
+    def get_papers(db: Session, test_id: int, student_ids: List[int]) -> Dict[int, tuple]:
+        """student id -> (question_ids, option_orders)"""
+        return {
+            student_id: (question_ids, option_orders) for student_id, question_ids, option_orders in
+            db.query(StudentPaper.student_id, StudentPaper.question_ids, StudentPaper.option_orders).filter(
+                StudentPaper.test_id == test_id,
+                StudentPaper.student_id.in_(student_ids)
+            ).all()
+        }
+
+    @staticmethod
+    def get_paper_student_ids(db: Session, test_id: int) -> Set[int]:
+        return {row[0] for row in db.query(StudentPaper.student_id).filter(StudentPaper.test_id == test_id).all()}
+
+    @staticmethod
+    def create_paper(db: Session, test_id: int, student_id: int,
+                     question_ids: List[int], option_orders: List[Optional[List[int]]]) -> StudentPaper:
+        paper = StudentPaper(test_id=test_id, student_id=student_id,
+                             question_ids=question_ids, option_orders=option_orders)
+        db.add(paper)
+        db.commit()
+        db.refresh(paper)
+        return paper
+
+    @staticmethod
+    def create_papers_bulk(db: Session, rows: List[Dict[str, Any]]):
+        """Insert many drawn papers with one executemany"""
+        if rows:
+            db.execute(insert(StudentPaper.__table__), rows)
+            db.commit()
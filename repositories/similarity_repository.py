@@ -0,0 +1,109 @@
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import insert, and_, or_
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from models.models import Assignment, AssignmentSubmission, Student, User
+from models.similarity_models import SubmissionFingerprint, SubmissionLSHBand
+
+class SimilarityRepository:
+    @staticmethod
+    def save_fingerprint(db: Session, submission_id: int, assignment_id: int, course_id: int,
+                         signature: Optional[bytes], shingle_count: int, file_sha256: Optional[str],
+                         bucket_keys: Sequence[int]):
+        """Store (or replace) a submission's fingerprint and its LSH bands"""
+        db.query(SubmissionLSHBand).filter(SubmissionLSHBand.submission_id == submission_id).delete()
+        db.query(SubmissionFingerprint).filter(SubmissionFingerprint.submission_id == submission_id).delete()
+        db.add(SubmissionFingerprint(
+            submission_id=submission_id,
+            assignment_id=assignment_id,
+            course_id=course_id,
+            signature=signature,
+            shingle_count=shingle_count,
+            file_sha256=file_sha256
+        ))
+        if bucket_keys:
+            db.execute(insert(SubmissionLSHBand.__table__), [{
+                'submission_id': submission_id,
+                'assignment_id': assignment_id,
+                'course_id': course_id,
+                'band': band,
+                'bucket': bucket
+            } for band, bucket in enumerate(bucket_keys)])
+        db.commit()
+
+    @staticmethod
+    def get_unindexed_submissions(db: Session, limit: int) -> List[tuple]:
+        """(id, assignment_id, course_id, submission_text, file_path) of submissions without a fingerprint"""
+        indexed = db.query(SubmissionFingerprint.submission_id)
+        return db.query(
+            AssignmentSubmission.id, AssignmentSubmission.assignment_id, Assignment.course_id,
+            AssignmentSubmission.submission_text, AssignmentSubmission.file_path
+        ).join(
+            Assignment, Assignment.id == AssignmentSubmission.assignment_id
+        ).filter(
+            ~AssignmentSubmission.id.in_(indexed)
+        ).order_by(AssignmentSubmission.id).limit(limit).all()
+
+    @staticmethod
+    def _pair_filter(left, right, assignment_id: int, course_id: Optional[int]):
+        """Left side in the assignment; right side in the assignment (each pair
+        once) or, with course_id, anywhere in that course"""
+        if course_id is None:
+            return and_(
+                left.assignment_id == assignment_id,
+                right.assignment_id == assignment_id,
+                left.submission_id < right.submission_id
+            )
+        return and_(
+            left.assignment_id == assignment_id,
+            right.course_id == course_id,
+            or_(right.assignment_id != assignment_id, left.submission_id < right.submission_id)
+        )
+
+    @staticmethod
+    def get_candidate_pairs(db: Session, assignment_id: int, course_id: Optional[int] = None) -> Set[Tuple[int, int]]:
+        """(submission in the assignment, other submission) pairs sharing an LSH bucket"""
+        left, right = aliased(SubmissionLSHBand), aliased(SubmissionLSHBand)
+        rows = db.query(left.submission_id, right.submission_id).join(
+            right, and_(right.band == left.band, right.bucket == left.bucket)
+        ).filter(
+            SimilarityRepository._pair_filter(left, right, assignment_id, course_id)
+        ).distinct().all()
+        return {(a, b) for a, b in rows}
+
+    @staticmethod
+    def get_identical_file_pairs(db: Session, assignment_id: int, course_id: Optional[int] = None) -> Set[Tuple[int, int]]:
+        """Pairs whose uploaded files have the same SHA-256"""
+        left, right = aliased(SubmissionFingerprint), aliased(SubmissionFingerprint)
+        rows = db.query(left.submission_id, right.submission_id).join(
+            right, right.file_sha256 == left.file_sha256
+        ).filter(
+            left.file_sha256.isnot(None),
+            SimilarityRepository._pair_filter(left, right, assignment_id, course_id)
+        ).all()
+        return {(a, b) for a, b in rows}
+
+    @staticmethod
+    def get_signatures(db: Session, submission_ids: Sequence[int]) -> Dict[int, bytes]:
+        if not submission_ids:
+            return {}
+        return dict(db.query(SubmissionFingerprint.submission_id, SubmissionFingerprint.signature).filter(
+            SubmissionFingerprint.submission_id.in_(submission_ids),
+            SubmissionFingerprint.signature.isnot(None)
+        ).all())
+
+    @staticmethod
+    def get_submission_details(db: Session, submission_ids: Sequence[int]) -> Dict[int, tuple]:
+        """submission id -> (student id, student name, assignment id, assignment title, submitted_at)"""
+        if not submission_ids:
+            return {}
+        rows = db.query(
+            AssignmentSubmission.id, Student.id, User.full_name,
+            Assignment.id, Assignment.title, AssignmentSubmission.submitted_at
+        ).join(
+            Student, Student.id == AssignmentSubmission.student_id
+        ).join(
+            User, User.id == Student.user_id
+        ).join(
+            Assignment, Assignment.id == AssignmentSubmission.assignment_id
+        ).filter(AssignmentSubmission.id.in_(submission_ids)).all()
+        return {row[0]: tuple(row[1:]) for row in rows}
@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from models.models import Student, User, CourseEnrollment, Course
+from repositories.academic_repository import AcademicSummaryRepository
+from repositories.attendance_summary_repository import AttendanceSummaryRepository
 from datetime import datetime
 
 class StudentRepository:
@@ -63,6 +65,12 @@ class StudentRepository:
         for key, value in kwargs.items():
             if value is not None and hasattr(student, key):
                 setattr(student, key, value)
+        
+        # Keep ranking scopes in step with the student's placement
+        if 'grade_level' in kwargs or 'section' in kwargs:
+            AcademicSummaryRepository.sync_student_placement(db, student)
+            AttendanceSummaryRepository.sync_student_placement(db, student)
+        
         db.commit()
         db.refresh(student)
         return student
@@ -89,6 +97,15 @@ class StudentRepository:
         db.commit()
         return enrollment
     
+    @staticmethod
+    def is_enrolled(db: Session, student_id: int, course_id: int) -> bool:
+        return db.query(
+            db.query(CourseEnrollment).filter(
+                CourseEnrollment.student_id == student_id,
+                CourseEnrollment.course_id == course_id
+            ).exists()
+        ).scalar()
+    
     @staticmethod
     def unenroll_from_course(db: Session, student_id: int, course_id: int):
         enrollment = db.query(CourseEnrollment).filter(
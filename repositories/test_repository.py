@@ -1,16 +1,18 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc
+from sqlalchemy import and_, or_, desc, func, update, bindparam
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from models.test_models import Test, TestQuestion, TestSubmission
+from models.models import Student
 from tables.test_tables import TestUpdate
+from utils.deadline_queue import deadlines
 
 class TestRepository:
     @staticmethod
     def create(db: Session, test_data: Dict[str, Any], questions_data: List[Dict[str, Any]]) -> Test:
         # Calculate total points
         total_points = sum(q.get('points', 1.0) for q in questions_data)
-        test_data['total_points'] = total_points
+        test_data.setdefault('total_points', total_points)  # drawn tests pass their expected total
         
         test = Test(**test_data)
         db.add(test)
@@ -22,8 +24,22 @@ class TestRepository:
             
         db.commit()
         db.refresh(test)
+        TestRepository.schedule_deadlines(test)
         return test
 
+    @staticmethod
+    def schedule_deadlines(test: Test):
+        # Only future events: an edit must not replay an open/close that already fired
+        now = datetime.utcnow()
+        if test.is_active:
+            if test.start_time > now:
+                deadlines.schedule('test_open', test.id, test.start_time)
+            if test.end_time > now:
+                deadlines.schedule('test_close', test.id, test.end_time)
+        else:
+            deadlines.cancel('test_open', test.id)
+            deadlines.cancel('test_close', test.id)
+
     @staticmethod
     def get_all(db: Session, teacher_id: Optional[int] = None) -> List[Test]:
         query = db.query(Test)
@@ -42,10 +58,13 @@ class TestRepository:
                 setattr(test, key, value)
         db.commit()
         db.refresh(test)
+        TestRepository.schedule_deadlines(test)
         return test
 
     @staticmethod
     def delete(db: Session, test: Test):
+        deadlines.cancel('test_open', test.id)
+        deadlines.cancel('test_close', test.id)
         db.delete(test)
         db.commit()
 
@@ -91,3 +110,139 @@ class TestRepository:
             TestSubmission.test_id == test_id,
             TestSubmission.submitted_at.isnot(None)
         ).all()
+
+    @staticmethod
+    def get_deadlines_between(db: Session, start: datetime, end: datetime) -> List[tuple]:
+        """(id, start_time, end_time) of active tests opening or closing in (start, end]"""
+        return db.query(Test.id, Test.start_time, Test.end_time).filter(
+            Test.is_active == True,
+            or_(
+                and_(Test.start_time > start, Test.start_time <= end),
+                and_(Test.end_time > start, Test.end_time <= end)
+            )
+        ).all()
+
+    @staticmethod
+    def get_open_answers(db: Session, submission_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """answers of the given submissions that have not been submitted yet"""
+        return {
+            submission_id: answers or {} for submission_id, answers in
+            db.query(TestSubmission.id, TestSubmission.answers).filter(
+                TestSubmission.id.in_(submission_ids),
+                TestSubmission.submitted_at.is_(None)
+            ).all()
+        }
+
+    @staticmethod
+    def update_answers_bulk(db: Session, answers: Dict[int, Dict[str, Any]]):
+        """Write whole answer sets in one executemany; submitted attempts are left alone"""
+        if not answers:
+            return
+        table = TestSubmission.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam('b_id'), table.c.submitted_at.is_(None))
+            .values(answers=bindparam('b_answers')),
+            [{'b_id': submission_id, 'b_answers': value} for submission_id, value in answers.items()]
+        )
+        db.commit()
+
+    @staticmethod
+    def submit_answers(db: Session, submission_id: int, answers: Dict[str, Any],
+                       submitted_at: datetime, time_taken: int) -> bool:
+        """Record the final answers unless the attempt was already submitted"""
+        table = TestSubmission.__table__
+        result = db.execute(
+            update(table)
+            .where(table.c.id == submission_id, table.c.submitted_at.is_(None))
+            .values(answers=answers, submitted_at=submitted_at, time_taken=time_taken)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    def submit_open_attempts(db: Session, test_id: int, submitted_at: datetime) -> List[tuple]:
+        """Submit every open attempt as of `submitted_at`; returns (submission id, student id) pairs"""
+        attempts = db.query(TestSubmission.id, TestSubmission.student_id, TestSubmission.started_at).filter(
+            TestSubmission.test_id == test_id,
+            TestSubmission.submitted_at.is_(None)
+        ).all()
+        if not attempts:
+            return []
+        table = TestSubmission.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam('b_id'), table.c.submitted_at.is_(None))
+            .values(submitted_at=submitted_at, time_taken=bindparam('b_time_taken')),
+            [{
+                'b_id': submission_id,
+                'b_time_taken': int((submitted_at - started_at).total_seconds()) if started_at else None
+            } for submission_id, _, started_at in attempts]
+        )
+        db.commit()
+        return [(submission_id, student_id) for submission_id, student_id, _ in attempts]
+
+    @staticmethod
+    def get_ungraded_submissions(db: Session, limit: int) -> List[tuple]:
+        """(id, test_id, student_id, answers, user id) of submitted attempts without a score, oldest first.
+
+        Rows whose test no longer exists (left behind where foreign keys are
+        not enforced) have no answer key and are never claimed, so the
+        worker does not spin on them.
+        """
+        return db.query(
+            TestSubmission.id, TestSubmission.test_id, TestSubmission.student_id,
+            TestSubmission.answers, Student.user_id
+        ).join(Student, Student.id == TestSubmission.student_id).join(
+            Test, Test.id == TestSubmission.test_id
+        ).filter(
+            TestSubmission.submitted_at.isnot(None),
+            TestSubmission.score.is_(None)
+        ).order_by(TestSubmission.submitted_at).limit(limit).all()
+
+    @staticmethod
+    def update_scores_bulk(db: Session, scores: List[Dict[str, Any]]):
+        """Store score/max_score/percentage/is_graded for many submissions in one executemany"""
+        if not scores:
+            return
+        table = TestSubmission.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam('b_id'))
+            .values(
+                score=bindparam('b_score'),
+                max_score=bindparam('b_max_score'),
+                percentage=bindparam('b_percentage'),
+                is_graded=bindparam('b_is_graded')
+            ),
+            [{
+                'b_id': s['id'],
+                'b_score': s['score'],
+                'b_max_score': s['max_score'],
+                'b_percentage': s['percentage'],
+                'b_is_graded': s['is_graded']
+            } for s in scores]
+        )
+        db.commit()
+
+    @staticmethod
+    def get_graded_signature(db: Session, test_id: int) -> tuple:
+        """(count, score sum, latest submission) of scored submissions; changes whenever grading does"""
+        return tuple(db.query(
+            func.count(TestSubmission.id),
+            func.sum(TestSubmission.score),
+            func.max(TestSubmission.submitted_at)
+        ).filter(
+            TestSubmission.test_id == test_id,
+            TestSubmission.submitted_at.isnot(None),
+            TestSubmission.score.isnot(None)
+        ).one())
+
+    @staticmethod
+    def get_graded_answers(db: Session, test_id: int) -> List[tuple]:
+        """(answers, score) of every scored submission"""
+        return db.query(TestSubmission.answers, TestSubmission.score).filter(
+            TestSubmission.test_id == test_id,
+            TestSubmission.submitted_at.isnot(None),
+            TestSubmission.score.isnot(None)
+        ).order_by(TestSubmission.id).all()
@@ -1,22 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
-import os
-import shutil
+import logging
 from database.database import get_db
 from dependencies import get_current_user, get_current_teacher, get_current_student
 from models.models import User, UserRole
 from repositories.assignment_repository import AssignmentRepository
 from repositories.teacher_repository import TeacherRepository
 from repositories.student_repository import StudentRepository
+from services.submission_similarity_service import SubmissionSimilarityService
 from tables.tables import (
     AssignmentCreate, AssignmentUpdate, AssignmentResponse,
     AssignmentSubmissionCreate, AssignmentSubmissionUpdate, AssignmentSubmissionResponse
 )
 from config.config import settings
+from services.blob_service import BlobService
+from utils.uploads import receive_form
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # TEACHER ENDPOINTS
 
@@ -40,11 +43,11 @@ async def create_assignment(
 @router.post("/{assignment_id}/upload")
 async def upload_assignment_file(
     assignment_id: int,
-    file: UploadFile = File(...),
+    request: Request,
     current_user: User = Depends(get_current_teacher),
     db: Session = Depends(get_db)
 ):
-    """Upload file for assignment (Teacher only)"""
+    """Upload file for assignment (Teacher only). Multipart form: file."""
     teacher = TeacherRepository.get_by_user_id(db, current_user.id)
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher profile not found")
@@ -56,22 +59,14 @@ async def upload_assignment_file(
     if assignment.teacher_id != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Validate file
-    file_ext = os.path.splitext(file.filename)[1].lower().replace('.', '')
-    if file_ext not in settings.allowed_extensions_list:
-        raise HTTPException(status_code=400, detail="File type not allowed")
-    
-    # Save file
     upload_dir = f"{settings.UPLOAD_DIR}/assignments"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    file_path = f"{upload_dir}/{assignment_id}_{file.filename}"
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    async with receive_form(request, upload_dir, settings.MAX_FILE_SIZE, settings.allowed_extensions_list) as form:
+        file_path = BlobService.store(db, form.file)
     
-    # Update assignment
+    # Update assignment, releasing the file it replaces
+    previous_path = assignment.file_path
     updated_assignment = AssignmentRepository.update(db, assignment, file_path=file_path)
+    BlobService.release(db, [previous_path])
     
     return {"message": "File uploaded successfully", "file_path": file_path}
 
@@ -116,6 +111,33 @@ async def get_assignment_submissions(
         "pending": sum(1 for s in submissions if s.score is None)
     }
 
+@router.get("/{assignment_id}/similarity")
+async def get_similar_submissions(
+    assignment_id: int,
+    threshold: Optional[float] = Query(None, ge=0.0, le=1.0),
+    across_course: bool = False,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Near-duplicate submission pairs for an assignment (Teacher only).
+
+    With across_course=true submissions are also compared with those of the
+    course's other assignments, including earlier years'.
+    """
+    teacher = TeacherRepository.get_by_user_id(db, current_user.id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+    
+    assignment = AssignmentRepository.get_by_id(db, assignment_id)
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    
+    if assignment.teacher_id != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    pairs = SubmissionSimilarityService.find_similar(db, assignment, threshold, across_course)
+    return {"assignment_id": assignment_id, "pairs": pairs, "total_pairs": len(pairs)}
+
 @router.put("/submissions/{submission_id}/grade")
 async def grade_submission(
     submission_id: int,
@@ -184,7 +206,9 @@ async def delete_assignment(
     if assignment.teacher_id != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    file_paths = [assignment.file_path] + [s.file_path for s in assignment.submissions]
     AssignmentRepository.delete(db, assignment)
+    BlobService.release(db, file_paths)
     return {"message": "Assignment deleted successfully"}
 
 # STUDENT ENDPOINTS
@@ -205,12 +229,14 @@ async def get_assignment(
 @router.post("/{assignment_id}/submit")
 async def submit_assignment(
     assignment_id: int,
-    file: Optional[UploadFile] = File(None),
-    submission_text: Optional[str] = Form(None),
+    request: Request,
     current_user: User = Depends(get_current_student),
     db: Session = Depends(get_db)
 ):
-    """Submit an assignment (Student)"""
+    """Submit an assignment (Student).
+    
+    Multipart form: submission_text and/or file (both optional).
+    """
     student = StudentRepository.get_by_user_id(db, current_user.id)
     if not student:
         raise HTTPException(status_code=404, detail="Student profile not found")
@@ -224,20 +250,14 @@ async def submit_assignment(
     if existing:
         raise HTTPException(status_code=400, detail="Assignment already submitted")
     
-    file_path = None
-    if file:
-        # Validate and save file
-        file_ext = os.path.splitext(file.filename)[1].lower().replace('.', '')
-        if file_ext not in settings.allowed_extensions_list:
-            raise HTTPException(status_code=400, detail="File type not allowed")
-        
-        upload_dir = f"{settings.UPLOAD_DIR}/assignments/submissions"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        file_path = f"{upload_dir}/{student.id}_{assignment_id}_{file.filename}"
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+    upload_dir = f"{settings.UPLOAD_DIR}/assignments/submissions"
+    async with receive_form(request, upload_dir, settings.MAX_FILE_SIZE, settings.allowed_extensions_list,
+                            file_required=False) as form:
+        submission_text = form.get("submission_text")
+        file_path, file_sha256 = None, None
+        if form.file:
+            file_path = BlobService.store(db, form.file)
+            file_sha256 = form.file.sha256
     
     # Create submission
     submission_data = {
@@ -250,6 +270,16 @@ async def submit_assignment(
     
     submission = AssignmentRepository.create_submission(db, submission_data)
     
+    try:
+        SubmissionSimilarityService.index_submission(
+            db, submission.id, assignment_id, assignment.course_id, submission_text, file_path, file_sha256
+        )
+    except Exception as e:
+        # The startup backfill fingerprints it later
+        db.rollback()
+        logger.error(f"Error fingerprinting submission {submission.id}: {e}")
+    db.refresh(submission)
+    
     return {"message": "Assignment submitted successfully", "submission": submission}
 
 @router.get("/{assignment_id}/my-submission")
@@ -1,15 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Header
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import date
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional
+import secrets
+from collections import Counter
+from datetime import date, datetime
 from database.database import get_db
-from dependencies import get_current_teacher, get_current_student, get_current_user
-from models.models import User
+from dependencies import get_current_teacher, get_current_student, get_current_user, get_current_authority, get_current_teacher_or_authority
+from config.config import settings
+from models.models import User, Student
 from repositories.attendance_repository import AttendanceRepository
 from repositories.teacher_repository import TeacherRepository
 from repositories.student_repository import StudentRepository
 from repositories.course_repository import CourseRepository
-from tables.tables import AttendanceCreate, AttendanceResponse
+from repositories.attendance_summary_repository import AttendanceSummaryRepository
+from services.attendance_service import AttendanceService
+from services.attendance_tap_service import tap_buffer, BufferFull
+from tables.tables import AttendanceCreate, AttendanceResponse, StudentCardAssignment
 
 router = APIRouter()
 
@@ -69,23 +78,10 @@ async def mark_bulk_attendance(
     if not course or course.teacher_id != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized for this course")
     
-    created_records = []
-    for attendance in attendance_list:
-        # Check if exists
-        existing = AttendanceRepository.get_by_date(
-            db, attendance.student_id, attendance.course_id, attendance.date
-        )
-        
-        if existing:
-            updated = AttendanceRepository.update(
-                db, existing,
-                status=attendance.status,
-                remarks=attendance.remarks
-            )
-            created_records.append(updated)
-        else:
-            created = AttendanceRepository.create(db, attendance.dict())
-            created_records.append(created)
+    if any(a.course_id != course_id for a in attendance_list):
+        raise HTTPException(status_code=400, detail="All records must belong to the same course")
+    
+    created_records = AttendanceRepository.upsert_bulk(db, [a.dict() for a in attendance_list])
     
     return {
         "message": f"Attendance marked for {len(created_records)} students",
@@ -158,6 +154,216 @@ async def get_course_attendance_stats(
         "low_attendance_students": low_attendance
     }
 
+@router.get("/course/{course_id}/alerts")
+async def get_course_attendance_alerts(
+    course_id: int,
+    since: datetime = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Get recent low-attendance threshold alerts for a course (Teacher only)"""
+    teacher = TeacherRepository.get_by_user_id(db, current_user.id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+    
+    # Verify teacher teaches this course
+    course = CourseRepository.get_by_id(db, course_id)
+    if not course or course.teacher_id != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized for this course")
+    
+    alerts = AttendanceSummaryRepository.get_alerts(db, [course_id], since, min(limit, 500))
+    return [_alert_dict(a) for a in alerts]
+
+@router.get("/low-attendance")
+async def get_low_attendance(
+    grade_level: str = None,
+    threshold: float = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_teacher_or_authority),
+    db: Session = Depends(get_db)
+):
+    """Get students below the attendance threshold school-wide or for a grade level"""
+    summaries = AttendanceSummaryRepository.get_low_students(db, threshold, grade_level, min(limit, 500))
+    
+    return [{
+        "student_id": s.student_id,
+        "student_name": s.student.full_name if s.student else None,
+        "grade_level": s.grade_level,
+        "percentage": round(s.attendance_percentage, 2),
+        "present": s.present_count,
+        "absent": s.absent_count,
+        "late": s.late_count,
+        "total": s.total_count
+    } for s in summaries]
+
+@router.get("/alerts")
+async def get_attendance_alerts(
+    since: datetime = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_authority),
+    db: Session = Depends(get_db)
+):
+    """Get recent low-attendance threshold alerts across the school (Authority only)"""
+    alerts = AttendanceSummaryRepository.get_alerts(db, since=since, limit=min(limit, 500))
+    return [_alert_dict(a) for a in alerts]
+
+@router.get("/course/{course_id}/calendar")
+async def get_course_attendance_calendar(
+    course_id: int,
+    year: int,
+    month: int,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Get the students x days attendance grid for a course and month (Teacher only)"""
+    teacher = TeacherRepository.get_by_user_id(db, current_user.id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+    
+    # Verify teacher teaches this course
+    course = CourseRepository.get_by_id(db, course_id)
+    if not course or course.teacher_id != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized for this course")
+    
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
+    
+    return AttendanceService(db).get_course_month_grid(course_id, year, month)
+
+@router.get("/school-report")
+async def get_school_attendance_report(
+    year: int,
+    month: int,
+    threshold: float = None,
+    current_user: User = Depends(get_current_authority),
+    db: Session = Depends(get_db)
+):
+    """Get the whole-school monthly attendance report by grade level (Authority only)"""
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
+    
+    return AttendanceService(db).get_school_monthly_report(year, month, threshold)
+
+# GATE READER TAP INGESTION
+
+@router.post("/taps", status_code=202)
+async def ingest_attendance_taps(
+    request: Request,
+    x_device_token: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Accept a batch of NDJSON tap events ({"card_id": ..., "ts": ...} per line) from gate readers.
+    
+    Taps are buffered and folded into attendance every few seconds; a 429
+    means the buffer is full and the batch should be resent later. Batches
+    over ATTENDANCE_TAP_MAX_BATCH_LINES lines or ATTENDANCE_TAP_MAX_BATCH_BYTES
+    bytes are rejected with 413 and should be split.
+    """
+    if not settings.ATTENDANCE_TAP_TOKEN:
+        raise HTTPException(status_code=503, detail="Tap ingestion is not configured")
+    if not x_device_token or not secrets.compare_digest(x_device_token, settings.ATTENDANCE_TAP_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid device token")
+    
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"Batches are limited to {settings.ATTENDANCE_TAP_MAX_BATCH_LINES} lines "
+               f"and {settings.ATTENDANCE_TAP_MAX_BATCH_BYTES} bytes"
+    )
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.ATTENDANCE_TAP_MAX_BATCH_BYTES:
+        raise too_large
+    
+    tap_buffer.ensure_maps(db)
+    
+    try:
+        tap_buffer.check_capacity()
+        
+        lines = []
+        remainder = bytearray()
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > settings.ATTENDANCE_TAP_MAX_BATCH_BYTES:
+                raise too_large
+            # Only the new chunk is split; a partial last line carries over
+            *complete, tail = chunk.split(b"\n")
+            if complete:
+                remainder.extend(complete[0])
+                lines.append(bytes(remainder))
+                lines.extend(complete[1:])
+                remainder = bytearray(tail)
+            else:
+                remainder.extend(tail)
+            if len(lines) > settings.ATTENDANCE_TAP_MAX_BATCH_LINES:
+                raise too_large
+        lines.append(bytes(remainder))
+        
+        return tap_buffer.ingest(lines)
+    except BufferFull:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Tap buffer is full, retry later"},
+            headers={"Retry-After": str(settings.ATTENDANCE_TAP_FLUSH_SECONDS)}
+        )
+
+@router.get("/taps/metrics")
+async def get_attendance_tap_metrics(
+    current_user: User = Depends(get_current_authority)
+):
+    """Get tap buffer backpressure and ingest-lag metrics (Authority only)"""
+    return tap_buffer.metrics()
+
+@router.put("/taps/cards")
+async def assign_attendance_cards(
+    assignments: List[StudentCardAssignment],
+    current_user: User = Depends(get_current_authority),
+    db: Session = Depends(get_db)
+):
+    """Assign RFID/biometric card ids to students (Authority only)"""
+    codes = [a.student_id for a in assignments]
+    students = dict(db.query(Student.student_id, Student.id).filter(Student.student_id.in_(codes)).all())
+    
+    missing = [code for code in codes if code not in students]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Students not found: {', '.join(missing[:20])}")
+    
+    # An empty card id unassigns the student's card
+    cards = {a.student_id: (a.card_id or "").strip() or None for a in assignments}
+    card_ids = [card_id for card_id in cards.values() if card_id]
+    duplicates = sorted(card_id for card_id, count in Counter(card_ids).items() if count > 1)
+    if duplicates:
+        raise HTTPException(status_code=400, detail=f"Card ids assigned more than once: {', '.join(duplicates[:20])}")
+    
+    try:
+        # Clear reassigned cards first so the unique constraint holds mid-update
+        if card_ids:
+            db.query(Student).filter(Student.card_id.in_(card_ids)).update(
+                {Student.card_id: None}, synchronize_session=False
+            )
+        db.execute(update(Student), [
+            {"id": students[code], "card_id": card_id} for code, card_id in cards.items()
+        ])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Card ids conflict with another assignment, retry")
+    
+    tap_buffer.refresh_maps(db)
+    return {"message": f"Updated cards for {len(assignments)} students"}
+
+def _alert_dict(alert) -> dict:
+    return {
+        "id": alert.id,
+        "student_id": alert.student_id,
+        "student_name": alert.student.full_name if alert.student else None,
+        "course_id": alert.course_id,
+        "event": alert.event,
+        "threshold": alert.threshold,
+        "percentage": alert.attendance_percentage,
+        "created_at": alert.created_at
+    }
+
 # STUDENT ENDPOINTS
 
 @router.get("/my-attendance")
@@ -202,4 +408,35 @@ async def get_my_course_attendance(
         "course_id": course_id,
         "attendance": attendance,
         "statistics": stats
-    }
\ No newline at end of file
+    }
+
+@router.get("/my-calendar")
+async def get_my_attendance_calendar(
+    year: int,
+    month: int,
+    current_user: User = Depends(get_current_student),
+    db: Session = Depends(get_db)
+):
+    """Get student's attendance calendar and monthly percentage"""
+    student = StudentRepository.get_by_user_id(db, current_user.id)
+    if not student:
+        raise HTTPException(status_code=404, detail="Student profile not found")
+    
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
+    
+    return AttendanceService(db).get_monthly_attendance_report(student.id, year, month)
+
+@router.get("/my-streaks")
+async def get_my_attendance_streaks(
+    course_id: int = None,
+    months: int = 12,
+    current_user: User = Depends(get_current_student),
+    db: Session = Depends(get_db)
+):
+    """Get student's current and longest present streaks per course"""
+    student = StudentRepository.get_by_user_id(db, current_user.id)
+    if not student:
+        raise HTTPException(status_code=404, detail="Student profile not found")
+    
+    return AttendanceService(db).get_streaks(student.id, course_id, max(1, min(months, 24)))
@@ -57,7 +57,7 @@ async def get_dashboard(
     # Grade statistics
     avg_score = db.query(
         func.avg(Grade.score / Grade.max_score * 100)
-    ).scalar()
+    ).filter(Grade.excluded == False).scalar()
     
     return {
         "statistics": {
@@ -308,14 +308,15 @@ async def get_performance_analytics(
     avg_by_course = db.query(
         Course.course_name,
         func.avg(Grade.score / Grade.max_score * 100).label('average')
-    ).join(Grade).group_by(Course.course_name).all()
+    ).join(Grade).filter(Grade.excluded == False).group_by(Course.course_name).all()
     
     # Grade distribution
     distribution = db.query(
         Grade.grade,
         func.count(Grade.id).label('count')
     ).filter(
-        Grade.grade.isnot(None)
+        Grade.grade.isnot(None),
+        Grade.excluded == False
     ).group_by(Grade.grade).all()
     
     return {
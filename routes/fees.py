@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import date
+import io
 from database.database import get_db
 from dependencies import get_current_authority, get_current_student
 from models.models import User
 from repositories.fee_repository import FeeRepository
 from repositories.student_repository import StudentRepository
-from tables.tables import FeeRecordCreate, FeeRecordUpdate, FeeRecordResponse
+from services.fee_reconciliation_service import FeeReconciliationService
+from services.fee_analytics_service import FeeAnalyticsService
+from tables.tables import FeeRecordCreate, FeeRecordUpdate, FeeRecordResponse, FeePayment
 
 router = APIRouter()
 
@@ -81,6 +84,45 @@ async def record_payment(
         "fee": fee
     }
 
+@router.post("/payments/bulk")
+async def record_bulk_payments(
+    payments: List[FeePayment],
+    current_user: User = Depends(get_current_authority),
+    db: Session = Depends(get_db)
+):
+    """Post a batch of payments in one transaction, e.g. a cashier's end-of-day upload (Authority only)"""
+    if not payments:
+        raise HTTPException(status_code=400, detail="No payments provided")
+    
+    result = FeeRepository.record_payments_bulk(db, [p.dict() for p in payments])
+    
+    return {
+        "message": f"Posted {result['posted']} payments to {result['fees_updated']} fee records",
+        **result
+    }
+
+# A plain def: matching is CPU-bound and runs in the threadpool, not on the event loop
+@router.post("/reconcile")
+def reconcile_bank_statement(
+    file: UploadFile = File(...),
+    dry_run: bool = False,
+    current_user: User = Depends(get_current_authority),
+    db: Session = Depends(get_db)
+):
+    """Match a bank statement CSV against open fees and post confident matches (Authority only).
+    
+    Lines that cannot be matched confidently are returned with suggestions.
+    With dry_run nothing is posted.
+    """
+    if not file.filename.lower().endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Statement must be a CSV file")
+    
+    lines = io.TextIOWrapper(file.file, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        return FeeReconciliationService.reconcile(db, lines, dry_run=dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.delete("/{fee_id}")
 async def delete_fee_record(
     fee_id: int,
@@ -104,6 +146,47 @@ async def get_all_fees_summary(
     summary = FeeRepository.get_all_fees_summary(db)
     return summary
 
+@router.get("/ledger")
+async def get_fee_ledger(
+    status: Optional[str] = None,
+    grade: Optional[str] = None,
+    fee_type: Optional[str] = None,
+    due_from: Optional[date] = None,
+    due_to: Optional[date] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_authority),
+    db: Session = Depends(get_db)
+):
+    """Paginated fee ledger (Authority only).
+    
+    Follow next_cursor for further pages; totals cover every matching
+    record and are only computed for the first page.
+    """
+    try:
+        after = FeeRepository.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    filters = dict(status=status, grade=grade, fee_type=fee_type,
+                   due_from=due_from, due_to=due_to, search=search)
+    records = FeeRepository.get_ledger_page(db, after=after, limit=limit, **filters)
+    
+    return {
+        "records": records,
+        "next_cursor": FeeRepository.encode_cursor(records[-1]) if len(records) == limit else None,
+        "totals": FeeRepository.get_ledger_totals(db, **filters) if not cursor else None
+    }
+
+@router.get("/aging")
+async def get_fee_aging(
+    current_user: User = Depends(get_current_authority),
+    db: Session = Depends(get_db)
+):
+    """Overdue balances by age bucket per grade/section/fee type, plus collection trends (Authority only)"""
+    return FeeAnalyticsService.get_aging_report(db)
+
 @router.get("/overdue")
 async def get_all_overdue_fees(
     current_user: User = Depends(get_current_authority),
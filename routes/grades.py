@@ -1,14 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 from database.database import get_db
-from dependencies import get_current_teacher, get_current_student
+from dependencies import get_current_teacher, get_current_student, get_current_teacher_or_authority
 from models.models import User
 from repositories.grade_repository import GradeRepository
 from repositories.teacher_repository import TeacherRepository
 from repositories.student_repository import StudentRepository
 from repositories.course_repository import CourseRepository
-from tables.tables import GradeCreate, GradeUpdate, GradeResponse
+from repositories.academic_repository import AcademicSummaryRepository
+from services.grade_statistics_service import GradeStatisticsService
+from services.gradebook_service import GradebookService
+from services.grade_transform_service import GradeTransformService
+from utils.grading import grade_type_key
+from tables.tables import GradeCreate, GradeUpdate, GradeResponse, GradeTransformRequest, GradingPolicyUpdate
 
 router = APIRouter()
 
@@ -164,6 +170,219 @@ async def get_top_performers(
         "top_performers": top_performers
     }
 
+@router.get("/course/{course_id}/statistics")
+async def get_course_statistics(
+    course_id: int,
+    grade_type: str = None,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Get full score distribution statistics for a course (Teacher only)"""
+    teacher = TeacherRepository.get_by_user_id(db, current_user.id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+    
+    # Verify teacher teaches this course
+    course = CourseRepository.get_by_id(db, course_id)
+    if not course or course.teacher_id != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized for this course")
+    
+    return {
+        "course_id": course_id,
+        "grade_type": grade_type,
+        "statistics": GradeStatisticsService.for_course(db, course_id, grade_type)
+    }
+
+@router.get("/course/{course_id}/gradebook")
+async def get_course_gradebook(
+    course_id: int,
+    format: str = "json",
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Get the students x assessments gradebook for a course as JSON or CSV (Teacher only)"""
+    teacher = TeacherRepository.get_by_user_id(db, current_user.id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+    
+    # Verify teacher teaches this course
+    course = CourseRepository.get_by_id(db, course_id)
+    if not course or course.teacher_id != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized for this course")
+    
+    if format not in ("json", "csv"):
+        raise HTTPException(status_code=400, detail="Format must be 'json' or 'csv'")
+    
+    book = GradebookService.build(db, course_id)
+    
+    if format == "csv":
+        return StreamingResponse(
+            GradebookService.stream_csv(book),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="gradebook_{course.course_code}.csv"'}
+        )
+    
+    return StreamingResponse(GradebookService.stream_json(book), media_type="application/json")
+
+@router.post("/course/{course_id}/transform")
+async def transform_course_grades(
+    course_id: int,
+    request: GradeTransformRequest,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Scale, curve, cap, drop-lowest or re-band a course's grades in bulk (Teacher only).
+    
+    Defaults to a dry run that returns the preview without writing.
+    """
+    teacher = TeacherRepository.get_by_user_id(db, current_user.id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+    
+    # Verify teacher teaches this course
+    course = CourseRepository.get_by_id(db, course_id)
+    if not course or course.teacher_id != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized for this course")
+    
+    bands = [(b.min_percentage, b.letter) for b in request.bands] if request.bands else None
+    
+    try:
+        return GradeTransformService.transform(
+            db, course_id, request.operation,
+            grade_type=request.grade_type,
+            factor=request.factor,
+            offset=request.offset,
+            target_mean=request.target_mean,
+            cap_percentage=request.cap_percentage,
+            drop_count=request.drop_count,
+            bands=bands,
+            dry_run=request.dry_run
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/course/{course_id}/grading-policy")
+async def get_grading_policy(
+    course_id: int,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Get the grade type weights used for a course's final grade (Teacher only)"""
+    teacher = TeacherRepository.get_by_user_id(db, current_user.id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+    
+    # Verify teacher teaches this course
+    course = CourseRepository.get_by_id(db, course_id)
+    if not course or course.teacher_id != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized for this course")
+    
+    policy = AcademicSummaryRepository.get_policy(db, course_id)
+    return {
+        "course_id": course_id,
+        "weights": [{"grade_type": p.grade_type, "weight": p.weight} for p in policy]
+    }
+
+@router.put("/course/{course_id}/grading-policy")
+async def update_grading_policy(
+    course_id: int,
+    policy_update: GradingPolicyUpdate,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Replace a course's grade type weights and recompute its course grades (Teacher only)"""
+    teacher = TeacherRepository.get_by_user_id(db, current_user.id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+    
+    # Verify teacher teaches this course
+    course = CourseRepository.get_by_id(db, course_id)
+    if not course or course.teacher_id != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized for this course")
+    
+    weights = {}
+    for w in policy_update.weights:
+        key = grade_type_key(w.grade_type)
+        if not key or key in weights:
+            raise HTTPException(status_code=400, detail=f"Invalid or duplicate grade type: {w.grade_type}")
+        weights[key] = w.weight
+    
+    if weights and not any(weights.values()):
+        raise HTTPException(status_code=400, detail="At least one weight must be positive")
+    
+    policy = AcademicSummaryRepository.set_policy(db, course_id, weights)
+    return {
+        "course_id": course_id,
+        "weights": [{"grade_type": p.grade_type, "weight": p.weight} for p in policy]
+    }
+
+@router.get("/course/{course_id}/course-grades")
+async def get_course_final_grades(
+    course_id: int,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Get each student's stored weighted course grade (Teacher only)"""
+    teacher = TeacherRepository.get_by_user_id(db, current_user.id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+    
+    # Verify teacher teaches this course
+    course = CourseRepository.get_by_id(db, course_id)
+    if not course or course.teacher_id != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized for this course")
+    
+    course_grades = AcademicSummaryRepository.get_course_grades(db, course_id)
+    return [{
+        "student_id": g.student_id,
+        "student_name": g.student.full_name if g.student else None,
+        "course_percentage": g.course_percentage,
+        "letter_grade": g.letter_grade,
+        "average_percentage": round(g.average_percentage, 2),
+        "grades_count": g.grade_count
+    } for g in course_grades]
+
+@router.get("/grade-level/{grade_level}/statistics")
+async def get_grade_level_statistics(
+    grade_level: str,
+    grade_type: str = None,
+    current_user: User = Depends(get_current_teacher_or_authority),
+    db: Session = Depends(get_db)
+):
+    """Get full score distribution statistics for a grade level (Teacher or Authority)"""
+    return {
+        "grade_level": grade_level,
+        "grade_type": grade_type,
+        "statistics": GradeStatisticsService.for_grade_level(db, grade_level, grade_type)
+    }
+
+@router.get("/rankings")
+async def get_rankings(
+    grade_level: str = None,
+    section: str = None,
+    limit: int = 10,
+    current_user: User = Depends(get_current_teacher_or_authority),
+    db: Session = Depends(get_db)
+):
+    """Get top students by weighted GPA, school-wide or within a grade level/section"""
+    top_students = AcademicSummaryRepository.get_top_students(
+        db, limit=min(limit, 100), grade_level=grade_level, section=section
+    )
+    
+    return {
+        "grade_level": grade_level,
+        "section": section,
+        "rankings": [{
+            "rank": position,
+            "student_id": s.student_id,
+            "student_name": s.student.full_name if s.student else None,
+            "grade_level": s.grade_level,
+            "section": s.section,
+            "weighted_gpa": s.weighted_gpa,
+            "average_percentage": s.average_percentage
+        } for position, s in enumerate(top_students, start=1)]
+    }
+
 # STUDENT ENDPOINTS
 
 @router.get("/my-grades")
@@ -185,4 +404,29 @@ async def get_my_grades(
         "grades": grades,
         "statistics": stats,
         "gpa": gpa
-    }
\ No newline at end of file
+    }
+
+@router.get("/my-summary")
+async def get_my_academic_summary(
+    current_user: User = Depends(get_current_student),
+    db: Session = Depends(get_db)
+):
+    """Get student's weighted GPA, course averages and class ranks"""
+    student = StudentRepository.get_by_user_id(db, current_user.id)
+    if not student:
+        raise HTTPException(status_code=404, detail="Student profile not found")
+    
+    ranks = AcademicSummaryRepository.get_ranks(db, student.id)
+    course_averages = AcademicSummaryRepository.get_course_averages(db, student.id)
+    
+    return {
+        "summary": ranks,
+        "course_averages": [{
+            "course_id": a.course_id,
+            "course_name": a.course.course_name if a.course else None,
+            "average_percentage": round(a.average_percentage, 2),
+            "course_percentage": a.course_percentage,
+            "letter_grade": a.letter_grade,
+            "grades_count": a.grade_count
+        } for a in course_averages]
+    }
@@ -1,9 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from typing import Optional
 import os
-import shutil
 from database.database import get_db
 from dependencies import get_current_teacher, get_current_user
 from models.models import User
@@ -12,6 +10,8 @@ from repositories.teacher_repository import TeacherRepository
 from repositories.student_repository import StudentRepository
 from tables.tables import NoteResponse
 from config.config import settings
+from services.blob_service import BlobService, download_name
+from utils.uploads import receive_form
 
 router = APIRouter()
 
@@ -19,53 +19,37 @@ router = APIRouter()
 
 @router.post("/upload", response_model=NoteResponse)
 async def upload_note(
-    title: str = Form(...),
-    course_id: int = Form(...),
-    description: Optional[str] = Form(None),
-    file: UploadFile = File(...),
+    request: Request,
     current_user: User = Depends(get_current_teacher),
     db: Session = Depends(get_db)
 ):
-    """Upload course notes (Teacher only)"""
+    """Upload course notes (Teacher only).
+    
+    Multipart form: title, course_id, description (optional), file.
+    """
     teacher = TeacherRepository.get_by_user_id(db, current_user.id)
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher profile not found")
     
-    # Validate file
-    file_ext = os.path.splitext(file.filename)[1].lower().replace('.', '')
-    if file_ext not in settings.allowed_extensions_list:
-        raise HTTPException(status_code=400, detail="File type not allowed")
-    
-    # Check file size
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Reset to beginning
-    
-    if file_size > settings.MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File too large")
-    
-    # Save file
     upload_dir = f"{settings.UPLOAD_DIR}/notes"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    safe_filename = f"{course_id}_{file.filename}"
-    file_path = f"{upload_dir}/{safe_filename}"
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Create note record
-    note_data = {
-        "title": title,
-        "description": description,
-        "course_id": course_id,
-        "teacher_id": teacher.id,
-        "file_path": file_path,
-        "file_size": file_size,
-        "file_type": file_ext
-    }
-    
-    note = NotesRepository.create(db, note_data)
+    async with receive_form(request, upload_dir, settings.MAX_FILE_SIZE, settings.allowed_extensions_list) as form:
+        title = form.require("title")
+        course_id = form.require_int("course_id")
+        
+        file_path = BlobService.store(db, form.file)
+        
+        # Create note record
+        note_data = {
+            "title": title,
+            "description": form.get("description"),
+            "course_id": course_id,
+            "teacher_id": teacher.id,
+            "file_path": file_path,
+            "file_size": form.file.size,
+            "file_type": form.file.extension
+        }
+        
+        note = NotesRepository.create(db, note_data)
     
     return note
 
@@ -100,11 +84,11 @@ async def delete_note(
     if note.teacher_id != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Delete file
-    if os.path.exists(note.file_path):
-        os.remove(note.file_path)
-    
+    file_path = note.file_path
     NotesRepository.delete(db, note)
+    
+    # Drop the file's reference; unreferenced files are garbage collected
+    BlobService.release(db, [file_path])
     return {"message": "Note deleted successfully"}
 
 # STUDENT/PUBLIC ENDPOINTS
@@ -173,7 +157,7 @@ async def download_note(
     return FileResponse(
         note.file_path,
         media_type="application/octet-stream",
-        filename=os.path.basename(note.file_path)
+        filename=download_name(note.title, note.file_path)
     )
 
 @router.get("/search/{query}")
@@ -0,0 +1,111 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from database.database import get_db
+from dependencies import get_current_teacher
+from models.models import User
+from models.test_models import QuestionType, QuestionDifficulty
+from repositories.course_repository import CourseRepository
+from repositories.question_bank_repository import QuestionBankRepository
+from repositories.teacher_repository import TeacherRepository
+from services.test_paper_service import TestPaperService
+from services.test_grading_service import TestGradingService
+from tables.test_tables import BankQuestionCreate, BankQuestionUpdate, BankQuestionResponse
+
+router = APIRouter()
+
+def _get_course_teacher(db: Session, current_user: User, course_id: int):
+    teacher = TeacherRepository.get_by_user_id(db, current_user.id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+
+    course = CourseRepository.get_by_id(db, course_id)
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    if course.teacher_id != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized to manage this course's question bank")
+    return teacher
+
+def _validate_question(question_type: QuestionType, options: Optional[List[str]], correct_answer: Optional[str]):
+    if question_type == QuestionType.MCQ:
+        if not options or len(options) < 2:
+            raise HTTPException(status_code=400, detail="Multiple choice questions need at least two options")
+        if correct_answer is not None and correct_answer.strip().lower() not in {o.strip().lower() for o in options}:
+            raise HTTPException(status_code=400, detail="Correct answer must be one of the options")
+
+@router.post("/", response_model=BankQuestionResponse)
+async def create_bank_question(
+    question: BankQuestionCreate,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Add a question to a course's question bank (Teacher only)"""
+    teacher = _get_course_teacher(db, current_user, question.course_id)
+    _validate_question(question.question_type, question.options, question.correct_answer)
+
+    data = question.dict()
+    data.pop("order", None)
+    data["tags"] = sorted({tag.strip().lower() for tag in question.tags if tag.strip()})
+    return QuestionBankRepository.create(db, dict(data, teacher_id=teacher.id))
+
+@router.get("/course/{course_id}", response_model=List[BankQuestionResponse])
+async def get_course_bank(
+    course_id: int,
+    tag: Optional[str] = None,
+    difficulty: Optional[QuestionDifficulty] = None,
+    include_retired: bool = False,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """List a course's question bank, optionally by tag and difficulty (Teacher only)"""
+    _get_course_teacher(db, current_user, course_id)
+    return QuestionBankRepository.get_by_course(db, course_id, tag, difficulty, include_retired)
+
+@router.put("/{question_id}", response_model=BankQuestionResponse)
+async def update_bank_question(
+    question_id: int,
+    question_update: BankQuestionUpdate,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Update or retire a bank question (Teacher only).
+
+    Drawn papers store option positions, so change a question's options
+    only before a test that can draw it opens.
+    """
+    question = QuestionBankRepository.get_by_id(db, question_id)
+    if not question:
+        raise HTTPException(status_code=404, detail="Question not found")
+    _get_course_teacher(db, current_user, question.course_id)
+
+    changes = question_update.dict(exclude_unset=True)
+    if "tags" in changes and changes["tags"] is not None:
+        changes["tags"] = sorted({tag.strip().lower() for tag in changes["tags"] if tag.strip()})
+    _validate_question(
+        question.question_type,
+        changes.get("options", question.options),
+        changes.get("correct_answer", question.correct_answer)
+    )
+
+    question = QuestionBankRepository.update(db, question, **changes)
+
+    # Cached papers and answer keys of drawn tests include bank questions
+    TestPaperService.invalidate()
+    TestGradingService.invalidate()
+    return question
+
+@router.delete("/{question_id}")
+async def retire_bank_question(
+    question_id: int,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Retire a bank question so new papers no longer draw it (Teacher only)"""
+    question = QuestionBankRepository.get_by_id(db, question_id)
+    if not question:
+        raise HTTPException(status_code=404, detail="Question not found")
+    _get_course_teacher(db, current_user, question.course_id)
+
+    QuestionBankRepository.update(db, question, is_active=False)
+    return {"message": "Question retired"}
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
@@ -9,10 +10,19 @@ from repositories.test_repository import TestRepository
 from repositories.student_repository import StudentRepository
 from repositories.teacher_repository import TeacherRepository
 from services.test_service import TestService
+from services.test_paper_service import TestPaperService
+from services.test_autosave_service import autosave_buffer, AutosaveBufferFull
+from services.test_grading_service import TestGradingService, score_answers
+from services.test_item_analysis_service import TestItemAnalysisService
+from services.paper_generation_service import PaperGenerationService
+from repositories.question_bank_repository import QuestionBankRepository
+from config.config import settings
 from tables.test_tables import (
     TestCreate, TestUpdate, TestResponse, TestForStudent,
-    TestSubmissionCreate, TestSubmissionResponse, TestResult
+    TestSubmissionCreate, TestSubmissionResponse, TestResult, AnswerAutosave
 )
+import json
+import secrets
 
 router = APIRouter()
 
@@ -36,19 +46,37 @@ async def create_test(
     if test_data.start_time < datetime.utcnow():
         raise HTTPException(status_code=400, detail="Start time cannot be in the past")
     
+    fields = {
+        "title": test_data.title,
+        "description": test_data.description,
+        "course_id": test_data.course_id,
+        "teacher_id": teacher.id,
+        "duration": test_data.duration,
+        "start_time": test_data.start_time,
+        "end_time": test_data.end_time,
+        "instructions": test_data.instructions
+    }
+    
+    # Question-bank test: papers are drawn per student when it opens
+    if test_data.sampling_rules:
+        if test_data.questions:
+            raise HTTPException(status_code=400, detail="Use either questions or sampling rules, not both")
+        rules = [rule.dict() for rule in test_data.sampling_rules]
+        for rule in rules:
+            rule["difficulty"] = rule["difficulty"].value if rule["difficulty"] else None
+        try:
+            fields["total_points"] = PaperGenerationService.check_rules(db, test_data.course_id, rules)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        fields["sampling_rules"] = rules
+        fields["paper_seed"] = secrets.randbelow(2 ** 31)
+    elif not test_data.questions:
+        raise HTTPException(status_code=400, detail="A test needs questions or sampling rules")
+    
     # Create test with questions
     test = TestRepository.create(
         db,
-        test_data={
-            "title": test_data.title,
-            "description": test_data.description,
-            "course_id": test_data.course_id,
-            "teacher_id": teacher.id,
-            "duration": test_data.duration,
-            "start_time": test_data.start_time,
-            "end_time": test_data.end_time,
-            "instructions": test_data.instructions
-        },
+        test_data=fields,
         questions_data=[q.dict() for q in test_data.questions]
     )
     
@@ -114,6 +142,8 @@ async def update_test(
         )
     
     updated_test = TestRepository.update(db, test, **test_update.dict(exclude_unset=True))
+    TestPaperService.invalidate(test_id)
+    TestGradingService.invalidate(test_id)
     return updated_test
 
 @router.delete("/{test_id}")
@@ -135,6 +165,8 @@ async def delete_test(
         raise HTTPException(status_code=403, detail="Not authorized to delete this test")
     
     TestRepository.delete(db, test)
+    TestPaperService.invalidate(test_id)
+    TestGradingService.invalidate(test_id)
     return {"message": "Test deleted successfully"}
 
 @router.get("/{test_id}/results")
@@ -173,8 +205,41 @@ async def get_test_results(
         }
     }
 
+@router.get("/{test_id}/item-analysis")
+async def get_test_item_analysis(
+    test_id: int,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Get per-question difficulty, discrimination, MCQ option frequencies and the score distribution (Teacher only)"""
+    teacher = TeacherRepository.get_by_user_id(db, current_user.id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+    
+    test = TestRepository.get_by_id(db, test_id)
+    if not test:
+        raise HTTPException(status_code=404, detail="Test not found")
+    
+    if test.teacher_id != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized to view results")
+    
+    if test.sampling_rules:
+        raise HTTPException(status_code=400, detail="Item analysis is only available for tests with fixed questions")
+    
+    return TestItemAnalysisService.get_report(db, test_id)
+
 # STUDENT ENDPOINTS
 
+def _get_drawn_paper(db: Session, test_id: int, student_id: int):
+    """The student's drawn paper for a question-bank test, drawing it if the open-time run missed them"""
+    try:
+        student_paper = PaperGenerationService.get_or_create(db, test_id, student_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=f"Cannot draw a paper: {e}")
+    if not student_paper:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return student_paper
+
 @router.get("/student/available", response_model=List[TestForStudent])
 async def get_available_tests(
     current_user: User = Depends(get_current_student),
@@ -194,6 +259,7 @@ async def get_available_tests(
 @router.get("/student/{test_id}", response_model=TestForStudent)
 async def get_test_for_student(
     test_id: int,
+    request: Request,
     current_user: User = Depends(get_current_student),
     db: Session = Depends(get_db)
 ):
@@ -202,20 +268,28 @@ async def get_test_for_student(
     if not student:
         raise HTTPException(status_code=404, detail="Student profile not found")
     
-    test = TestRepository.get_by_id(db, test_id)
-    if not test:
+    paper = TestPaperService.get(db, test_id)
+    if not paper:
         raise HTTPException(status_code=404, detail="Test not found")
     
     # Check if student is enrolled in the course
-    courses = StudentRepository.get_enrolled_courses(db, student.id)
-    if test.course_id not in [c.id for c in courses]:
+    if not StudentRepository.is_enrolled(db, student.id, paper.course_id):
         raise HTTPException(status_code=403, detail="Not enrolled in this course")
     
     # Check if test is available
-    if not TestService.is_test_available(test):
+    if not paper.is_available():
         raise HTTPException(status_code=400, detail="Test is not currently available")
     
-    return test
+    body, etag = paper.body, f'"{paper.version}"'
+    if paper.drawn:
+        student_paper = _get_drawn_paper(db, test_id, student.id)
+        body, etag = None, f'"{paper.version}-{student_paper.id}"'
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    if body is None:
+        body = paper.render(student_paper.question_ids, student_paper.option_orders)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 @router.post("/{test_id}/start")
 async def start_test(
@@ -228,44 +302,106 @@ async def start_test(
     if not student:
         raise HTTPException(status_code=404, detail="Student profile not found")
     
-    test = TestRepository.get_by_id(db, test_id)
-    if not test:
+    paper = TestPaperService.get(db, test_id)
+    if not paper:
         raise HTTPException(status_code=404, detail="Test not found")
     
     # Check if test is available
-    if not TestService.is_test_available(test):
+    if not paper.is_available():
         raise HTTPException(status_code=400, detail="Test is not currently available")
     
+    # Get or create submission
+    submission = TestService.get_or_create_submission(db, test_id, student.id)
+    
     # Check if already submitted
-    if TestService.has_student_submitted(db, test_id, student.id):
+    if submission.submitted_at:
         raise HTTPException(status_code=400, detail="Test already submitted")
     
-    # Get or create submission
-    submission = TestService.get_or_create_submission(db, test_id, student.id)
+    autosave_buffer.remember_attempt(test_id, student.id, submission.id)
     
     # Calculate remaining time
-    time_remaining = TestService.calculate_time_remaining(test)
+    time_remaining = TestService.calculate_time_remaining(paper)
+    
+    # Resume with autosaved answers, including ones not yet flushed
+    submission_view = TestSubmissionResponse.model_validate(submission)
+    submission_view.answers = autosave_buffer.overlay(submission.id, submission.answers)
+    
+    # The compiled paper is spliced in as-is rather than re-serialized
+    test_body = paper.body
+    if paper.drawn:
+        student_paper = _get_drawn_paper(db, test_id, student.id)
+        test_body = paper.render(student_paper.question_ids, student_paper.option_orders)
+    body = b''.join([
+        b'{"test":', test_body,
+        b',"submission":', submission_view.model_dump_json().encode(),
+        b',"time_remaining":', json.dumps(time_remaining).encode(), b'}'
+    ])
+    return Response(content=body, media_type="application/json")
+
+@router.patch("/{test_id}/autosave", status_code=202)
+async def autosave_answers(
+    test_id: int,
+    autosave: AnswerAutosave,
+    current_user: User = Depends(get_current_student),
+    db: Session = Depends(get_db)
+):
+    """Save changed answers of an in-progress test.
     
-    return {
-        "test": test,
-        "submission": submission,
-        "time_remaining": time_remaining
-    }
+    Send only the questions that changed, each with an increasing client
+    seq; older patches for a question are ignored. Answers are buffered and
+    written to the submission every few seconds.
+    """
+    student = StudentRepository.get_by_user_id(db, current_user.id)
+    if not student:
+        raise HTTPException(status_code=404, detail="Student profile not found")
+    
+    paper = TestPaperService.get(db, test_id)
+    if not paper:
+        raise HTTPException(status_code=404, detail="Test not found")
+    
+    if not paper.is_available():
+        raise HTTPException(status_code=400, detail="Test is not currently available")
+    
+    submission_id = autosave_buffer.get_attempt(test_id, student.id)
+    if submission_id is None:
+        submission = TestRepository.get_submission(db, test_id, student.id)
+        if not submission:
+            raise HTTPException(status_code=404, detail="Test not started")
+        if submission.submitted_at:
+            raise HTTPException(status_code=400, detail="Test already submitted")
+        submission_id = submission.id
+        autosave_buffer.remember_attempt(test_id, student.id, submission_id)
+    
+    unknown = sorted({p.question_id for p in autosave.patches} - paper.question_ids)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown question ids: {', '.join(unknown)}")
+    
+    try:
+        return autosave_buffer.add(submission_id, [(p.question_id, p.answer, p.seq) for p in autosave.patches])
+    except AutosaveBufferFull:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Autosave buffer is full, retry later"},
+            headers={"Retry-After": str(settings.TEST_AUTOSAVE_FLUSH_SECONDS)}
+        )
 
-@router.post("/{test_id}/submit", response_model=TestSubmissionResponse)
+@router.post("/{test_id}/submit", response_model=TestSubmissionResponse, status_code=202)
 async def submit_test(
     test_id: int,
     submission_data: TestSubmissionCreate,
     current_user: User = Depends(get_current_student),
     db: Session = Depends(get_db)
 ):
-    """Submit test answers"""
+    """Submit test answers.
+    
+    The answers are stored and queued for grading; poll
+    /student/{test_id}/status or listen for the test_graded websocket push.
+    """
     student = StudentRepository.get_by_user_id(db, current_user.id)
     if not student:
         raise HTTPException(status_code=404, detail="Student profile not found")
     
-    test = TestRepository.get_by_id(db, test_id)
-    if not test:
+    if not TestPaperService.get(db, test_id):
         raise HTTPException(status_code=404, detail="Test not found")
     
     # Get existing submission
@@ -276,21 +412,54 @@ async def submit_test(
     if submission.submitted_at:
         raise HTTPException(status_code=400, detail="Test already submitted")
     
-    # Update submission
-    time_taken = (datetime.utcnow() - submission.started_at).total_seconds()
-    submission = TestRepository.update_submission(
-        db,
-        submission,
-        answers=submission_data.answers,
-        submitted_at=datetime.utcnow(),
-        time_taken=int(time_taken)
-    )
+    # Record the answers; losing a race with another submit (or the close) is a duplicate
+    now = datetime.utcnow()
+    time_taken = (now - submission.started_at).total_seconds()
+    if not TestRepository.submit_answers(db, submission.id, submission_data.answers, now, int(time_taken)):
+        raise HTTPException(status_code=400, detail="Test already submitted")
+    db.refresh(submission)
+    
+    # The submitted answer set supersedes any buffered autosave patches
+    autosave_buffer.discard(submission.id)
     
-    # Grade the submission
-    TestService.grade_submission(db, submission, test)
+    # Queue for grading
+    TestGradingService.notify()
     
     return submission
 
+@router.get("/student/{test_id}/status")
+async def get_submission_status(
+    test_id: int,
+    current_user: User = Depends(get_current_student),
+    db: Session = Depends(get_db)
+):
+    """Get the grading status of the student's submission"""
+    student = StudentRepository.get_by_user_id(db, current_user.id)
+    if not student:
+        raise HTTPException(status_code=404, detail="Student profile not found")
+    
+    submission = TestRepository.get_submission(db, test_id, student.id)
+    if not submission:
+        return {"test_id": test_id, "status": "not_started"}
+    
+    if not submission.submitted_at:
+        grading_status = "in_progress"
+    elif submission.score is None:
+        grading_status = "queued"
+    elif not submission.is_graded:
+        grading_status = "pending_review"  # auto-graded part scored; essays remain
+    else:
+        grading_status = "graded"
+    
+    return {
+        "test_id": test_id,
+        "status": grading_status,
+        "score": submission.score,
+        "max_score": submission.max_score,
+        "percentage": submission.percentage,
+        "submitted_at": submission.submitted_at
+    }
+
 @router.get("/student/{test_id}/result", response_model=TestResult)
 async def get_test_result(
     test_id: int,
@@ -313,13 +482,14 @@ async def get_test_result(
     if not submission.is_graded:
         raise HTTPException(status_code=400, detail="Test is being graded")
     
-    # Count correct answers
-    questions_correct = 0
-    for question in test.questions:
-        if str(question.id) in submission.answers:
-            student_answer = submission.answers[str(question.id)]
-            if str(student_answer).strip().lower() == str(question.correct_answer).strip().lower():
-                questions_correct += 1
+    # Count correct answers against the cached answer key
+    answer_key = TestGradingService.get_answer_key(db, test_id)
+    drawn = None
+    if answer_key.drawn:
+        student_paper = QuestionBankRepository.get_paper(db, test_id, student.id)
+        drawn = (student_paper.question_ids, student_paper.option_orders) if student_paper else ([], [])
+    questions_correct = score_answers(answer_key, submission.answers, drawn)['questions_correct']
+    total_questions = len(drawn[0]) if drawn else len(TestPaperService.get(db, test_id).question_ids)
     
     return TestResult(
         test_id=test.id,
@@ -331,7 +501,7 @@ async def get_test_result(
         submitted_at=submission.submitted_at,
         feedback=submission.feedback,
         questions_correct=questions_correct,
-        total_questions=len(test.questions)
+        total_questions=total_questions
     )
 
 @router.get("/student/my-results")
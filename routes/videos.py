@@ -1,74 +1,174 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, Response
 from sqlalchemy.orm import Session
-from typing import Optional
 import os
-import shutil
 from database.database import get_db
 from dependencies import get_current_teacher, get_current_user
 from models.models import User
 from repositories.videos_repository import VideosRepository
+from repositories.course_repository import CourseRepository
 from repositories.teacher_repository import TeacherRepository
 from repositories.student_repository import StudentRepository
 from tables.tables import VideoResponse
 from config.config import settings
+from services.blob_service import BlobService, download_name
+from services.resumable_upload_service import (
+    ResumableUploadService, ResumableUploadError, ResumableUpload, TUS_VERSION, parse_metadata
+)
+from utils.uploads import receive_form, file_extension, safe_filename
 
 router = APIRouter()
 
 # TEACHER ENDPOINTS
 
+ALLOWED_VIDEO_EXTENSIONS = ['mp4', 'avi', 'mov', 'wmv', 'flv', 'mkv']
+
 @router.post("/upload", response_model=VideoResponse)
 async def upload_video(
-    title: str = Form(...),
-    course_id: int = Form(...),
-    description: Optional[str] = Form(None),
-    file: UploadFile = File(...),
+    request: Request,
     current_user: User = Depends(get_current_teacher),
     db: Session = Depends(get_db)
 ):
-    """Upload course video (Teacher only)"""
+    """Upload course video (Teacher only).
+    
+    Multipart form: title, course_id, description (optional), file.
+    """
     teacher = TeacherRepository.get_by_user_id(db, current_user.id)
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher profile not found")
     
-    # Validate file type (videos only)
-    file_ext = os.path.splitext(file.filename)[1].lower().replace('.', '')
-    allowed_video_extensions = ['mp4', 'avi', 'mov', 'wmv', 'flv', 'mkv']
+    upload_dir = f"{settings.UPLOAD_DIR}/videos"
+    async with receive_form(request, upload_dir, settings.MAX_VIDEO_FILE_SIZE, ALLOWED_VIDEO_EXTENSIONS) as form:
+        title = form.require("title")
+        course_id = form.require_int("course_id")
+        
+        file_path = BlobService.store(db, form.file)
+        
+        # Create video record
+        video_data = {
+            "title": title,
+            "description": form.get("description"),
+            "course_id": course_id,
+            "teacher_id": teacher.id,
+            "file_path": file_path,
+            "file_size": form.file.size
+        }
+        
+        video = VideosRepository.create(db, video_data)
     
-    if file_ext not in allowed_video_extensions:
-        raise HTTPException(status_code=400, detail="Only video files are allowed")
+    return video
+
+# Resumable uploads (tus protocol: creation, HEAD for the offset, PATCH to
+# append, DELETE to abandon)
+
+def _tus_headers(upload: ResumableUpload) -> dict:
+    headers = {
+        "Tus-Resumable": TUS_VERSION,
+        "Upload-Offset": str(upload.offset),
+        "Upload-Length": str(upload.length),
+        "Upload-Expires": upload.expires_at.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+        "Cache-Control": "no-store"
+    }
+    if upload.video_id is not None:
+        headers["Upload-Video-Id"] = str(upload.video_id)
+    return headers
+
+@router.post("/uploads", status_code=201)
+async def create_resumable_upload(
+    request: Request,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Start a resumable video upload (Teacher only).
     
-    # Check file size
-    file.file.seek(0, 2)
-    file_size = file.file.tell()
-    file.file.seek(0)
+    Headers: Upload-Length, and Upload-Metadata with base64 filename, title,
+    course_id and optionally description. The upload URL is returned in
+    Location.
+    """
+    teacher = TeacherRepository.get_by_user_id(db, current_user.id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
     
-    if file_size > settings.MAX_FILE_SIZE * 10:  # 100MB for videos
-        raise HTTPException(status_code=400, detail="File too large (max 100MB)")
+    length = request.headers.get("upload-length", "")
+    if not length.isdigit() or int(length) == 0:
+        raise HTTPException(status_code=400, detail="Upload-Length must be a positive integer")
+    if int(length) > settings.MAX_VIDEO_FILE_SIZE:
+        raise HTTPException(status_code=413, detail="File too large")
     
-    # Save file
-    upload_dir = f"{settings.UPLOAD_DIR}/videos"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    safe_filename = f"{course_id}_{file.filename}"
-    file_path = f"{upload_dir}/{safe_filename}"
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Create video record
-    video_data = {
-        "title": title,
-        "description": description,
-        "course_id": course_id,
-        "teacher_id": teacher.id,
-        "file_path": file_path,
-        "file_size": file_size
-    }
+    try:
+        metadata = parse_metadata(request.headers.get("upload-metadata"))
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     
-    video = VideosRepository.create(db, video_data)
+    filename = safe_filename(metadata.get("filename", ""))
+    if file_extension(filename) not in ALLOWED_VIDEO_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Only video files are allowed")
+    if not metadata.get("title"):
+        raise HTTPException(status_code=400, detail="Upload-Metadata must include a title")
+    if not metadata.get("course_id", "").isdigit() or not CourseRepository.get_by_id(db, int(metadata["course_id"])):
+        raise HTTPException(status_code=404, detail="Course not found")
     
-    return video
+    upload = ResumableUploadService.create(
+        current_user.id, teacher.id, int(metadata["course_id"]), metadata["title"],
+        metadata.get("description"), filename, int(length)
+    )
+    headers = _tus_headers(upload)
+    headers["Location"] = f"{request.url.path.rstrip('/')}/{upload.id}"
+    return Response(status_code=201, headers=headers)
+
+@router.head("/uploads/{upload_id}")
+async def get_resumable_upload_offset(
+    upload_id: str,
+    current_user: User = Depends(get_current_teacher)
+):
+    """Current offset of a resumable upload (Teacher only)"""
+    upload = ResumableUploadService.get(upload_id, current_user.id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return Response(status_code=200, headers=_tus_headers(upload))
+
+@router.patch("/uploads/{upload_id}")
+async def append_resumable_upload(
+    upload_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Append a chunk to a resumable upload (Teacher only).
+    
+    Headers: Content-Type application/offset+octet-stream, Upload-Offset
+    (must equal the server's offset) and optionally Upload-Checksum
+    ("sha256 <base64 digest>"). The chunk that completes the upload creates
+    the video; its id is returned in Upload-Video-Id.
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip() != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type must be application/offset+octet-stream")
+    offset = request.headers.get("upload-offset", "")
+    if not offset.isdigit():
+        raise HTTPException(status_code=400, detail="Upload-Offset must be a non-negative integer")
+    
+    try:
+        upload = await ResumableUploadService.write_chunk(
+            db, upload_id, current_user.id, int(offset), request.stream(), request.headers.get("upload-checksum")
+        )
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return Response(status_code=204, headers=_tus_headers(upload))
+
+@router.delete("/uploads/{upload_id}")
+async def abandon_resumable_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_teacher)
+):
+    """Abandon a resumable upload and delete its data (Teacher only)"""
+    upload = ResumableUploadService.get(upload_id, current_user.id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    try:
+        ResumableUploadService.delete(upload)
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return Response(status_code=204, headers={"Tus-Resumable": TUS_VERSION})
 
 @router.get("/teacher/my-videos")
 async def get_my_videos(
@@ -101,11 +201,11 @@ async def delete_video(
     if video.teacher_id != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Delete file
-    if os.path.exists(video.file_path):
-        os.remove(video.file_path)
-    
+    file_path = video.file_path
     VideosRepository.delete(db, video)
+    
+    # Drop the file's reference; unreferenced files are garbage collected
+    BlobService.release(db, [file_path])
     return {"message": "Video deleted successfully"}
 
 # STUDENT/PUBLIC ENDPOINTS
@@ -174,7 +274,7 @@ async def stream_video(
     return FileResponse(
         video.file_path,
         media_type="video/mp4",
-        filename=os.path.basename(video.file_path)
+        filename=download_name(video.title, video.file_path)
     )
 
 @router.get("/search/{query}")
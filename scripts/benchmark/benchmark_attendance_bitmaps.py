@@ -0,0 +1,94 @@
+import sys
+import os
+import time
+import argparse
+import tempfile
+from collections import defaultdict
+from datetime import date
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+from sqlalchemy import create_engine, insert, extract
+from sqlalchemy.orm import sessionmaker
+from database.database import Base
+from models.models import Attendance, Student, Course, User, UserRole
+from models import attendance_models  # noqa: F401 - register bitmap table
+from repositories.attendance_bitmap_repository import AttendanceBitmapRepository
+from services.attendance_service import AttendanceService
+
+STATUSES = np.array(['present', 'absent', 'late'])
+
+def seed(db, students: int, courses: int, school_days: int, year: int, month: int):
+    """Synthetic school: every student attends every course on each school day"""
+    db.execute(insert(User), [{
+        'id': i, 'email': f'student{i}@example.com', 'username': f'student{i}',
+        'full_name': f'Student {i}', 'hashed_password': 'x', 'role': UserRole.STUDENT
+    } for i in range(1, students + 1)])
+    db.execute(insert(Student), [{
+        'id': i, 'user_id': i, 'student_id': f'S{i:05d}', 'full_name': f'Student {i}',
+        'grade_level': str(6 + i % 7), 'enrollment_date': date(year, 1, 1)
+    } for i in range(1, students + 1)])
+    db.execute(insert(Course), [{
+        'id': i, 'course_code': f'C{i}', 'course_name': f'Course {i}'
+    } for i in range(1, courses + 1)])
+
+    rng = np.random.default_rng(42)
+    statuses = STATUSES[rng.choice(3, p=[0.85, 0.1, 0.05], size=students * courses * school_days)]
+    rows = (
+        {'student_id': s, 'course_id': c, 'date': date(year, month, d + 1)}
+        for s in range(1, students + 1) for c in range(1, courses + 1) for d in range(school_days)
+    )
+    db.execute(insert(Attendance), [dict(row, status=str(status)) for row, status in zip(rows, statuses)])
+    db.commit()
+    AttendanceBitmapRepository.rebuild(db)
+
+def row_baseline(db, year: int, month: int):
+    """Old approach: pull one row per day per course and aggregate in Python"""
+    rows = db.query(Attendance.student_id, Student.grade_level, Attendance.status)\
+        .join(Student, Attendance.student_id == Student.id)\
+        .filter(extract('year', Attendance.date) == year, extract('month', Attendance.date) == month).all()
+    by_grade = defaultdict(lambda: [0, 0])
+    for _, grade_level, status in rows:
+        totals = by_grade[grade_level]
+        totals[0] += status == 'present'
+        totals[1] += 1
+    return {grade: present / total * 100 for grade, (present, total) in by_grade.items()}
+
+def benchmark(students: int, courses: int, school_days: int, repeat: int):
+    year, month = 2025, 3
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+
+        start = time.perf_counter()
+        seed(db, students, courses, school_days, year, month)
+        print(f"Seeded {students * courses * school_days:,} attendance rows "
+              f"({students:,} students x {courses} courses x {school_days} days) "
+              f"in {time.perf_counter() - start:.1f} s")
+
+        service = AttendanceService(db)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            report = service.get_school_monthly_report(year, month)
+            timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        row_baseline(db, year, month)
+        baseline = time.perf_counter() - start
+
+        print(f"Bitmap report: best {min(timings) * 1000:.1f} ms, "
+              f"mean {sum(timings) / len(timings) * 1000:.1f} ms over {repeat} runs")
+        print(f"Row-per-day baseline: {baseline * 1000:.1f} ms")
+        print(f"School: {report['school']}")
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the whole-school monthly attendance report")
+    parser.add_argument("--students", type=int, default=2_000)
+    parser.add_argument("--courses", type=int, default=6)
+    parser.add_argument("--days", type=int, default=22)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    benchmark(args.students, args.courses, args.days, args.repeat)
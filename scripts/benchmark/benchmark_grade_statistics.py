@@ -0,0 +1,55 @@
+import sys
+import os
+import time
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+from services.grade_statistics_service import GradeStatisticsService
+
+def python_baseline(student_ids, scores, max_scores):
+    """Row-by-row equivalent of the old ORM loop, for comparison"""
+    percentages = []
+    per_student = {}
+    for sid, score, max_score in zip(student_ids.tolist(), scores.tolist(), max_scores.tolist()):
+        pct = score / max_score * 100
+        percentages.append(pct)
+        totals = per_student.setdefault(sid, [0.0, 0.0])
+        totals[0] += score
+        totals[1] += max_score
+    percentages.sort()
+    mean = sum(percentages) / len(percentages)
+    median = percentages[len(percentages) // 2]
+    student_pct = {sid: t[0] / t[1] * 100 for sid, t in per_student.items()}
+    return mean, median, student_pct
+
+def benchmark(grades: int, students: int, repeat: int):
+    rng = np.random.default_rng(42)
+    student_ids = rng.integers(1, students + 1, size=grades)
+    max_scores = rng.choice([10.0, 20.0, 50.0, 100.0], size=grades)
+    scores = np.round(rng.beta(5, 2, size=grades) * max_scores, 1)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stats = GradeStatisticsService.compute(student_ids, scores, max_scores)
+        timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    python_baseline(student_ids, scores, max_scores)
+    baseline = time.perf_counter() - start
+
+    print(f"Grades: {grades:,}  Students: {students:,}")
+    print(f"Vectorized engine: best {min(timings) * 1000:.1f} ms, "
+          f"mean {sum(timings) / len(timings) * 1000:.1f} ms over {repeat} runs")
+    print(f"Python loop (partial stats only): {baseline * 1000:.1f} ms")
+    print(f"Mean {stats['mean']}  Median {stats['median']}  StdDev {stats['std_dev']}")
+    print(f"Percentiles {stats['percentiles']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the grade statistics engine")
+    parser.add_argument("--grades", type=int, default=100_000)
+    parser.add_argument("--students", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    benchmark(args.grades, args.students, args.repeat)
@@ -0,0 +1,60 @@
+from sqlalchemy.orm import Session
+from typing import Dict
+from database.database import SessionLocal
+from repositories.analytics_repository import AnalyticsRepository
+import logging
+
+logger = logging.getLogger(__name__)
+
+MONTH_LABELS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+class AnalyticsService:
+    @staticmethod
+    def get_authority_dashboard(db: Session) -> Dict:
+        """Build the authority analytics charts from the rollup tables only"""
+        distribution = AnalyticsRepository.get_grade_distribution(db)
+        grade_dist_data = [distribution[letter] for letter in ['A', 'B', 'C', 'D', 'F']]
+
+        attendance = AnalyticsRepository.get_attendance_by_grade_level(db)
+        att_labels = [a['grade_level'] for a in attendance] or ["Data Pending"]
+        att_data = [a['percentage'] for a in attendance] or [0]
+
+        departments = AnalyticsRepository.get_department_averages(db)
+        dept_labels = [d['department'] for d in departments] or ["No Data"]
+        dept_data = [d['average'] for d in departments] or [0]
+
+        monthly = AnalyticsRepository.get_monthly_averages(db)
+        trend_data = [monthly.get(month, 0) for month in range(1, 13)]
+
+        teacher_perf = [{
+            "name": t['name'],
+            "department": t['department'],
+            "avg_grade": t['average'],
+            "performance": t['average'],
+            "avatar": f"https://ui-avatars.com/api/?name={t['name']}&background=random"
+        } for t in AnalyticsRepository.get_teacher_averages(db)]
+        teacher_perf.sort(key=lambda x: x['performance'], reverse=True)
+
+        return {
+            "grade_dist_data": grade_dist_data,
+            "att_labels": att_labels,
+            "att_data": att_data,
+            "dept_labels": dept_labels,
+            "dept_data": dept_data,
+            "trend_labels": MONTH_LABELS,
+            "trend_data": trend_data,
+            "teacher_performance": teacher_perf
+        }
+
+def refresh_analytics_rollups():
+    """Rebuild analytics rollups from raw grades and attendance (scheduled job)"""
+    db = SessionLocal()
+    try:
+        AnalyticsRepository.rebuild_rollups(db)
+        logger.info("Rebuilt analytics rollups")
+
+    except Exception as e:
+        logger.error(f"Error rebuilding analytics rollups: {e}")
+        db.rollback()
+    finally:
+        db.close()
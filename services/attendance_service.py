@@ -1,61 +1,167 @@
 from sqlalchemy.orm import Session
-from datetime import date, timedelta
+from datetime import date
 from typing import Dict, List
+import calendar
+import numpy as np
+from config.config import settings
+from database.database import SessionLocal
 from repositories.attendance_repository import AttendanceRepository
+from repositories.attendance_summary_repository import AttendanceSummaryRepository
+from repositories.attendance_bitmap_repository import AttendanceBitmapRepository
+from utils.attendance_bits import decode_month, month_counts, month_counts_array, streaks
+import logging
+
+logger = logging.getLogger(__name__)
 
 class AttendanceService:
+    """Attendance reports served from the 2-bit-per-day month bitmaps.
+
+    A month of one student's attendance in one course is a single integer,
+    so calendars decode by shifting, counts are popcounts and whole-school
+    reports are NumPy operations over one int64 per (student, course).
+    """
+
     def __init__(self, db: Session):
         self.db = db
-        self.attendance_repo = AttendanceRepository(db)
 
     def get_monthly_attendance_report(self, student_id: int, year: int, month: int) -> Dict:
         """Generate monthly attendance report for a student"""
-        start_date = date(year, month, 1)
-        if month == 12:
-            end_date = date(year + 1, 1, 1) - timedelta(days=1)
-        else:
-            end_date = date(year, month + 1, 1) - timedelta(days=1)
-        
-        attendance_records = self.attendance_repo.get_by_student(student_id, start_date, end_date)
-        
-        # Calculate statistics
-        total_days = (end_date - start_date).days + 1
-        present_days = len([r for r in attendance_records if r.status == 'present'])
-        absent_days = len([r for r in attendance_records if r.status == 'absent'])
-        late_days = len([r for r in attendance_records if r.status == 'late'])
-        
-        attendance_rate = (present_days / total_days * 100) if total_days > 0 else 0
-        
+        days_in_month = calendar.monthrange(year, month)[1]
+        months = AttendanceBitmapRepository.get_student_months(
+            self.db, student_id, (year, month), (year, month)
+        )
+
+        combined = {'present': 0, 'absent': 0, 'late': 0, 'total': 0}
+        courses = []
+        for course_id, _, _, bits in months:
+            counts = month_counts(bits)
+            for key in combined:
+                combined[key] += counts[key]
+            courses.append({
+                'course_id': course_id,
+                'calendar': decode_month(bits, days_in_month),
+                **counts
+            })
+
+        total = combined['total']
         return {
             'student_id': student_id,
             'month': f"{year}-{month:02d}",
-            'total_days': total_days,
-            'present_days': present_days,
-            'absent_days': absent_days,
-            'late_days': late_days,
-            'attendance_rate': round(attendance_rate, 2),
-            'records': attendance_records
+            'total_days': days_in_month,
+            'recorded_days': total,
+            'present_days': combined['present'],
+            'absent_days': combined['absent'],
+            'late_days': combined['late'],
+            'attendance_rate': round(combined['present'] / total * 100, 2) if total else 0.0,
+            'courses': courses
+        }
+
+    def get_streaks(self, student_id: int, course_id: int = None, months: int = 12) -> List[Dict]:
+        """Current and longest present streak per course over the last N months"""
+        today = date.today()
+        end = (today.year, today.month)
+        start_index = today.year * 12 + today.month - 1 - (months - 1)
+        start = (start_index // 12, start_index % 12 + 1)
+
+        per_course = {}
+        for cid, year, month, bits in AttendanceBitmapRepository.get_student_months(
+                self.db, student_id, start, end, course_id):
+            per_course.setdefault(cid, {})[(year, month)] = bits
+
+        # Walk every month in range so a missing month is simply empty
+        calendar_months = [divmod(i, 12) for i in range(start_index, start_index + months)]
+        calendar_months = [(year, m + 1) for year, m in calendar_months]
+        days = [calendar.monthrange(year, month)[1] for year, month in calendar_months]
+
+        return [{
+            'course_id': cid,
+            **streaks([by_month.get(ym, 0) for ym in calendar_months], days)
+        } for cid, by_month in sorted(per_course.items())]
+
+    def get_course_month_grid(self, course_id: int, year: int, month: int) -> Dict:
+        """Calendar grid (students x days) for one course and month"""
+        days_in_month = calendar.monthrange(year, month)[1]
+        return {
+            'course_id': course_id,
+            'month': f"{year}-{month:02d}",
+            'days_in_month': days_in_month,
+            'students': [{
+                'student_id': student_id,
+                'calendar': decode_month(bits, days_in_month),
+                **month_counts(bits)
+            } for student_id, bits in AttendanceBitmapRepository.get_course_month(
+                self.db, course_id, year, month)]
+        }
+
+    def get_school_monthly_report(self, year: int, month: int, threshold: float = None) -> Dict:
+        """Whole-school monthly attendance by grade level, vectorized over bitmaps"""
+        threshold = settings.ATTENDANCE_ALERT_THRESHOLD if threshold is None else threshold
+        rows = AttendanceBitmapRepository.get_school_month(self.db, year, month)
+
+        student_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        bits = np.array([r[2] for r in rows], dtype=np.int64)
+        counts = month_counts_array(bits)
+
+        # Per-student totals across their courses
+        students, student_index = np.unique(student_ids, return_inverse=True)
+        student_present = np.bincount(student_index, counts['present'], minlength=students.size)
+        student_total = np.bincount(student_index, counts['total'], minlength=students.size)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            student_pct = np.where(student_total > 0, student_present * 100 / student_total, 0.0)
+
+        grade_of_student = {student_id: grade_level or '' for student_id, grade_level, _ in rows}
+        levels = np.array([grade_of_student[int(s)] for s in students], dtype=object)
+
+        def summarize(mask: np.ndarray, row_mask: np.ndarray) -> Dict:
+            present = int(counts['present'][row_mask].sum())
+            total = int(counts['total'][row_mask].sum())
+            return {
+                'students': int(mask.sum()),
+                'present': present,
+                'absent': int(counts['absent'][row_mask].sum()),
+                'late': int(counts['late'][row_mask].sum()),
+                'total': total,
+                'percentage': round(present / total * 100, 2) if total else 0.0,
+                'below_threshold': int((student_pct[mask] < threshold).sum())
+            }
+
+        row_levels = levels[student_index]
+        return {
+            'month': f"{year}-{month:02d}",
+            'threshold': threshold,
+            'school': summarize(np.ones(students.size, dtype=bool), np.ones(bits.size, dtype=bool)),
+            'grade_levels': {
+                level or 'Unassigned': summarize(levels == level, row_levels == level)
+                for level in sorted(set(levels.tolist()))
+            }
         }
 
     def bulk_mark_attendance(self, course_id: int, attendance_date: date, attendance_data: List[Dict]) -> Dict:
         """Mark attendance for multiple students at once"""
-        from tables.tables import AttendanceCreate
-        
-        attendance_list = []
-        for data in attendance_data:
-            attendance_list.append(
-                AttendanceCreate(
-                    student_id=data['student_id'],
-                    course_id=course_id,
-                    date=attendance_date,
-                    status=data['status']
-                )
-            )
-        
-        records = self.attendance_repo.mark_attendance(attendance_list)
-        
+        records = AttendanceRepository.upsert_bulk(self.db, [{
+            'student_id': data['student_id'],
+            'course_id': course_id,
+            'date': attendance_date,
+            'status': data['status']
+        } for data in attendance_data])
+
         return {
             'message': f'Attendance marked for {len(records)} students',
             'date': attendance_date,
             'course_id': course_id
-        }
\ No newline at end of file
+        }
+
+
+def refresh_attendance_summaries():
+    """Rebuild attendance counters and month bitmaps from raw attendance (scheduled job)"""
+    db = SessionLocal()
+    try:
+        AttendanceSummaryRepository.rebuild(db)
+        AttendanceBitmapRepository.rebuild(db)
+        logger.info("Rebuilt student attendance counters and month bitmaps")
+
+    except Exception as e:
+        logger.error(f"Error rebuilding attendance counters: {e}")
+        db.rollback()
+    finally:
+        db.close()
@@ -0,0 +1,276 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import date, datetime, time, timedelta
+from collections import defaultdict
+import json
+import threading
+import logging
+from config.config import settings
+from database.database import SessionLocal
+from models.models import Student, CourseEnrollment, Schedule
+from repositories.attendance_repository import AttendanceRepository
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+class BufferFull(Exception):
+    """Raised when the tap buffer is at capacity; readers should retry later"""
+    pass
+
+def _parse_timestamp(value) -> datetime:
+    ts = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    # Store local wall-clock time, like the rest of the attendance data
+    return ts.astimezone().replace(tzinfo=None) if ts.tzinfo else ts
+
+class TapIngestBuffer:
+    """In-memory buffer between gate readers and the attendance table.
+
+    Only the earliest tap per (student, day) matters, so events are
+    deduplicated on arrival: a tap is dropped when an earlier one for the
+    same student and day is already pending, or when that student and day
+    were already folded into attendance. Pending taps are folded
+    periodically by flush(), which resolves each student's courses for
+    that weekday and inserts present/late rows. A tap never overwrites an
+    existing attendance row, so a teacher's mark wins, and a tap folded
+    again after a restart (when the in-memory dedupe state is gone)
+    changes nothing.
+
+    Ingestion runs on the event loop and flush() in the scheduler's worker
+    thread, so all shared state is guarded by one lock that is never held
+    across database calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[int, date], Tuple[datetime, datetime]] = {}  # -> (tap time, received at)
+        self._folded: Dict[Tuple[int, date], datetime] = {}
+        self._cards: Dict[str, int] = {}
+        self._courses: Dict[int, List[int]] = {}
+        self._schedule: Dict[Tuple[int, str], time] = {}
+        self._maps_loaded_at: Optional[datetime] = None
+        self._unknown_cards: Dict[str, None] = {}
+        self._metrics = defaultdict(int)
+        self._last_flush: Dict = {}
+
+    # ------------------------------------------------------------------
+    # Lookup maps
+    # ------------------------------------------------------------------
+
+    def refresh_maps(self, db: Session):
+        """Reload card -> student, student -> courses and course schedule maps"""
+        cards = {
+            card_id: student_id for card_id, student_id in
+            db.query(Student.card_id, Student.id).filter(Student.card_id.isnot(None)).all()
+        }
+        courses = defaultdict(list)
+        for student_id, course_id in db.query(CourseEnrollment.student_id, CourseEnrollment.course_id).all():
+            courses[student_id].append(course_id)
+        schedule = {}
+        for course_id, day_of_week, start_time in db.query(
+                Schedule.course_id, Schedule.day_of_week, Schedule.start_time).all():
+            key = (course_id, day_of_week.strip().lower())
+            schedule[key] = min(start_time, schedule.get(key, start_time))
+
+        with self._lock:
+            self._cards, self._courses, self._schedule = cards, dict(courses), schedule
+            self._maps_loaded_at = datetime.utcnow()
+            self._unknown_cards.clear()
+
+    def ensure_maps(self, db: Session):
+        """Load the lookup maps on first use (before the first flush has run)"""
+        if self._maps_loaded_at is None:
+            self.refresh_maps(db)
+
+    def maps_stale(self) -> bool:
+        return self._maps_loaded_at is None or (
+            datetime.utcnow() - self._maps_loaded_at
+        ).total_seconds() >= settings.ATTENDANCE_TAP_MAP_REFRESH_SECONDS
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    def check_capacity(self):
+        """Raise BufferFull when the buffer is at capacity, so a reader can be
+        turned away before its batch is received"""
+        with self._lock:
+            if len(self._pending) >= settings.ATTENDANCE_TAP_BUFFER_SIZE:
+                self._metrics['rejected_batches'] += 1
+                raise BufferFull()
+
+    def ingest(self, lines: Iterable[bytes]) -> Dict:
+        """Parse NDJSON tap events ({"card_id", "ts"}) and buffer them.
+
+        Raises BufferFull without buffering any of the batch when it does
+        not fit in the remaining capacity, so a rejected batch can simply be
+        resent.
+        """
+
+        result = {'accepted': 0, 'duplicates': 0, 'unknown_cards': 0, 'invalid': 0}
+        received_at = datetime.utcnow()
+        events = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                event = json.loads(line)
+                events.append((str(event['card_id']), _parse_timestamp(event['ts'])))
+            except (ValueError, KeyError, TypeError):
+                result['invalid'] += 1
+
+        with self._lock:
+            if len(self._pending) + len(events) > settings.ATTENDANCE_TAP_BUFFER_SIZE:
+                self._metrics['rejected_batches'] += 1
+                raise BufferFull()
+
+            for card_id, ts in events:
+                student_id = self._cards.get(card_id)
+                if student_id is None:
+                    result['unknown_cards'] += 1
+                    if len(self._unknown_cards) < 100:
+                        self._unknown_cards[card_id] = None
+                    continue
+
+                key = (student_id, ts.date())
+                pending = self._pending.get(key)
+                if key in self._folded or (pending and pending[0] <= ts):
+                    result['duplicates'] += 1
+                    continue
+
+                self._pending[key] = (ts, pending[1] if pending else received_at)
+                result['accepted'] += 1
+
+            for name, count in result.items():
+                self._metrics[name] += count
+            self._metrics['received'] += len(events) + result['invalid']
+            result['pending'] = len(self._pending)
+
+        return result
+
+    # ------------------------------------------------------------------
+    # Folding into attendance
+    # ------------------------------------------------------------------
+
+    def flush(self, db: Session) -> int:
+        """Fold pending taps into attendance rows; returns rows inserted"""
+        if self.maps_stale():
+            self.refresh_maps(db)
+
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            courses, schedule = self._courses, self._schedule
+        if not batch:
+            return 0
+
+        started = datetime.utcnow()
+        rows = []
+        for (student_id, day), (ts, _) in batch.items():
+            rows.extend(self._attendance_rows(student_id, day, ts, courses, schedule))
+
+        written = 0
+        try:
+            for i in range(0, len(rows), settings.ATTENDANCE_TAP_FLUSH_CHUNK):
+                written += len(AttendanceRepository.insert_missing_bulk(
+                    db, rows[i:i + settings.ATTENDANCE_TAP_FLUSH_CHUNK]
+                ))
+        except Exception:
+            db.rollback()
+            with self._lock:
+                # Put the batch back unless a newer, earlier tap arrived meanwhile
+                for key, value in batch.items():
+                    current = self._pending.get(key)
+                    if current is None or value[0] < current[0]:
+                        self._pending[key] = value
+                self._metrics['flush_errors'] += 1
+            raise
+
+        finished = datetime.utcnow()
+        oldest = min(received for _, received in batch.values())
+        with self._lock:
+            for key, (ts, _) in batch.items():
+                if key not in self._folded or ts < self._folded[key]:
+                    self._folded[key] = ts
+            # Yesterday is kept so taps straddling midnight still deduplicate
+            cutoff = date.today() - timedelta(days=1)
+            self._folded = {key: ts for key, ts in self._folded.items() if key[1] >= cutoff}
+
+            self._metrics['flushes'] += 1
+            self._metrics['flushed_taps'] += len(batch)
+            self._metrics['attendance_rows_written'] += written
+            self._last_flush = {
+                'at': finished,
+                'taps': len(batch),
+                'rows': written,
+                'duration_ms': round((finished - started).total_seconds() * 1000, 1),
+                'ingest_lag_seconds': round((finished - oldest).total_seconds(), 3)
+            }
+        return written
+
+    @staticmethod
+    def _attendance_rows(student_id: int, day: date, ts: datetime,
+                         courses: Dict[int, List[int]], schedule: Dict[Tuple[int, str], time]) -> List[Dict]:
+        """present/late rows for the student's courses on that day.
+
+        Courses scheduled on the tap's weekday are marked late when the first
+        tap is after the class start plus the grace period. Students whose
+        courses have no schedule that weekday get every enrolled course,
+        judged against ATTENDANCE_TAP_LATE_AFTER.
+        """
+        weekday = WEEKDAYS[day.weekday()]
+        enrolled = courses.get(student_id, [])
+        scheduled = [(cid, schedule[(cid, weekday)]) for cid in enrolled if (cid, weekday) in schedule]
+        if not scheduled:
+            cutoff = time.fromisoformat(settings.ATTENDANCE_TAP_LATE_AFTER)
+            scheduled = [(cid, cutoff) for cid in enrolled]
+            grace = timedelta(0)
+        else:
+            grace = timedelta(minutes=settings.ATTENDANCE_TAP_GRACE_MINUTES)
+
+        rows = []
+        for course_id, start in scheduled:
+            late = ts > datetime.combine(day, start) + grace
+            rows.append({
+                'student_id': student_id,
+                'course_id': course_id,
+                'date': day,
+                'status': 'late' if late else 'present'
+            })
+        return rows
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def metrics(self) -> Dict:
+        now = datetime.utcnow()
+        with self._lock:
+            oldest = min((received for _, received in self._pending.values()), default=None)
+            return {
+                'pending': len(self._pending),
+                'capacity': settings.ATTENDANCE_TAP_BUFFER_SIZE,
+                'utilization': round(len(self._pending) / settings.ATTENDANCE_TAP_BUFFER_SIZE, 4),
+                'oldest_pending_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0.0,
+                'known_cards': len(self._cards),
+                'maps_loaded_at': self._maps_loaded_at,
+                'recent_unknown_cards': list(self._unknown_cards),
+                'counters': dict(self._metrics),
+                'last_flush': dict(self._last_flush)
+            }
+
+tap_buffer = TapIngestBuffer()
+
+
+def flush_attendance_taps():
+    """Fold buffered gate taps into attendance (scheduled job)"""
+    db = SessionLocal()
+    try:
+        written = tap_buffer.flush(db)
+        if written:
+            logger.info(f"Folded gate taps into {written} attendance rows")
+
+    except Exception as e:
+        logger.error(f"Error folding attendance taps: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,174 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from typing import Iterable, Optional
+from datetime import datetime, timedelta
+import logging
+import os
+import re
+import shutil
+from config.config import settings
+from database.database import SessionLocal
+from repositories.blob_repository import BlobRepository
+from utils.uploads import ReceivedFile, file_extension, file_sha256, sniff_type, SNIFF_BYTES
+
+logger = logging.getLogger(__name__)
+
+GC_BATCH_SIZE = 500
+
+def blob_root() -> str:
+    return f"{settings.UPLOAD_DIR}/blobs"
+
+def blob_path(sha256: str, extension: str) -> str:
+    """Storage path of a blob; the extension of its first upload is kept for serving"""
+    return f"{blob_root()}/{sha256[:2]}/{sha256}" + (f".{extension}" if extension else "")
+
+def is_blob_path(path: Optional[str]) -> bool:
+    return bool(path) and path.startswith(f"{blob_root()}/")
+
+def in_upload_dir(path: str) -> bool:
+    """True for paths inside UPLOAD_DIR; stored paths are never trusted to point anywhere else"""
+    return os.path.abspath(path).startswith(os.path.abspath(settings.UPLOAD_DIR) + os.sep)
+
+def download_name(title: str, path: str) -> str:
+    """File name offered on download: blob paths are hashes, so use the record's title"""
+    name = re.sub(r'[\\/:*?"<>|]+', '_', title).strip() or 'download'
+    extension = file_extension(path)
+    return f"{name}.{extension}" if extension else name
+
+class BlobService:
+    """Content-addressed storage for uploaded files.
+
+    Uploads are stored once per SHA-256 under UPLOAD_DIR/blobs and records
+    keep the blob path in their file_path column. A blob's ref_count is the
+    number of rows pointing at it: uploading content that is already stored
+    only takes another reference, and deleting a record only releases one.
+    Unreferenced blobs are removed by collect_blob_garbage() after a grace
+    period. The same job recounts references from the referencing tables,
+    which repairs counts missed by cascading deletes.
+    """
+
+    @staticmethod
+    def store(db: Session, upload: ReceivedFile) -> str:
+        """Store a received upload (or reference the identical stored blob); returns its path"""
+        for _ in range(2):
+            blob = BlobRepository.get_by_sha256(db, upload.sha256)
+            if blob is not None:
+                if not os.path.exists(blob.path):
+                    upload.save(blob.path)  # restore a file lost from disk
+                if BlobRepository.add_references(db, blob.id):
+                    upload.discard()
+                    return blob.path
+                continue  # collected meanwhile
+
+            path = blob_path(upload.sha256, upload.extension)
+            upload.save(path)
+            try:
+                BlobRepository.create(db, upload.sha256, path, upload.size, upload.mime_type)
+                return path
+            except IntegrityError:
+                # Stored concurrently by another request; reference that one
+                db.rollback()
+        raise RuntimeError(f"Could not store blob {upload.sha256}")
+
+    @staticmethod
+    def release(db: Session, paths: Iterable[Optional[str]]):
+        """Release the files of deleted records. Files stored before the blob
+        store are not shared and are deleted directly, but only from inside
+        UPLOAD_DIR."""
+        blob_paths = []
+        for path in paths:
+            if is_blob_path(path):
+                blob_paths.append(path)
+            elif path and in_upload_dir(path) and os.path.isfile(path):
+                os.remove(path)
+        BlobRepository.release(db, blob_paths)
+
+    @staticmethod
+    def adopt_legacy_files(db: Session) -> int:
+        """Move files stored before the blob store into it; returns files adopted"""
+        adopted = 0
+        for path, references in BlobRepository.get_legacy_paths(db, f"{blob_root()}/").items():
+            if not in_upload_dir(path) or not os.path.isfile(path):
+                continue
+            sha256 = file_sha256(path)
+            if sha256 is None:
+                continue
+
+            blob = BlobRepository.get_by_sha256(db, sha256)
+            if blob is None:
+                with open(path, 'rb') as f:
+                    head = f.read(SNIFF_BYTES)
+                target = blob_path(sha256, file_extension(path))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                # Link first so the old path stays valid until rows are repointed
+                try:
+                    os.link(path, target)
+                except FileExistsError:
+                    pass
+                except OSError:
+                    shutil.copy2(path, target)
+                BlobRepository.create(db, sha256, target, os.path.getsize(path), sniff_type(head), references)
+            else:
+                if not os.path.exists(blob.path):
+                    shutil.copy2(path, blob.path)
+                BlobRepository.add_references(db, blob.id, references)
+                target = blob.path
+
+            BlobRepository.repoint(db, path, target)
+            os.remove(path)
+            adopted += 1
+        return adopted
+
+    @staticmethod
+    def reconcile_ref_counts(db: Session) -> int:
+        """Set every blob's ref_count to its actual number of references; returns blobs fixed"""
+        counts = BlobRepository.count_references(db, f"{blob_root()}/")
+        now = datetime.utcnow()
+        fixes = [
+            {
+                'id': blob_id,
+                'ref_count': counts.get(path, 0),
+                'released_at': (released_at or now) if not counts.get(path) else None
+            }
+            for blob_id, path, ref_count, released_at in BlobRepository.get_all(db)
+            if ref_count != counts.get(path, 0)
+        ]
+        BlobRepository.set_ref_counts_bulk(db, fixes)
+        return len(fixes)
+
+    @staticmethod
+    def collect(db: Session) -> int:
+        """Delete blobs unreferenced for longer than the grace period; returns blobs deleted"""
+        cutoff = datetime.utcnow() - timedelta(hours=settings.BLOB_GC_GRACE_HOURS)
+        deleted = 0
+        while True:
+            candidates = BlobRepository.get_collectable(db, cutoff, GC_BATCH_SIZE)
+            still_referenced = BlobRepository.count_references(db, f"{blob_root()}/", [path for _, path in candidates])
+            for blob_id, path in candidates:
+                if still_referenced.get(path):
+                    # A count that drifted low; never delete a referenced file
+                    BlobRepository.set_ref_counts_bulk(db, [{'id': blob_id, 'ref_count': still_referenced[path], 'released_at': None}])
+                    continue
+                if BlobRepository.delete_unreferenced(db, blob_id):
+                    if os.path.exists(path):
+                        os.remove(path)
+                    deleted += 1
+            if len(candidates) < GC_BATCH_SIZE:
+                return deleted
+
+
+def collect_blob_garbage():
+    """Adopt pre-blob-store files, repair reference counts and delete
+    unreferenced blobs (scheduled job)"""
+    db = SessionLocal()
+    try:
+        adopted = BlobService.adopt_legacy_files(db)
+        fixed = BlobService.reconcile_ref_counts(db)
+        deleted = BlobService.collect(db)
+        logger.info(f"Blob store: adopted {adopted} legacy files, fixed {fixed} ref counts, deleted {deleted} blobs")
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error collecting blob garbage: {e}")
+    finally:
+        db.close()
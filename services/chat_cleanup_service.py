@@ -1,6 +1,7 @@
 from datetime import datetime
 from database.database import SessionLocal
 from models.chat_models import ChatMessage
+from services.blob_service import BlobService
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,11 +11,16 @@ def cleanup_expired_messages():
     db = SessionLocal()
     try:
         now = datetime.utcnow()
+        file_paths = [row[0] for row in db.query(ChatMessage.file_path).filter(
+            ChatMessage.expires_at < now,
+            ChatMessage.file_path.isnot(None)
+        ).all()]
         deleted_count = db.query(ChatMessage).filter(
             ChatMessage.expires_at < now
         ).delete()
         
         db.commit()
+        BlobService.release(db, file_paths)
         logger.info(f"Cleaned up {deleted_count} expired chat messages")
         
     except Exception as e:
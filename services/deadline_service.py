@@ -0,0 +1,252 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Hashable, List, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import logging
+from config.config import settings
+from database.advisory_lock import AdvisoryLock
+from database.database import SessionLocal
+from models.models import Student
+from repositories.assignment_repository import AssignmentRepository
+from repositories.course_repository import CourseRepository
+from repositories.fee_repository import FeeRepository
+from repositories.test_repository import TestRepository
+from services.test_service import TestService
+from services.test_paper_service import TestPaperService
+from services.paper_generation_service import PaperGenerationService
+from services.test_autosave_service import autosave_buffer
+from services.test_grading_service import TestGradingService
+from utils.deadline_queue import deadlines, local_midnight_after
+from utils.websocket_manager import manager
+
+logger = logging.getLogger(__name__)
+
+Push = Tuple[int, Dict]  # (user_id, message)
+
+def load_deadlines(db: Session, start: datetime, end: datetime):
+    """Queue every deadline in (start, end] with index range scans"""
+    for assignment_id, due_date in AssignmentRepository.get_due_between(db, start, end):
+        deadlines.schedule('assignment_due', assignment_id, due_date)
+
+    for test_id, start_time, end_time in TestRepository.get_deadlines_between(db, start, end):
+        if start < start_time <= end:
+            deadlines.schedule('test_open', test_id, start_time)
+        if start < end_time <= end:
+            deadlines.schedule('test_close', test_id, end_time)
+
+    # A date-only fee deadline passes at the following local midnight
+    for due_date in FeeRepository.get_unpaid_due_dates_between(db, start.date() - timedelta(days=2), end.date()):
+        when = local_midnight_after(due_date)
+        if start < when <= end:
+            deadlines.schedule('fee_due', due_date, when)
+
+# ----------------------------------------------------------------------
+# Event handlers: re-check the row, apply the change, return pushes
+# ----------------------------------------------------------------------
+
+def _assignment_due(db: Session, assignment_id: int, now: datetime) -> List[Push]:
+    assignment = AssignmentRepository.get_by_id(db, assignment_id)
+    if not assignment or assignment.due_date > now:
+        return []  # deleted, or moved later and already rescheduled
+
+    missing = AssignmentRepository.get_missing_submitters(db, assignment)
+    message = {
+        'type': 'deadline',
+        'event': 'assignment_due',
+        'assignment_id': assignment.id,
+        'course_id': assignment.course_id,
+        'title': assignment.title,
+        'due_date': assignment.due_date.isoformat()
+    }
+    pushes = [(user_id, dict(message, submitted=False)) for user_id in missing]
+    if assignment.teacher:
+        pushes.append((assignment.teacher.user_id, dict(message, missing_submissions=len(missing))))
+    return pushes
+
+def _test_open(db: Session, test_id: int, now: datetime) -> List[Push]:
+    test = TestRepository.get_by_id(db, test_id)
+    if not test or not TestService.is_test_available(test):
+        return []
+
+    # Draw question-bank papers and compile the student paper before the start burst arrives
+    PaperGenerationService.generate_for_test(db, test)
+    TestPaperService.warm(db, test.id)
+
+    message = {
+        'type': 'deadline',
+        'event': 'test_opened',
+        'test_id': test.id,
+        'course_id': test.course_id,
+        'title': test.title,
+        'end_time': test.end_time.isoformat()
+    }
+    return [(user_id, message) for user_id in CourseRepository.get_enrolled_user_ids(db, test.course_id)]
+
+def _test_close(db: Session, test_id: int, now: datetime) -> List[Push]:
+    """Submit attempts still open when the test window ends"""
+    test = TestRepository.get_by_id(db, test_id)
+    if not test or test.end_time > now:
+        return []
+
+    # Autosaves accepted up to end_time may still sit in another worker's
+    # buffer; wait until every worker's periodic flush has written them
+    closes_at = test.end_time + timedelta(seconds=2 * settings.TEST_AUTOSAVE_FLUSH_SECONDS)
+    if closes_at > now:
+        deadlines.schedule('test_close', test.id, closes_at)
+        return []
+
+    # Grade what was autosaved up to the close, not what was last flushed
+    try:
+        autosave_buffer.flush(db)
+    except Exception as e:
+        logger.error(f"Error flushing autosaves before closing test {test_id}: {e}")
+
+    # Submitted attempts are graded by the grading worker, which pushes results
+    attempts = TestRepository.submit_open_attempts(db, test.id, test.end_time)
+    for submission_id, _ in attempts:
+        autosave_buffer.discard(submission_id)
+    TestGradingService.notify()
+
+    student_ids = [student_id for _, student_id in attempts]
+    auto_submitted = {
+        user_id for (user_id,) in
+        db.query(Student.user_id).filter(Student.id.in_(student_ids)).all()
+    } if student_ids else set()
+
+    message = {
+        'type': 'deadline',
+        'event': 'test_closed',
+        'test_id': test.id,
+        'course_id': test.course_id,
+        'title': test.title
+    }
+    return [
+        (user_id, dict(message, auto_submitted=user_id in auto_submitted))
+        for user_id in CourseRepository.get_enrolled_user_ids(db, test.course_id)
+    ]
+
+def _fee_due(db: Session, due_date, now: datetime) -> List[Push]:
+    if local_midnight_after(due_date) > now:
+        return []
+
+    student_ids = set(FeeRepository.mark_overdue_on(db, due_date))
+    if not student_ids:
+        return []
+
+    message = {'type': 'deadline', 'event': 'fee_overdue', 'due_date': due_date.isoformat()}
+    return [
+        (user_id, message) for (user_id,) in
+        db.query(Student.user_id).filter(Student.id.in_(student_ids)).all()
+    ]
+
+HANDLERS = {
+    'assignment_due': _assignment_due,
+    'test_open': _test_open,
+    'test_close': _test_close,
+    'fee_due': _fee_due
+}
+
+def fire_deadline(kind: str, key: Hashable) -> List[Push]:
+    db = SessionLocal()
+    try:
+        pushes = HANDLERS[kind](db, key, datetime.utcnow())
+        logger.info(f"Deadline {kind} {key}: {len(pushes)} notifications")
+        return pushes
+    except Exception as e:
+        logger.error(f"Error handling deadline {kind} {key}: {e}")
+        db.rollback()
+        return []
+    finally:
+        db.close()
+
+def _catch_up_and_load(start: datetime, end: datetime):
+    db = SessionLocal()
+    try:
+        # Fees that fell due while the app was down (or before this scheduler existed)
+        FeeRepository.update_overdue_status(db)
+        load_deadlines(db, start, end)
+    finally:
+        db.close()
+
+def _load(start: datetime, end: datetime):
+    db = SessionLocal()
+    try:
+        load_deadlines(db, start, end)
+    finally:
+        db.close()
+
+async def run_deadline_scheduler():
+    """Fire deadlines from a single process.
+
+    Every worker starts this task, but only the one holding the scheduler
+    lock loads and fires deadlines; the others retry the lock every
+    DEADLINE_RESYNC_SECONDS and take over (catching up on what was missed)
+    if the holder exits. Pushes only reach websockets connected to the
+    process that holds the lock, since connections are per process.
+    """
+    lock = AdvisoryLock('deadline-scheduler')
+    try:
+        while True:
+            if await asyncio.to_thread(lock.try_acquire):
+                logger.info("Deadline scheduler lock acquired")
+                await _run_deadlines(lock)
+                logger.warning("Deadline scheduler lock lost")
+            await asyncio.sleep(settings.DEADLINE_RESYNC_SECONDS)
+    finally:
+        lock.release()
+
+async def _run_deadlines(lock: AdvisoryLock):
+    """Sleep until the next deadline (or an edit that moves it earlier) and
+    fire only the events that are due. Database work runs in worker threads;
+    pushes go out on the event loop.
+
+    Edits made in other workers never reach this queue, so the loaded
+    window is reloaded every DEADLINE_RESYNC_SECONDS from the previous
+    reload onwards; deadlines that already fired are not fired again."""
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    deadlines.start(lambda: loop.call_soon_threadsafe(wake.set))
+
+    horizon = timedelta(hours=settings.DEADLINE_HORIZON_HOURS)
+    resync = timedelta(seconds=settings.DEADLINE_RESYNC_SECONDS)
+    now = datetime.utcnow()
+    loaded_until = now + horizon
+    synced_from, next_sync = now, now + resync
+    deadlines.set_horizon(loaded_until)
+
+    try:
+        await asyncio.to_thread(_catch_up_and_load, now - timedelta(hours=settings.DEADLINE_CATCHUP_HOURS), loaded_until)
+        while True:
+            wake.clear()
+            now = datetime.utcnow()
+
+            # Slide the in-memory window forward halfway through it
+            if now >= loaded_until - horizon / 2:
+                new_until = now + horizon
+                deadlines.set_horizon(new_until)
+                await asyncio.to_thread(_load, loaded_until, new_until)
+                loaded_until = new_until
+
+            if now >= next_sync:
+                if not await asyncio.to_thread(lock.check):
+                    return
+                deadlines.forget_fired(synced_from)
+                await asyncio.to_thread(_load, synced_from, loaded_until)
+                synced_from, next_sync = now, now + resync
+
+            for kind, key, _ in deadlines.pop_due(now):
+                pushes = await asyncio.to_thread(fire_deadline, kind, key)
+                for user_id, message in pushes:
+                    await manager.send_personal_message(message, user_id)
+
+            next_at = deadlines.next_deadline()
+            wait_until = min(next_sync, loaded_until - horizon / 2)
+            if next_at:
+                wait_until = min(wait_until, next_at)
+            timeout = max((wait_until - datetime.utcnow()).total_seconds(), 0)
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        deadlines.stop()
@@ -0,0 +1,159 @@
+from sqlalchemy.orm import Session
+from typing import Dict, List, Sequence
+from datetime import date, datetime
+import threading
+import numpy as np
+from config.config import settings
+from repositories.fee_repository import FeeRepository
+
+AGING_BUCKETS = ['0-30', '31-60', '61-90', '90+']
+AGING_EDGES = [31, 61, 91]  # first day of each later bucket
+TREND_MONTHS = 12
+
+_cache: Dict = {}
+_cache_lock = threading.Lock()
+
+def _factorize(*columns: np.ndarray):
+    """Unique key tuples over the given columns and each row's group index"""
+    codes = []
+    uniques = []
+    for column in columns:
+        values, inverse = np.unique(column, return_inverse=True)
+        uniques.append(values)
+        codes.append(inverse.ravel())
+    groups, inverse = np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)
+    keys = [tuple(uniques[i][code] for i, code in enumerate(group)) for group in groups]
+    return keys, inverse.ravel()
+
+def _rate(collected: float, billed: float) -> float:
+    return round(collected / billed * 100, 1) if billed else 0.0
+
+def compute_aging(grade: np.ndarray, section: np.ndarray, fee_type: np.ndarray, due: np.ndarray,
+                  amount: np.ndarray, paid: np.ndarray, status: np.ndarray, today: date) -> Dict:
+    """Aging buckets and collection trends from column arrays, one row per fee record.
+
+    Overdue balances are bucketed by days past due with np.digitize and
+    summed per group with one bincount over (group, bucket).
+    """
+    balance = np.clip(amount - paid, 0, None)
+    unpaid = (status != 'paid') & (balance > 0)
+    days = (np.datetime64(today, 'D') - due).astype(np.int64)
+    overdue = unpaid & (days > 0)
+    bucket = np.digitize(days, AGING_EDGES)
+    outstanding = np.where(unpaid, balance, 0.0)
+    overdue_balance = np.where(overdue, balance, 0.0)
+
+    def breakdown(names: Sequence[str], *columns: np.ndarray) -> List[Dict]:
+        if not amount.size:
+            return []
+        keys, group = _factorize(*columns)
+        count = len(keys)
+        aged = np.bincount(group * len(AGING_BUCKETS) + bucket, weights=overdue_balance,
+                           minlength=count * len(AGING_BUCKETS)).reshape(count, len(AGING_BUCKETS))
+        billed = np.bincount(group, weights=amount, minlength=count)
+        collected = np.bincount(group, weights=np.minimum(paid, amount), minlength=count)
+        owed = np.bincount(group, weights=outstanding, minlength=count)
+
+        rows = []
+        for i, key in enumerate(keys):
+            row = {name: str(value) for name, value in zip(names, key)}
+            row.update({
+                'buckets': {label: round(float(value), 2) for label, value in zip(AGING_BUCKETS, aged[i])},
+                'overdue': round(float(aged[i].sum()), 2),
+                'outstanding': round(float(owed[i]), 2),
+                'billed': round(float(billed[i]), 2),
+                'collected': round(float(collected[i]), 2),
+                'collection_rate': _rate(collected[i], billed[i])
+            })
+            rows.append(row)
+        return sorted(rows, key=lambda r: r['overdue'], reverse=True)
+
+    # Collection trend by due month, up to the current month
+    trend = []
+    if amount.size:
+        months = due.astype('datetime64[M]')
+        current = np.datetime64(today, 'M')
+        in_range = (months <= current) & (months > current - TREND_MONTHS)
+        labels, month_index = np.unique(months[in_range], return_inverse=True)
+        billed = np.bincount(month_index, weights=amount[in_range], minlength=len(labels))
+        collected = np.bincount(month_index, weights=np.minimum(paid, amount)[in_range], minlength=len(labels))
+        trend = [{
+            'month': str(label),
+            'billed': round(float(b), 2),
+            'collected': round(float(c), 2),
+            'collection_rate': _rate(c, b)
+        } for label, b, c in zip(labels, billed, collected)]
+
+    billed_total = float(amount.sum())
+    collected_total = float(np.minimum(paid, amount).sum())
+    return {
+        'as_of': today.isoformat(),
+        'buckets': AGING_BUCKETS,
+        'totals': {
+            'records': int(amount.size),
+            'billed': round(billed_total, 2),
+            'collected': round(collected_total, 2),
+            'outstanding': round(float(outstanding.sum()), 2),
+            'overdue': round(float(overdue_balance.sum()), 2),
+            'collection_rate': _rate(collected_total, billed_total),
+            'aging': {
+                label: round(float(overdue_balance[overdue & (bucket == i)].sum()), 2)
+                for i, label in enumerate(AGING_BUCKETS)
+            }
+        },
+        'status_counts': {
+            'paid': int((~unpaid).sum()),
+            'pending': int((unpaid & ~overdue).sum()),
+            'overdue': int(overdue.sum())
+        },
+        'by_grade': breakdown(['grade_level'], grade),
+        'by_fee_type': breakdown(['fee_type'], fee_type),
+        'by_grade_section_fee_type': breakdown(['grade_level', 'section', 'fee_type'], grade, section, fee_type),
+        'trend': trend
+    }
+
+class FeeAnalyticsService:
+    """Fee aging and collection analytics.
+
+    The report is built from one streamed query of plain columns and cached
+    per process. The cache is keyed on FeeRepository.generation(), which
+    every fee write (including payment posting) bumps, and on the date;
+    FEE_ANALYTICS_CACHE_SECONDS bounds staleness from other workers' writes.
+    """
+
+    @staticmethod
+    def get_aging_report(db: Session) -> Dict:
+        key = (FeeRepository.generation(), date.today())
+        with _cache_lock:
+            cached = _cache.get('aging')
+            if cached and cached['key'] == key and \
+                    (datetime.utcnow() - cached['built_at']).total_seconds() < settings.FEE_ANALYTICS_CACHE_SECONDS:
+                return cached['report']
+
+        report = FeeAnalyticsService.build_aging_report(db, key[1])
+        with _cache_lock:
+            _cache['aging'] = {'key': key, 'built_at': datetime.utcnow(), 'report': report}
+        return report
+
+    @staticmethod
+    def build_aging_report(db: Session, today: date = None) -> Dict:
+        grade, section, fee_type, due, amount, paid, status = [], [], [], [], [], [], []
+        for row in FeeRepository.iter_aging_rows(db):
+            grade.append(row[0] or '')
+            section.append(row[1] or '')
+            fee_type.append(row[2] or '')
+            due.append(row[3])
+            amount.append(row[4] or 0.0)
+            paid.append(row[5] or 0.0)
+            status.append(row[6] or 'pending')
+
+        return compute_aging(
+            np.array(grade, dtype=str),
+            np.array(section, dtype=str),
+            np.array(fee_type, dtype=str),
+            np.array(due, dtype='datetime64[D]'),
+            np.array(amount, dtype=float),
+            np.array(paid, dtype=float),
+            np.array(status, dtype=str),
+            today or date.today()
+        )
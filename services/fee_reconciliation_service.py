@@ -0,0 +1,319 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import date, datetime
+from collections import defaultdict, Counter
+from difflib import SequenceMatcher
+from functools import lru_cache
+from sqlalchemy.exc import IntegrityError
+import csv
+import hashlib
+import re
+from config.config import settings
+from repositories.fee_repository import FeeRepository
+
+# Accepted header spellings for each statement column
+COLUMN_ALIASES = {
+    'date': ('date', 'transaction date', 'value date', 'posting date', 'txn date'),
+    'amount': ('amount', 'credit', 'credit amount', 'deposit', 'amount credited'),
+    'reference': ('reference', 'ref', 'reference no', 'ref no', 'cheque/ref no', 'utr'),
+    'description': ('description', 'narration', 'details', 'particulars', 'remarks'),
+    'student_id': ('student_id', 'student id', 'student code', 'roll no')
+}
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d %b %Y', '%d-%b-%Y', '%d.%m.%Y')
+FEE_REFERENCE = re.compile(r'^FEE-?(\d+)$')
+MAX_SUGGESTIONS = 3
+
+def _cents(amount: float) -> int:
+    return int(round(amount * 100))
+
+_AMOUNT = re.compile(r'^[+-]?(\d{1,3}(,\d{3})+|\d+)(\.\d+)?$')
+_CURRENCY = re.compile(r'^(INR|RS\.?|USD|EUR|GBP|₹|\$|€|£)\s*', re.IGNORECASE)
+_DR_CR = re.compile(r'(?<![A-Za-z])(DR|CR)\.?$', re.IGNORECASE)
+
+def _parse_amount(value: str) -> Optional[float]:
+    """Signed amount of a statement cell; debits ("-500", "(500.00)",
+    "500.00 Dr") come back negative. None unless the whole cell parses, so
+    e.g. "1.200,50" is unreadable rather than 1.2005."""
+    text = (value or '').strip()
+    debit = False
+    if text.startswith('(') and text.endswith(')'):
+        debit, text = True, text[1:-1].strip()
+    suffix = _DR_CR.search(text)
+    if suffix:
+        debit = debit or suffix.group(1).upper() == 'DR'
+        text = text[:suffix.start()].strip()
+    text = _CURRENCY.sub('', text)
+    if not _AMOUNT.match(text):
+        return None
+    amount = float(text.replace(',', ''))
+    return -abs(amount) if debit else amount
+
+@lru_cache(maxsize=4096)  # statements repeat the same few dates
+def _parse_date(value: str) -> Optional[date]:
+    value = (value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def _words(text: str) -> List[str]:
+    return re.findall(r'[a-z]+', text.lower())
+
+def parse_statement(lines: Iterable[str]) -> Iterator[Tuple[int, Dict]]:
+    """Yield (line number, {date, amount, reference, description, student_id})
+    for each row of a bank statement CSV; unparseable rows get amount None"""
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+
+    positions = {}
+    normalized = [h.strip().lower() for h in header]
+    for column, aliases in COLUMN_ALIASES.items():
+        for index, name in enumerate(normalized):
+            if name in aliases:
+                positions[column] = index
+                break
+    if 'amount' not in positions:
+        raise ValueError("Statement has no amount/credit column")
+
+    for line_no, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        cell = lambda column: row[positions[column]].strip() if column in positions and positions[column] < len(row) else ''
+        yield line_no, {
+            'date': _parse_date(cell('date')),
+            'amount': _parse_amount(cell('amount')),
+            'reference': cell('reference'),
+            'description': cell('description'),
+            'student_id': cell('student_id')
+        }
+
+def _normalize(text: str) -> str:
+    return ' '.join((text or '').upper().split())
+
+def line_key(line: Dict, occurrence: int) -> str:
+    """Stable identity of a statement line for duplicate detection: the
+    reference (UTR) when there is one, otherwise the description, plus date
+    and amount. occurrence numbers identical lines within one statement, so
+    two genuine same-day payments stay distinct while a re-import of either
+    matches its earlier key."""
+    identity = _normalize(line.get('reference')) or 'DESC:' + _normalize(line.get('description'))
+    day = line['date'].isoformat() if line.get('date') else ''
+    text = f"{identity}|{day}|{_cents(line['amount'])}|{occurrence}"
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class StatementMatcher:
+    """Hash indexes over open fee balances for matching statement lines.
+
+    Lookups, in order of confidence:
+      1. a FEE-<id> token in the reference/description, for at most the balance
+      2. a student code token plus an amount equal to one of that student's
+         open balances (oldest due first)
+      3. the description compared with the names of students that have an
+         open balance of exactly that amount and share a name-word prefix
+    Each matched fee is consumed, so repeated lines do not pay it twice.
+    """
+
+    def __init__(self, open_fees: Iterable[Tuple[int, str, str, float]],
+                 name_cutoff: float = 0.9):
+        self.name_cutoff = name_cutoff
+        self._balance: Dict[int, int] = {}
+        self._owner: Dict[int, str] = {}
+        self._by_code_amount: Dict[Tuple[str, int], List[int]] = defaultdict(list)
+        self._by_code: Dict[str, List[int]] = defaultdict(list)
+        self._by_name_prefix: Dict[str, set] = defaultdict(set)  # word prefix -> names
+        self._name_codes: Dict[str, List[str]] = defaultdict(list)  # normalized name -> student codes
+        self._seen_codes = set()
+
+        for fee_id, code, full_name, balance in open_fees:
+            cents = _cents(balance or 0)
+            if cents <= 0 or not code:
+                continue
+            code = code.upper()
+            self._balance[fee_id] = cents
+            self._owner[fee_id] = code
+            self._by_code_amount[(code, cents)].append(fee_id)
+            self._by_code[code].append(fee_id)
+            if code not in self._seen_codes:
+                self._seen_codes.add(code)
+                words = _words(full_name or '')
+                name = ' '.join(words)
+                self._name_codes[name].append(code)
+                for word in words:
+                    if len(word) >= 3:
+                        self._by_name_prefix[word[:3]].add(name)
+
+    def match(self, line: Dict) -> Dict:
+        """{'fee_id', 'method'} for a confident match, else {'reason', 'suggestions'}"""
+        cents = _cents(line['amount'])
+        text = ' '.join((line.get('reference') or '', line.get('description') or '', line.get('student_id') or ''))
+        tokens = set(re.findall(r'[A-Z0-9\-]+', text.upper()))
+        tokens |= {part for token in tokens for part in token.split('-') if part}
+
+        for token in tokens:
+            found = FEE_REFERENCE.match(token)
+            if found:
+                fee_id = int(found.group(1))
+                if 0 < cents <= self._balance.get(fee_id, 0):
+                    self._consume(fee_id, cents)
+                    return {'fee_id': fee_id, 'method': 'fee_reference'}
+
+        codes = [token for token in tokens if token in self._by_code]
+        for code in codes:
+            fee_id = self._take(code, cents)
+            if fee_id:
+                return {'fee_id': fee_id, 'method': 'student_reference'}
+        if codes:
+            return {
+                'reason': 'Amount does not match an open balance for the referenced student',
+                'suggestions': self._open_fees(codes[0])
+            }
+
+        scored = self._score_names(line.get('description') or '', cents)
+        if scored:
+            best_score, best_code = scored[0]
+            unique = len(scored) == 1 or scored[1][0] < best_score
+            if best_score >= self.name_cutoff and unique:
+                fee_id = self._take(best_code, cents)
+                if fee_id:
+                    return {'fee_id': fee_id, 'method': 'name', 'score': round(best_score, 3)}
+            return {
+                'reason': 'No reference; closest names by amount',
+                'suggestions': [
+                    {'student_id': code, 'score': round(score, 3), 'fees': self._open_fees(code, cents)}
+                    for score, code in scored[:MAX_SUGGESTIONS]
+                ]
+            }
+
+        return {'reason': 'No reference or name match', 'suggestions': []}
+
+    def _take(self, code: str, cents: int) -> Optional[int]:
+        """Oldest fee of the student whose remaining balance is exactly `cents`"""
+        candidates = self._by_code_amount.get((code, cents))
+        while candidates:
+            fee_id = candidates.pop(0)
+            if self._balance.get(fee_id) == cents:
+                self._consume(fee_id, cents)
+                return fee_id
+        return None
+
+    def _consume(self, fee_id: int, cents: int):
+        remaining = self._balance[fee_id] - cents
+        if remaining > 0:
+            self._balance[fee_id] = remaining
+            self._by_code_amount[(self._owner[fee_id], remaining)].append(fee_id)
+        else:
+            del self._balance[fee_id]
+
+    def _open_fees(self, code: str, cents: int = None) -> List[Dict]:
+        fees = [
+            {'fee_id': fee_id, 'balance': self._balance[fee_id] / 100}
+            for fee_id in self._by_code.get(code, []) if fee_id in self._balance
+        ]
+        if cents is not None:
+            fees = [fee for fee in fees if _cents(fee['balance']) == cents] or fees
+        return fees[:MAX_SUGGESTIONS]
+
+    def _score_names(self, description: str, cents: int) -> List[Tuple[float, str]]:
+        """(similarity, code) for plausible students, best first.
+
+        Blocking keeps only the names sharing the most 3-letter word
+        prefixes with the description (so misspellings still block
+        together); each distinct name is compared once, and its students
+        are kept only if they have an open balance of exactly `cents`.
+        """
+        words = _words(description)
+        overlap = Counter()
+        for prefix in {word[:3] for word in words if len(word) >= 3}:
+            overlap.update(self._by_name_prefix.get(prefix, ()))
+        if not overlap:
+            return []
+        most = max(overlap.values())
+
+        scored = []
+        for name, count in overlap.items():
+            if count < most:
+                continue
+            codes = [
+                code for code in self._name_codes[name]
+                if any(self._balance.get(fee_id) == cents for fee_id in self._by_code_amount.get((code, cents), ()))
+            ]
+            if not codes:
+                continue
+            size = len(name.split())
+            windows = [' '.join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))]
+            score = max(SequenceMatcher(None, name, window).ratio() for window in windows)
+            scored.extend((score, code) for code in codes)
+        return sorted(scored, reverse=True)
+
+class FeeReconciliationService:
+    """Matches an uploaded bank statement against open fee records.
+
+    The statement is read row by row and open balances are loaded once as
+    plain tuples into StatementMatcher. Every credit line gets a line_key;
+    lines whose key was posted by an earlier import are returned as
+    duplicates without being matched, so importing a statement twice posts
+    each payment once. Confident matches are posted together with their
+    keys through FeeRepository.record_statement_payments (one transaction);
+    everything else is returned for manual review.
+    """
+
+    @staticmethod
+    def reconcile(db: Session, lines: Iterable[str], dry_run: bool = False) -> Dict:
+        matcher = StatementMatcher(FeeRepository.iter_open_balances(db), settings.FEE_RECONCILE_NAME_CUTOFF)
+
+        credits, invalid = [], []
+        skipped = 0
+        occurrences = Counter()
+        for line_no, line in parse_statement(lines):
+            if line['amount'] is None:
+                invalid.append({'line': line_no, 'reason': 'Unreadable amount'})
+                continue
+            if line['amount'] <= 0:
+                skipped += 1  # debits are not fee payments
+                continue
+            identity = line_key(line, 0)
+            occurrences[identity] += 1
+            credits.append((line_no, line, line_key(line, occurrences[identity])))
+
+        already_posted = FeeRepository.get_reconciled_line_keys(db, (key for _, _, key in credits))
+
+        matched, unmatched, duplicates = [], [], []
+        for line_no, line, key in credits:
+            entry = {'line': line_no, 'amount': line['amount'], 'date': line['date'], 'reference': line['reference']}
+            if key in already_posted:
+                duplicates.append(entry)
+                continue
+
+            result = matcher.match(line)
+            if 'fee_id' in result:
+                matched.append(dict(entry, line_key=key, **result))
+            else:
+                unmatched.append(dict(entry, description=line['description'], **result))
+
+        posting = None
+        if matched and not dry_run:
+            try:
+                posting = FeeRepository.record_statement_payments(db, matched)
+            except IntegrityError:
+                db.rollback()
+                raise ValueError("Some of these statement lines were posted by another import meanwhile; "
+                                 "nothing was posted, retry to skip them")
+
+        return {
+            'lines_matched': len(matched),
+            'lines_unmatched': len(unmatched),
+            'lines_duplicate': len(duplicates),
+            'lines_invalid': len(invalid),
+            'debits_skipped': skipped,
+            'amount_matched': round(sum(m['amount'] for m in matched), 2),
+            'posted': posting is not None,
+            'posting': posting,
+            'matched': matched,
+            'unmatched': unmatched,
+            'duplicates': duplicates,
+            'invalid': invalid
+        }
@@ -0,0 +1,42 @@
+import logging
+from config.config import settings
+from database.database import SessionLocal
+from repositories.fee_structure_repository import FeeStructureRepository
+
+logger = logging.getLogger(__name__)
+
+def apply_fee_structure(structure_id: int):
+    """Generate fee records for a fee structure's grade (background job)"""
+    db = SessionLocal()
+    try:
+        structure = FeeStructureRepository.get_by_id(db, structure_id)
+        if not structure:
+            return
+        
+        FeeStructureRepository.apply_to_students(db, structure, settings.FEE_APPLY_CHUNK_SIZE)
+        logger.info(
+            f"Applied fee structure {structure_id}: {structure.records_created} fee records "
+            f"for {structure.students_applied} students"
+        )
+    
+    except Exception as e:
+        logger.error(f"Error applying fee structure {structure_id}: {e}")
+        db.rollback()
+        structure = FeeStructureRepository.get_by_id(db, structure_id)
+        if structure:
+            structure.application_status = 'failed'
+            structure.application_error = str(e)
+            db.commit()
+    finally:
+        db.close()
+
+def resume_fee_structure_applications():
+    """Re-run applications left queued or running by a restart"""
+    db = SessionLocal()
+    try:
+        pending = [structure.id for structure in FeeStructureRepository.get_unfinished(db)]
+    finally:
+        db.close()
+    
+    for structure_id in pending:
+        apply_fee_structure(structure_id)
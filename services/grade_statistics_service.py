@@ -0,0 +1,116 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Optional
+import numpy as np
+from repositories.grade_repository import GradeRepository
+
+PERCENTILES = [10, 25, 50, 75, 90]
+HISTOGRAM_EDGES = np.arange(0, 101, 10)
+LETTER_BANDS = [(90, 'A'), (80, 'B'), (70, 'C'), (60, 'D'), (0, 'F')]
+
+def _round(value: float) -> float:
+    return round(float(value), 2)
+
+class GradeStatisticsService:
+    """Vectorized class statistics over score arrays.
+
+    Scores are pulled with a single projected query (student_id, score,
+    max_score) and every statistic is computed with NumPy, so the cost is a
+    handful of array passes regardless of how many students or grades there
+    are.
+    """
+
+    @staticmethod
+    def compute(student_ids: np.ndarray, scores: np.ndarray, max_scores: np.ndarray) -> Dict:
+        """Compute distribution statistics for a set of grades.
+
+        ``student_ids``, ``scores`` and ``max_scores`` are parallel 1-D
+        arrays, one entry per grade row. Rows with a non-positive max_score
+        are ignored.
+        """
+        valid = max_scores > 0
+        student_ids = student_ids[valid]
+        scores = scores[valid]
+        max_scores = max_scores[valid]
+
+        if scores.size == 0:
+            return {
+                'total_grades': 0,
+                'total_students': 0,
+                'mean': 0,
+                'median': 0,
+                'std_dev': 0,
+                'highest': 0,
+                'lowest': 0,
+                'percentiles': {f'p{p}': 0 for p in PERCENTILES},
+                'histogram': {
+                    'edges': HISTOGRAM_EDGES.tolist(),
+                    'counts': [0] * (len(HISTOGRAM_EDGES) - 1)
+                },
+                'grade_distribution': {letter: 0 for _, letter in LETTER_BANDS},
+                'students': []
+            }
+
+        percentages = scores / max_scores * 100
+
+        counts, _ = np.histogram(np.clip(percentages, 0, 100), bins=HISTOGRAM_EDGES)
+
+        # Letter bands: index into LETTER_BANDS by how many lower bounds are not met
+        lower_bounds = np.array([bound for bound, _ in LETTER_BANDS])
+        band_index = (percentages[:, None] < lower_bounds[:-1]).sum(axis=1)
+        band_counts = np.bincount(band_index, minlength=len(LETTER_BANDS))
+
+        # Per-student normalized percentage: total score over total max score
+        unique_ids, inverse = np.unique(student_ids, return_inverse=True)
+        student_scores = np.bincount(inverse, weights=scores)
+        student_max = np.bincount(inverse, weights=max_scores)
+        student_counts = np.bincount(inverse)
+        student_percentages = student_scores / student_max * 100
+
+        std = student_percentages.std()
+        if std > 0:
+            z_scores = (student_percentages - student_percentages.mean()) / std
+        else:
+            z_scores = np.zeros_like(student_percentages)
+
+        order = np.argsort(-student_percentages, kind='stable')
+        ranks = np.empty_like(order)
+        ranks[order] = np.arange(1, order.size + 1)
+
+        students = [{
+            'student_id': int(unique_ids[i]),
+            'percentage': _round(student_percentages[i]),
+            'z_score': _round(z_scores[i]),
+            'rank': int(ranks[i]),
+            'grades_count': int(student_counts[i])
+        } for i in order]
+
+        return {
+            'total_grades': int(percentages.size),
+            'total_students': int(unique_ids.size),
+            'mean': _round(percentages.mean()),
+            'median': _round(np.median(percentages)),
+            'std_dev': _round(percentages.std()),
+            'highest': _round(percentages.max()),
+            'lowest': _round(percentages.min()),
+            'percentiles': {
+                f'p{p}': _round(v) for p, v in zip(PERCENTILES, np.percentile(percentages, PERCENTILES))
+            },
+            'histogram': {
+                'edges': HISTOGRAM_EDGES.tolist(),
+                'counts': counts.tolist()
+            },
+            'grade_distribution': {
+                letter: int(count) for (_, letter), count in zip(LETTER_BANDS, band_counts)
+            },
+            'students': students
+        }
+
+    @staticmethod
+    def for_course(db: Session, course_id: int, grade_type: Optional[str] = None) -> Dict:
+        arrays = GradeRepository.get_score_arrays(db, course_id=course_id, grade_type=grade_type)
+        return GradeStatisticsService.compute(*arrays)
+
+    @staticmethod
+    def for_grade_level(db: Session, grade_level: str, grade_type: Optional[str] = None) -> Dict:
+        arrays = GradeRepository.get_score_arrays(db, grade_level=grade_level, grade_type=grade_type)
+        return GradeStatisticsService.compute(*arrays)
@@ -0,0 +1,155 @@
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from repositories.grade_repository import GradeRepository
+from utils.grading import percentages_to_letters
+
+OPERATIONS = ('scale', 'curve', 'cap', 'drop_lowest', 'reband')
+
+def _mean(values: np.ndarray) -> Optional[float]:
+    return round(float(values.mean()), 2) if values.size else None
+
+class GradeTransformService:
+    """Bulk grade transformations for a course (optionally one grade_type).
+
+    Scores are loaded once as arrays, transformed with NumPy and written
+    back with a single executemany UPDATE. Letters are only recomputed for
+    grades whose score changes, or for every grade when bands are given,
+    so letters entered by hand survive a transform that leaves their
+    score alone. Letter re-banding needs no compute and runs as one CASE
+    UPDATE. With dry_run the same computation is returned as a preview and
+    nothing is written.
+
+    drop_lowest does not delete anything: it marks each student's
+    drop_count lowest grades as excluded (and un-marks the rest), which
+    statistics, rollups and course grades ignore. Rerunning it with the
+    same count changes nothing, and drop_count=0 restores every dropped
+    grade.
+    """
+
+    @staticmethod
+    def transform(db: Session, course_id: int, operation: str, grade_type: str = None,
+                  factor: float = None, offset: float = None, target_mean: float = None,
+                  cap_percentage: float = None, drop_count: int = None,
+                  bands: List[Tuple[float, str]] = None, dry_run: bool = True) -> Dict:
+        if operation not in OPERATIONS:
+            raise ValueError(f"Operation must be one of: {', '.join(OPERATIONS)}")
+
+        dropping = operation == 'drop_lowest'
+        rows = GradeRepository.get_transform_rows(db, course_id, grade_type, include_excluded=dropping)
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        student_ids = np.array([r[1] for r in rows], dtype=np.int64)
+        scores = np.array([r[3] for r in rows], dtype=float)
+        max_scores = np.array([r[4] for r in rows], dtype=float)
+        letters = np.array([r[5] for r in rows], dtype=object)
+        excluded = np.array([bool(r[7]) for r in rows], dtype=bool)
+        percentages = scores * 100 / max_scores
+        new_excluded = excluded
+
+        if dropping:
+            if drop_count is None:
+                raise ValueError("drop_count is required for drop_lowest")
+            new_excluded = GradeTransformService._lowest_per_student(student_ids, percentages, drop_count)
+            changed = np.flatnonzero(new_excluded != excluded)
+            new_scores, new_letters = scores, letters
+            after = percentages[~new_excluded]
+            percentages = percentages[~excluded]
+        else:
+            new_percentages = GradeTransformService._new_percentages(
+                operation, percentages, factor, offset, target_mean, cap_percentage
+            )
+            new_scores = scores if operation == 'reband' else np.round(new_percentages * max_scores / 100, 2)
+            if bands is not None or operation == 'reband':
+                new_letters = percentages_to_letters(new_scores * 100 / max_scores, bands)
+            else:
+                # Keep the existing letter of every grade whose score is unchanged
+                new_letters = letters.copy()
+                rescored = new_scores != scores
+                if rescored.any():
+                    new_letters[rescored] = percentages_to_letters(new_scores[rescored] * 100 / max_scores[rescored])
+            changed = np.flatnonzero((new_scores != scores) | (new_letters != letters))
+            after = new_percentages
+
+        affected = [{
+            'id': int(ids[i]),
+            'student_id': int(student_ids[i]),
+            'grade_type': rows[i][6],
+            'date': rows[i][2],
+            'max_score': float(max_scores[i]),
+            'old_score': float(scores[i]),
+            'score': float(new_scores[i]),
+            'old_grade': letters[i],
+            'grade': new_letters[i],
+            'excluded': bool(new_excluded[i])
+        } for i in changed]
+
+        if not dry_run:
+            if dropping:
+                GradeRepository.set_excluded_bulk(db, course_id, affected)
+            elif operation == 'reband':
+                GradeRepository.reband_letters(db, course_id, grade_type, bands)
+            else:
+                GradeRepository.apply_score_updates(db, course_id, affected)
+
+        return {
+            'course_id': course_id,
+            'grade_type': grade_type,
+            'operation': operation,
+            'dry_run': dry_run,
+            'total_grades': len(rows),
+            'affected': len(affected),
+            'mean_before': _mean(percentages),
+            'mean_after': _mean(after),
+            'changes': [{
+                'grade_id': a['id'],
+                'student_id': a['student_id'],
+                'old_score': a['old_score'],
+                'new_score': None if a['excluded'] else a['score'],
+                'old_grade': a['old_grade'],
+                'new_grade': None if a['excluded'] else a['grade'],
+                'excluded': a['excluded']
+            } for a in affected]
+        }
+
+    @staticmethod
+    def _new_percentages(operation: str, percentages: np.ndarray, factor: float,
+                         offset: float, target_mean: float, cap_percentage: float) -> np.ndarray:
+        if operation == 'scale':
+            if factor is None and offset is None:
+                raise ValueError("factor or offset is required for scale")
+            scaled = percentages * (1.0 if factor is None else factor) + (offset or 0.0)
+            return np.clip(scaled, 0, 100)
+
+        if operation == 'curve':
+            if target_mean is None:
+                raise ValueError("target_mean is required for curve")
+            if not percentages.size:
+                return percentages
+            # Shift every grade by the same amount; clipping at 100 can leave
+            # the achieved mean slightly under the target
+            return np.clip(percentages + (target_mean - percentages.mean()), 0, 100)
+
+        if operation == 'cap':
+            if cap_percentage is None:
+                raise ValueError("cap_percentage is required for cap")
+            return np.minimum(percentages, cap_percentage)
+
+        return percentages  # reband keeps scores
+
+    @staticmethod
+    def _lowest_per_student(student_ids: np.ndarray, percentages: np.ndarray,
+                            drop_count: int) -> np.ndarray:
+        """Mask of each student's drop_count lowest grades; students with
+        drop_count grades or fewer keep all of them"""
+        drop = np.zeros(student_ids.size, dtype=bool)
+        if not student_ids.size:
+            return drop
+
+        order = np.lexsort((percentages, student_ids))
+        sorted_ids = student_ids[order]
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        counts = np.diff(np.r_[starts, sorted_ids.size])
+        rank = np.arange(sorted_ids.size) - np.repeat(starts, counts)
+
+        drop[order] = (rank < drop_count) & (np.repeat(counts, counts) > drop_count)
+        return drop
@@ -0,0 +1,160 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Iterator, List
+from datetime import date
+import csv
+import io
+import json
+import numpy as np
+from repositories.grade_repository import GradeRepository
+
+def _cell(value) -> object:
+    """JSON/CSV-friendly scalar: NaN becomes None, floats are rounded"""
+    if value is None or np.isnan(value):
+        return None
+    return round(float(value), 2)
+
+def _csv_text(value) -> object:
+    """Neutralise text a spreadsheet would evaluate as a formula"""
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+class GradebookService:
+    """Builds a course gradebook (students x assessments) server-side.
+
+    An assessment is a (date, grade_type) pair. All enrolled students and
+    their grades come back in one projected query. The rows are scattered
+    into dense score and max-score matrices, and row and column aggregates
+    are computed on those matrices.
+    """
+
+    @staticmethod
+    def build(db: Session, course_id: int) -> Dict:
+        rows = GradeRepository.get_gradebook_rows(db, course_id)
+
+        students = {}
+        assessment_keys = set()
+        for student_pk, student_code, name, grade_type, grade_date, score, max_score in rows:
+            students.setdefault(student_pk, (student_code, name))
+            if score is not None:
+                assessment_keys.add((grade_date, grade_type or ""))
+
+        student_ids = sorted(students, key=lambda pk: ((students[pk][1] or "").lower(), pk))
+        row_index = {pk: i for i, pk in enumerate(student_ids)}
+        assessments = sorted(assessment_keys, key=lambda key: (key[0] is None, key[0] or date.min, key[1]))
+        column_index = {key: j for j, key in enumerate(assessments)}
+
+        graded = [r for r in rows if r[5] is not None]
+        r_idx = np.fromiter((row_index[r[0]] for r in graded), dtype=np.intp, count=len(graded))
+        c_idx = np.fromiter((column_index[(r[4], r[3] or "")] for r in graded), dtype=np.intp, count=len(graded))
+        scores = np.fromiter((r[5] for r in graded), dtype=float, count=len(graded))
+        max_scores = np.fromiter((r[6] for r in graded), dtype=float, count=len(graded))
+
+        shape = (len(student_ids), len(assessments))
+        score_matrix = np.zeros(shape)
+        max_matrix = np.zeros(shape)
+        count_matrix = np.zeros(shape, dtype=np.int64)
+        # Duplicate grades for the same student/assessment are summed
+        np.add.at(score_matrix, (r_idx, c_idx), scores)
+        np.add.at(max_matrix, (r_idx, c_idx), max_scores)
+        np.add.at(count_matrix, (r_idx, c_idx), 1)
+
+        present = count_matrix > 0
+        score_matrix[~present] = np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentages = np.where(present & (max_matrix > 0), score_matrix / max_matrix * 100, np.nan)
+
+        graded_mask = ~np.isnan(percentages)
+        row_counts = graded_mask.sum(axis=1)
+        row_totals = np.where(present, score_matrix, 0).sum(axis=1)
+        row_max = np.where(present, max_matrix, 0).sum(axis=1)
+        col_counts = graded_mask.sum(axis=0)
+        filled = np.where(graded_mask, percentages, 0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            row_percentage = np.where(row_max > 0, row_totals / row_max * 100, np.nan)
+            row_mean = np.where(row_counts > 0, filled.sum(axis=1) / row_counts, np.nan)
+            col_mean = np.where(col_counts > 0, filled.sum(axis=0) / col_counts, np.nan)
+            col_min = np.where(col_counts > 0, np.where(graded_mask, percentages, np.inf).min(axis=0, initial=np.inf), np.nan)
+            col_max = np.where(col_counts > 0, np.where(graded_mask, percentages, -np.inf).max(axis=0, initial=-np.inf), np.nan)
+            deviations = np.where(graded_mask, percentages - col_mean, 0)
+            col_std = np.where(col_counts > 0, np.sqrt((deviations ** 2).sum(axis=0) / col_counts), np.nan)
+
+        column_max_score = np.where(present, max_matrix, 0).max(axis=0, initial=0)
+
+        return {
+            'course_id': course_id,
+            'students': [{
+                'id': pk,
+                'student_id': students[pk][0],
+                'name': students[pk][1]
+            } for pk in student_ids],
+            'assessments': [{
+                'date': grade_date.isoformat() if grade_date else None,
+                'grade_type': grade_type or None,
+                'label': f"{grade_type or 'Grade'} {grade_date.isoformat() if grade_date else ''}".strip(),
+                'max_score': _cell(column_max_score[j])
+            } for j, (grade_date, grade_type) in enumerate(assessments)],
+            'scores': score_matrix,
+            'row_stats': {
+                'graded': row_counts,
+                'total_score': row_totals,
+                'total_max_score': row_max,
+                'percentage': row_percentage,
+                'mean_percentage': row_mean
+            },
+            'column_stats': {
+                'graded': col_counts,
+                'mean': col_mean,
+                'min': col_min,
+                'max': col_max,
+                'std_dev': col_std
+            }
+        }
+
+    @staticmethod
+    def stream_json(book: Dict) -> Iterator[str]:
+        """Yield the gradebook as compact JSON, one student row per chunk"""
+        dumps = lambda value: json.dumps(value, separators=(',', ':'))
+        column_stats = {name: [_cell(v) for v in values] for name, values in book['column_stats'].items()}
+        column_stats['graded'] = [int(v) for v in book['column_stats']['graded']]
+
+        yield '{"course_id":' + dumps(book['course_id'])
+        yield ',"assessments":' + dumps(book['assessments'])
+        yield ',"column_stats":' + dumps(column_stats)
+        yield ',"students":['
+
+        stats = book['row_stats']
+        for i, student in enumerate(book['students']):
+            row = dict(student)
+            row['scores'] = [_cell(v) for v in book['scores'][i]]
+            row['graded'] = int(stats['graded'][i])
+            row['total_score'] = _cell(stats['total_score'][i])
+            row['total_max_score'] = _cell(stats['total_max_score'][i])
+            row['percentage'] = _cell(stats['percentage'][i])
+            row['mean_percentage'] = _cell(stats['mean_percentage'][i])
+            yield (',' if i else '') + dumps(row)
+
+        yield ']}'
+
+    @staticmethod
+    def stream_csv(book: Dict) -> Iterator[str]:
+        """Yield the gradebook as CSV with a class-average footer row"""
+        def line(values: List) -> str:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(['' if v is None else _csv_text(v) for v in values])
+            return buffer.getvalue()
+
+        labels = [a['label'] for a in book['assessments']]
+        yield line(['student_id', 'name'] + labels + ['total_score', 'total_max_score', 'percentage'])
+        yield line(['', 'Max score'] + [a['max_score'] for a in book['assessments']] + ['', '', ''])
+
+        stats = book['row_stats']
+        for i, student in enumerate(book['students']):
+            yield line(
+                [student['student_id'], student['name']]
+                + [_cell(v) for v in book['scores'][i]]
+                + [_cell(stats['total_score'][i]), _cell(stats['total_max_score'][i]), _cell(stats['percentage'][i])]
+            )
+
+        yield line(['', 'Class average %'] + [_cell(v) for v in book['column_stats']['mean']] + ['', '', ''])
@@ -0,0 +1,159 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+import random
+import logging
+from models.test_models import Test, StudentPaper, QuestionType
+from repositories.course_repository import CourseRepository
+from repositories.question_bank_repository import QuestionBankRepository
+
+logger = logging.getLogger(__name__)
+
+class PoolQuestion(NamedTuple):
+    id: int
+    question_type: QuestionType
+    option_count: int
+    difficulty: str
+    tags: FrozenSet[str]
+    points: float
+
+def _specificity(rule: Dict) -> int:
+    return len(rule.get('tags') or []) + (1 if rule.get('difficulty') else 0)
+
+def assign_rule_candidates(pool: Sequence[PoolQuestion], rules: Sequence[Dict]) -> List[List[int]]:
+    """Candidate question ids for each rule, in rule order.
+
+    A question matches a rule when it has all of the rule's tags and its
+    difficulty (if set). Each question is assigned to one rule only, most
+    specific rule first, so a broad rule cannot use up the questions that a
+    narrow rule needs and no paper repeats a question. Raises ValueError
+    when a rule has fewer candidates than it draws.
+    """
+    taken = set()
+    candidates: Dict[int, List[int]] = {}
+    for index in sorted(range(len(rules)), key=lambda i: -_specificity(rules[i])):
+        rule = rules[index]
+        tags = {tag.strip().lower() for tag in rule.get('tags') or []}
+        difficulty = rule.get('difficulty')
+        matched = [
+            q.id for q in pool
+            if q.id not in taken and tags <= q.tags and (not difficulty or q.difficulty == difficulty)
+        ]
+        if len(matched) < rule['count']:
+            described = ', '.join(filter(None, [', '.join(sorted(tags)), difficulty])) or 'any'
+            raise ValueError(f"Rule {index + 1} ({described}) needs {rule['count']} questions, "
+                             f"the bank has {len(matched)}")
+        taken.update(matched)
+        candidates[index] = matched
+    return [candidates[i] for i in range(len(rules))]
+
+def draw_paper(seed: int, student_id: int, candidates: Sequence[List[int]], counts: Sequence[int],
+               option_counts: Dict[int, int]) -> Tuple[List[int], List[Optional[List[int]]]]:
+    """Question ids in display order and, per question, the displayed ->
+    original option permutation (None for non-MCQ). The same seed and
+    student always draw the same paper."""
+    rng = random.Random(f"{seed}:{student_id}")
+    question_ids = []
+    for ids, count in zip(candidates, counts):
+        question_ids.extend(rng.sample(ids, count))
+    rng.shuffle(question_ids)
+    option_orders = [
+        rng.sample(range(option_counts[q]), option_counts[q]) if option_counts.get(q, 0) > 1 else None
+        for q in question_ids
+    ]
+    return question_ids, option_orders
+
+class PaperGenerationService:
+    """Draws per-student papers for question-bank tests.
+
+    The bank pool is loaded once per run as plain tuples and partitioned
+    between the sampling rules; each student's paper is then a seeded draw
+    from those partitions, stored as question ids plus MCQ option
+    permutations. Papers are generated for the whole class in one
+    executemany when the test opens, and on demand for late starters.
+    """
+
+    @staticmethod
+    def load_pool(db: Session, course_id: int) -> List[PoolQuestion]:
+        return [
+            PoolQuestion(
+                id=question_id,
+                question_type=question_type,
+                option_count=len(options or []) if question_type == QuestionType.MCQ else 0,
+                difficulty=difficulty.value if difficulty else None,
+                tags=frozenset(tag.strip().lower() for tag in tags or []),
+                points=points or 0.0
+            )
+            for question_id, question_type, options, difficulty, tags, points in
+            QuestionBankRepository.get_pool(db, course_id)
+        ]
+
+    @staticmethod
+    def check_rules(db: Session, course_id: int, rules: Sequence[Dict]) -> float:
+        """Validate rules against the bank; returns the expected total points"""
+        pool = PaperGenerationService.load_pool(db, course_id)
+        points = {q.id: q.points for q in pool}
+        total = 0.0
+        for rule, ids in zip(rules, assign_rule_candidates(pool, rules)):
+            total += rule['count'] * sum(points[i] for i in ids) / len(ids) if ids else 0.0
+        return round(total, 2)
+
+    @staticmethod
+    def _draws(db: Session, test: Test):
+        pool = PaperGenerationService.load_pool(db, test.course_id)
+        rules = test.sampling_rules or []
+        candidates = assign_rule_candidates(pool, rules)
+        counts = [rule['count'] for rule in rules]
+        option_counts = {q.id: q.option_count for q in pool}
+        return lambda student_id: draw_paper(test.paper_seed or 0, student_id, candidates, counts, option_counts)
+
+    @staticmethod
+    def generate_for_test(db: Session, test: Test) -> int:
+        """Draw papers for every enrolled student who has none; returns papers created"""
+        if not test.sampling_rules:
+            return 0
+        draw = PaperGenerationService._draws(db, test)
+        enrolled = CourseRepository.get_enrolled_student_ids(db, test.course_id)
+
+        for attempt in range(2):
+            existing = QuestionBankRepository.get_paper_student_ids(db, test.id)
+            rows = []
+            for student_id in enrolled:
+                if student_id in existing:
+                    continue
+                question_ids, option_orders = draw(student_id)
+                rows.append({
+                    'test_id': test.id,
+                    'student_id': student_id,
+                    'question_ids': question_ids,
+                    'option_orders': option_orders
+                })
+            try:
+                QuestionBankRepository.create_papers_bulk(db, rows)
+                break
+            except IntegrityError:
+                # A late starter drew their paper meanwhile; retry without them
+                db.rollback()
+                if attempt:
+                    raise
+
+        if rows:
+            logger.info(f"Generated {len(rows)} papers for test {test.id}")
+        return len(rows)
+
+    @staticmethod
+    def get_or_create(db: Session, test_id: int, student_id: int) -> Optional[StudentPaper]:
+        paper = QuestionBankRepository.get_paper(db, test_id, student_id)
+        if paper:
+            return paper
+
+        test = db.query(Test).filter(Test.id == test_id).first()
+        if not test or not test.sampling_rules:
+            return None
+        question_ids, option_orders = PaperGenerationService._draws(db, test)(student_id)
+        try:
+            return QuestionBankRepository.create_paper(db, test_id, student_id, question_ids, option_orders)
+        except IntegrityError:
+            # Drawn concurrently (e.g. by the open-time bulk run)
+            db.rollback()
+            return QuestionBankRepository.get_paper(db, test_id, student_id)
@@ -0,0 +1,324 @@
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect
+from typing import AsyncIterator, Dict, Optional
+from datetime import datetime, timedelta
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import uuid
+import aiofiles
+from config.config import settings
+from repositories.videos_repository import VideosRepository
+from services.blob_service import BlobService
+from utils.uploads import ReceivedFile, SNIFF_BYTES, content_type, file_extension, file_sha256
+
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = "1.0.0"
+CHECKSUM_ALGORITHMS = ("sha1", "sha256", "md5")
+CHECKSUM_MISMATCH = 460  # tus checksum extension status
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+_locks: Dict[str, asyncio.Lock] = {}
+
+class ResumableUploadError(Exception):
+    """A request the upload cannot accept; carries the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def upload_root() -> str:
+    return f"{settings.UPLOAD_DIR}/videos/resumable"
+
+def parse_metadata(header: Optional[str]) -> Dict[str, str]:
+    """Decode a tus Upload-Metadata header ("key base64value,key2 ...")"""
+    metadata = {}
+    for pair in (header or "").split(","):
+        if not pair.strip():
+            continue
+        key, _, value = pair.strip().partition(" ")
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode("utf-8") if value else ""
+        except (binascii.Error, UnicodeDecodeError):
+            raise ResumableUploadError(400, f"Invalid Upload-Metadata value for '{key}'")
+    return metadata
+
+def parse_checksum(header: Optional[str]):
+    """(algorithm, digest) of a tus Upload-Checksum header ("sha256 base64digest"), or None"""
+    if not header:
+        return None
+    algorithm, _, value = header.strip().partition(" ")
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise ResumableUploadError(400, f"Unsupported checksum algorithm '{algorithm}'")
+    try:
+        return algorithm, base64.b64decode(value, validate=True)
+    except binascii.Error:
+        raise ResumableUploadError(400, "Invalid Upload-Checksum value")
+
+class ResumableUpload:
+    """State of one upload, persisted as info.json next to its data file.
+    The data file is written in place at each chunk's offset, so finishing
+    needs no reassembly."""
+
+    def __init__(self, upload_id: str, info: Dict):
+        self.id = upload_id
+        self.user_id: int = info["user_id"]
+        self.teacher_id: int = info["teacher_id"]
+        self.course_id: int = info["course_id"]
+        self.title: str = info["title"]
+        self.description: Optional[str] = info.get("description")
+        self.filename: str = info["filename"]
+        self.length: int = info["length"]
+        self.offset: int = info.get("offset", 0)
+        self.blob_path: Optional[str] = info.get("blob_path")  # set once the data is stored
+        self.video_id: Optional[int] = info.get("video_id")
+        self.updated_at = datetime.fromisoformat(info["updated_at"])
+
+    @property
+    def directory(self) -> str:
+        return f"{upload_root()}/{self.id}"
+
+    @property
+    def data_path(self) -> str:
+        return f"{self.directory}/data"
+
+    @property
+    def expires_at(self) -> datetime:
+        return self.updated_at + timedelta(hours=settings.RESUMABLE_UPLOAD_EXPIRY_HOURS)
+
+    def save(self):
+        """Persist the state atomically (temp file + rename)"""
+        self.updated_at = datetime.utcnow()
+        info = {
+            "user_id": self.user_id,
+            "teacher_id": self.teacher_id,
+            "course_id": self.course_id,
+            "title": self.title,
+            "description": self.description,
+            "filename": self.filename,
+            "length": self.length,
+            "offset": self.offset,
+            "blob_path": self.blob_path,
+            "video_id": self.video_id,
+            "updated_at": self.updated_at.isoformat()
+        }
+        temp_path = f"{self.directory}/info.json.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(info, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, f"{self.directory}/info.json")
+
+class ResumableUploadService:
+    """tus-style resumable uploads for course videos.
+
+    A teacher creates an upload with its total length and metadata, then
+    sends the file in PATCH requests, each starting at the offset the
+    server reports. Every chunk is written straight into the upload's data
+    file at its offset and fsynced before the new offset is persisted, so
+    an upload survives restarts and dropped connections. A chunk sent with
+    an Upload-Checksum is verified and discarded on mismatch; without one,
+    the bytes of an interrupted chunk are kept. Once the first SNIFF_BYTES
+    have arrived, over however many chunks, the content is checked against
+    the extension and an upload that fails is deleted. The last chunk moves
+    the data file into the blob store and creates the Video record.
+
+    Chunks of one upload are serialized with a per-upload lock, which is
+    per process: run a single worker, or route an upload's requests to
+    one worker.
+    """
+
+    @staticmethod
+    def create(user_id: int, teacher_id: int, course_id: int, title: str, description: Optional[str],
+               filename: str, length: int) -> ResumableUpload:
+        upload_id = uuid.uuid4().hex
+        os.makedirs(f"{upload_root()}/{upload_id}")
+        upload = ResumableUpload(upload_id, {
+            "user_id": user_id,
+            "teacher_id": teacher_id,
+            "course_id": course_id,
+            "title": title,
+            "description": description,
+            "filename": filename,
+            "length": length,
+            "updated_at": datetime.utcnow().isoformat()
+        })
+        open(upload.data_path, "wb").close()
+        upload.save()
+        return upload
+
+    @staticmethod
+    def get(upload_id: str, user_id: int) -> Optional[ResumableUpload]:
+        """The user's upload, None if unknown, expired or someone else's"""
+        if not _UPLOAD_ID.match(upload_id):
+            return None
+        try:
+            with open(f"{upload_root()}/{upload_id}/info.json") as f:
+                upload = ResumableUpload(upload_id, json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+        if upload.user_id != user_id or upload.expires_at < datetime.utcnow():
+            return None
+        return upload
+
+    @staticmethod
+    async def write_chunk(db: Session, upload_id: str, user_id: int, offset: int,
+                          chunks: AsyncIterator[bytes], checksum: Optional[str]) -> ResumableUpload:
+        """Append one PATCH body at offset; the last chunk finishes the upload"""
+        expected = parse_checksum(checksum)
+        lock = _locks.setdefault(upload_id, asyncio.Lock())
+        if lock.locked():
+            raise ResumableUploadError(409, "Another request is writing to this upload")
+
+        async with lock:
+            upload = ResumableUploadService.get(upload_id, user_id)
+            if upload is None:
+                _locks.pop(upload_id, None)
+                raise ResumableUploadError(404, "Upload not found")
+            if upload.video_id is not None:
+                if offset != upload.length:
+                    raise ResumableUploadError(409, "Upload is already complete")
+                return upload  # retried final chunk
+            if upload.blob_path is not None:
+                # Stored, but creating the video failed: a retried final chunk finishes it
+                if offset != upload.length:
+                    raise ResumableUploadError(409, f"Upload-Offset must be {upload.length}")
+                await ResumableUploadService._finish(db, upload)
+                _locks.pop(upload_id, None)
+                return upload
+            if offset != upload.offset:
+                raise ResumableUploadError(409, f"Upload-Offset must be {upload.offset}")
+
+            hasher = hashlib.new(expected[0]) if expected else None
+            sniffing = offset < SNIFF_BYTES  # the content check has not run yet
+            written = 0
+            disconnected = False
+            try:
+                async with aiofiles.open(upload.data_path, "r+b") as out:
+                    # Earlier chunks may have sent only part of the head
+                    head = bytearray(await out.read(offset)) if sniffing else bytearray()
+                    # Drop bytes of an interrupted write beyond the persisted offset
+                    await out.truncate(offset)
+                    await out.seek(offset)
+                    try:
+                        try:
+                            async for chunk in chunks:
+                                if offset + written + len(chunk) > upload.length:
+                                    raise ResumableUploadError(413, "Chunk goes past Upload-Length")
+                                await out.write(chunk)
+                                written += len(chunk)
+                                if hasher:
+                                    hasher.update(chunk)
+                                if sniffing and len(head) < SNIFF_BYTES:
+                                    head.extend(chunk[:SNIFF_BYTES - len(head)])
+                        except ClientDisconnect:
+                            disconnected = True
+
+                        if hasher and (disconnected or hasher.digest() != expected[1]):
+                            raise ResumableUploadError(CHECKSUM_MISMATCH, "Checksum mismatch")
+                        if sniffing and (len(head) >= SNIFF_BYTES or offset + written == upload.length):
+                            # Reject a file that is not the video it claims to be
+                            # before the rest of it is sent
+                            content_type(file_extension(upload.filename), bytes(head))
+                    except Exception:
+                        await out.truncate(offset)
+                        raise
+                    await out.flush()
+                    await asyncio.to_thread(os.fsync, out.fileno())
+            except HTTPException:
+                # Its start is already stored, so no retry could pass the check
+                ResumableUploadService._discard(upload)
+                raise
+
+            upload.offset += written
+            upload.save()
+            if upload.offset == upload.length:
+                await ResumableUploadService._finish(db, upload)
+                _locks.pop(upload_id, None)
+            return upload
+
+    @staticmethod
+    async def _finish(db: Session, upload: ResumableUpload):
+        """Store the complete data file as a blob (a rename, not a copy) and create the Video.
+
+        The blob path is persisted before the Video is created: storing moves
+        the data file away, so a retry after a failed create must pick up
+        from the stored blob rather than the data file.
+        """
+        if upload.blob_path is None:
+            received = ReceivedFile("file", upload.filename, upload.data_path)
+            received.size = upload.length
+            received.sha256 = await asyncio.to_thread(file_sha256, upload.data_path)
+            with open(upload.data_path, "rb") as f:
+                head = f.read(SNIFF_BYTES)
+            try:
+                received.mime_type = content_type(received.extension, head)
+            except HTTPException:
+                ResumableUploadService._discard(upload)
+                raise
+
+            upload.blob_path = BlobService.store(db, received)
+            upload.save()
+
+        video = VideosRepository.create(db, {
+            "title": upload.title,
+            "description": upload.description,
+            "course_id": upload.course_id,
+            "teacher_id": upload.teacher_id,
+            "file_path": upload.blob_path,
+            "file_size": upload.length
+        })
+        upload.video_id = video.id
+        upload.save()
+        logger.info(f"Resumable upload {upload.id} finished as video {video.id}")
+
+    @staticmethod
+    def delete(upload: ResumableUpload):
+        lock = _locks.get(upload.id)
+        if lock and lock.locked():
+            raise ResumableUploadError(409, "Another request is writing to this upload")
+        ResumableUploadService._discard(upload)
+
+    @staticmethod
+    def _discard(upload: ResumableUpload):
+        shutil.rmtree(upload.directory, ignore_errors=True)
+        _locks.pop(upload.id, None)
+
+
+def expire_resumable_uploads():
+    """Delete uploads not written to within RESUMABLE_UPLOAD_EXPIRY_HOURS (scheduled job)"""
+    try:
+        root = upload_root()
+        if not os.path.isdir(root):
+            return
+        cutoff = datetime.utcnow() - timedelta(hours=settings.RESUMABLE_UPLOAD_EXPIRY_HOURS)
+        expired = 0
+        for upload_id in os.listdir(root):
+            directory = f"{root}/{upload_id}"
+            lock = _locks.get(upload_id)
+            if lock and lock.locked():
+                continue
+            try:
+                with open(f"{directory}/info.json") as f:
+                    updated_at = datetime.fromisoformat(json.load(f)["updated_at"])
+            except (OSError, ValueError, KeyError):
+                # Creation interrupted before info.json was written
+                updated_at = datetime.utcfromtimestamp(os.path.getmtime(directory))
+            if updated_at < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+                _locks.pop(upload_id, None)
+                expired += 1
+        if expired:
+            logger.info(f"Expired {expired} resumable uploads")
+
+    except Exception as e:
+        logger.error(f"Error expiring resumable uploads: {e}")
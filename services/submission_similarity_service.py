@@ -0,0 +1,134 @@
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Tuple
+import html
+import logging
+import os
+import re
+import zipfile
+from config.config import settings
+from database.database import SessionLocal
+from models.models import Assignment
+from repositories.similarity_repository import SimilarityRepository
+from utils import minhash
+from utils.uploads import file_sha256
+
+logger = logging.getLogger(__name__)
+
+DOCX_TEXT_LIMIT = 20 * 1024 * 1024  # uncompressed document.xml bytes read from a .docx
+_XML_TAG = re.compile(r"<[^>]+>")
+
+def docx_text(file_path: str) -> str:
+    """Plain text of a .docx (paragraphs of word/document.xml); empty if unreadable"""
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            with archive.open('word/document.xml') as document:
+                xml = document.read(DOCX_TEXT_LIMIT).decode('utf-8', errors='ignore')
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return ''
+    return html.unescape(_XML_TAG.sub(' ', xml.replace('</w:p>', '\n')))
+
+def submission_text(text: Optional[str], file_path: Optional[str]) -> str:
+    """Text a submission is compared on: the typed answer plus the text of
+    an uploaded .docx. Other uploads (PDFs, images) only match as identical files."""
+    parts = [text or '']
+    if file_path and file_path.lower().endswith('.docx'):
+        parts.append(docx_text(file_path))
+    return '\n'.join(parts)
+
+class SubmissionSimilarityService:
+    """Near-duplicate detection for assignment submissions.
+
+    Each submission gets a MinHash signature at submit time and its LSH
+    band buckets are stored alongside, so finding candidate pairs is one
+    indexed self-join on the bucket table instead of comparing every pair
+    of texts. Candidates are then scored by signature agreement (an
+    estimate of the shingle Jaccard similarity) and filtered by threshold.
+    Uploaded files also carry their SHA-256, so byte-identical uploads are
+    reported whatever their format.
+    """
+
+    @staticmethod
+    def index_submission(db: Session, submission_id: int, assignment_id: int, course_id: int,
+                         text: Optional[str], file_path: Optional[str], sha256: Optional[str] = None):
+        """Fingerprint a submission; sha256 is the upload's hash when already known"""
+        if file_path and sha256 is None and os.path.exists(file_path):
+            sha256 = file_sha256(file_path)
+        shingle_set = minhash.shingles(submission_text(text, file_path))
+        signature = minhash.signature(shingle_set)
+        SimilarityRepository.save_fingerprint(
+            db, submission_id, assignment_id, course_id,
+            minhash.to_bytes(signature) if signature is not None else None,
+            len(shingle_set),
+            sha256,
+            minhash.band_keys(signature) if signature is not None else []
+        )
+
+    @staticmethod
+    def find_similar(db: Session, assignment: Assignment, threshold: float = None,
+                     across_course: bool = False) -> List[Dict]:
+        """Near-duplicate pairs involving the assignment's submissions, most similar first.
+
+        With across_course the other side may be any submission to any
+        assignment of the same course, e.g. the same assignment in an
+        earlier year.
+        """
+        threshold = settings.SIMILARITY_THRESHOLD if threshold is None else threshold
+        course_id = assignment.course_id if across_course else None
+        candidates = SimilarityRepository.get_candidate_pairs(db, assignment.id, course_id)
+        identical_files = SimilarityRepository.get_identical_file_pairs(db, assignment.id, course_id)
+
+        signatures = {
+            submission_id: minhash.from_bytes(data) for submission_id, data in
+            SimilarityRepository.get_signatures(db, list({s for pair in candidates for s in pair})).items()
+        }
+        scored: Dict[Tuple[int, int], Dict] = {}
+        for a, b in candidates:
+            if a in signatures and b in signatures:
+                score = minhash.similarity(signatures[a], signatures[b])
+                if score >= threshold:
+                    scored[(a, b)] = {'similarity': round(score, 3), 'identical_file': False}
+        for pair in identical_files:
+            scored.setdefault(pair, {'similarity': None})['identical_file'] = True
+
+        details = SimilarityRepository.get_submission_details(db, list({s for pair in scored for s in pair}))
+        pairs = []
+        for (a, b), match in scored.items():
+            if a not in details or b not in details:
+                continue
+            pairs.append(dict(match, submissions=[
+                {
+                    'submission_id': submission_id,
+                    'student_id': student_id,
+                    'student_name': student_name,
+                    'assignment_id': other_assignment_id,
+                    'assignment_title': title,
+                    'submitted_at': submitted_at
+                }
+                for submission_id, (student_id, student_name, other_assignment_id, title, submitted_at)
+                in ((a, details[a]), (b, details[b]))
+            ]))
+        pairs.sort(key=lambda p: (not p['identical_file'], -(p['similarity'] or 0.0)))
+        return pairs
+
+
+def index_unfingerprinted_submissions():
+    """Fingerprint submissions that have none yet (existing data, or a failed
+    submit-time indexing). Scheduled job."""
+    db = SessionLocal()
+    try:
+        indexed = 0
+        while True:
+            rows = SimilarityRepository.get_unindexed_submissions(db, settings.SIMILARITY_INDEX_BATCH_SIZE)
+            for submission_id, assignment_id, course_id, text, file_path in rows:
+                SubmissionSimilarityService.index_submission(db, submission_id, assignment_id, course_id, text, file_path)
+            indexed += len(rows)
+            if len(rows) < settings.SIMILARITY_INDEX_BATCH_SIZE:
+                break
+        if indexed:
+            logger.info(f"Fingerprinted {indexed} assignment submissions")
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error fingerprinting assignment submissions: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,164 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterable, Optional, Tuple
+from collections import defaultdict
+import threading
+import logging
+from config.config import settings
+from database.database import SessionLocal
+from repositories.test_repository import TestRepository
+
+logger = logging.getLogger(__name__)
+
+class AutosaveBufferFull(Exception):
+    """Raised when too many attempts have unflushed answers; clients should retry later"""
+    pass
+
+class AnswerAutosaveBuffer:
+    """In-memory buffer of per-question answer patches for open test attempts.
+
+    Each patch carries a client sequence number and only the highest seq
+    per (submission, question) is kept, so retried or reordered requests
+    cannot overwrite a newer answer. flush() merges the pending patches of
+    every dirty attempt into its stored answers and writes them with one
+    executemany, instead of one JSON blob rewrite per keystroke. Attempts
+    submitted in the meantime are skipped by the update itself.
+
+    Patches arrive on the event loop and flush() runs in the scheduler's
+    worker thread (and once more at shutdown), so shared state is guarded
+    by one lock that is never held across database calls. Flushes
+    themselves read, merge and rewrite whole answer blobs, so they are
+    serialized by a second lock: two concurrent flushes (the scheduled job
+    and a test closing) would otherwise each write back a blob missing the
+    other's patches.
+
+    The buffer is per process: with several workers each one holds the
+    patches it received until its own scheduled flush. Closing a test
+    flushes only the local buffer, so the close is held back for two flush
+    intervals after end_time (autosaves are refused from then on), by which
+    time every worker has written what it accepted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[int, Dict[str, Tuple[int, Any]]] = {}  # submission -> question -> (seq, answer)
+        self._seqs: Dict[int, Dict[str, int]] = defaultdict(dict)  # highest seq seen per question
+        self._attempts: Dict[Tuple[int, int], int] = {}  # (test, student) -> open submission id
+        self._attempt_keys: Dict[int, Tuple[int, int]] = {}
+        self._metrics = defaultdict(int)
+
+    def get_attempt(self, test_id: int, student_id: int) -> Optional[int]:
+        with self._lock:
+            return self._attempts.get((test_id, student_id))
+
+    def remember_attempt(self, test_id: int, student_id: int, submission_id: int):
+        with self._lock:
+            self._attempts[(test_id, student_id)] = submission_id
+            self._attempt_keys[submission_id] = (test_id, student_id)
+
+    def add(self, submission_id: int, patches: Iterable[Tuple[str, Any, int]]) -> Dict:
+        """Buffer (question_id, answer, seq) patches; returns accepted/stale counts"""
+        result = {'accepted': 0, 'stale': 0}
+        with self._lock:
+            if submission_id not in self._pending and len(self._pending) >= settings.TEST_AUTOSAVE_MAX_PENDING:
+                self._metrics['rejected'] += 1
+                raise AutosaveBufferFull()
+
+            seqs = self._seqs[submission_id]
+            pending = self._pending.setdefault(submission_id, {})
+            for question_id, answer, seq in patches:
+                if seq <= seqs.get(question_id, -1):
+                    result['stale'] += 1
+                    continue
+                seqs[question_id] = seq
+                pending[question_id] = (seq, answer)
+                result['accepted'] += 1
+            if not pending:
+                del self._pending[submission_id]
+
+            for name, count in result.items():
+                self._metrics[name] += count
+        return result
+
+    def overlay(self, submission_id: int, answers: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Stored answers with not-yet-flushed patches applied"""
+        merged = dict(answers or {})
+        with self._lock:
+            for question_id, (_, answer) in self._pending.get(submission_id, {}).items():
+                merged[question_id] = answer
+        return merged
+
+    def discard(self, submission_id: int):
+        """Forget an attempt once it has been submitted with its full answer set"""
+        with self._lock:
+            self._pending.pop(submission_id, None)
+            self._seqs.pop(submission_id, None)
+            key = self._attempt_keys.pop(submission_id, None)
+            if key:
+                self._attempts.pop(key, None)
+
+    def flush(self, db: Session) -> int:
+        """Merge pending patches into the stored answers; returns attempts written"""
+        with self._flush_lock:
+            return self._flush(db)
+
+    def _flush(self, db: Session) -> int:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        try:
+            stored = TestRepository.get_open_answers(db, list(batch))
+            merged = {}
+            for submission_id, answers in stored.items():
+                answers = dict(answers)
+                for question_id, (_, answer) in batch[submission_id].items():
+                    answers[question_id] = answer
+                merged[submission_id] = answers
+            TestRepository.update_answers_bulk(db, merged)
+        except Exception:
+            db.rollback()
+            with self._lock:
+                # Put the batch back under any newer patches that arrived meanwhile
+                for submission_id, patches in batch.items():
+                    current = self._pending.setdefault(submission_id, {})
+                    for question_id, value in patches.items():
+                        if question_id not in current or value[0] > current[question_id][0]:
+                            current[question_id] = value
+                self._metrics['flush_errors'] += 1
+            raise
+
+        with self._lock:
+            # Attempts no longer open (submitted or deleted) stop being tracked
+            for submission_id in set(batch) - set(stored):
+                if submission_id not in self._pending:
+                    self._seqs.pop(submission_id, None)
+            self._metrics['flushes'] += 1
+            self._metrics['flushed_attempts'] += len(merged)
+        return len(merged)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                'pending_attempts': len(self._pending),
+                'pending_answers': sum(len(patches) for patches in self._pending.values()),
+                'tracked_attempts': len(self._seqs),
+                'counters': dict(self._metrics)
+            }
+
+autosave_buffer = AnswerAutosaveBuffer()
+
+
+def flush_test_autosaves():
+    """Write buffered answer patches to their test submissions (scheduled job)"""
+    db = SessionLocal()
+    try:
+        written = autosave_buffer.flush(db)
+        if written:
+            logger.info(f"Autosaved answers for {written} test attempts")
+
+    except Exception as e:
+        logger.error(f"Error autosaving test answers: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,216 @@
+from sqlalchemy.orm import Session, selectinload
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+import asyncio
+import threading
+import logging
+from config.config import settings
+from database.database import SessionLocal
+from models.test_models import Test, QuestionType
+from repositories.test_repository import TestRepository
+from repositories.question_bank_repository import QuestionBankRepository
+from utils.websocket_manager import manager
+
+logger = logging.getLogger(__name__)
+
+AUTO_GRADED = (QuestionType.MCQ, QuestionType.TRUE_FALSE, QuestionType.SHORT_ANSWER)
+
+def normalize_answer(value: Any) -> str:
+    return str(value).strip().lower()
+
+class AnswerKey(NamedTuple):
+    drawn: bool  # question-bank test: each student has their own paper
+    answers: Dict[str, Tuple[str, float]]  # question id -> (normalized correct answer, points)
+    max_score: float
+    has_essay: bool
+    points: Dict[str, float]  # every question, for per-student paper totals
+    options: Dict[str, List[str]]  # normalized MCQ options in their original order
+    essays: FrozenSet[str]
+
+def build_answer_key(test: Test, questions: Sequence = None) -> AnswerKey:
+    """Answer key of a fixed test, or of the bank questions a drawn paper can use"""
+    questions = test.questions if questions is None else questions
+    return AnswerKey(
+        drawn=bool(getattr(test, 'sampling_rules', None)),
+        answers={
+            str(q.id): (normalize_answer(q.correct_answer), q.points or 0.0)
+            for q in questions if q.question_type in AUTO_GRADED
+        },
+        max_score=test.total_points or 0.0,
+        has_essay=any(q.question_type == QuestionType.ESSAY for q in questions),
+        points={str(q.id): q.points or 0.0 for q in questions},
+        options={
+            str(q.id): [normalize_answer(option) for option in q.options]
+            for q in questions if q.question_type == QuestionType.MCQ and getattr(q, 'options', None)
+        },
+        essays=frozenset(str(q.id) for q in questions if q.question_type == QuestionType.ESSAY)
+    )
+
+def score_answers(key: AnswerKey, answers: Optional[Dict[str, Any]], paper: Tuple = None) -> Dict:
+    """Score one answer set: score, max_score, percentage, is_graded, questions_correct.
+
+    ``paper`` is a drawn (question_ids, option_orders) pair. On drawn
+    papers an integer MCQ answer is the displayed option position and is
+    mapped back through the stored permutation; only questions on the
+    paper count.
+    """
+    max_score, has_essay = key.max_score, key.has_essay
+    presented, orders = None, {}
+    if paper is not None:
+        question_ids, option_orders = paper
+        presented = {str(q) for q in question_ids}
+        orders = {str(q): order for q, order in zip(question_ids, option_orders) if order}
+        max_score = sum(key.points.get(q, 0.0) for q in presented)
+        has_essay = bool(presented & key.essays)
+
+    score = 0.0
+    correct = 0
+    for question_id, answer in (answers or {}).items():
+        expected = key.answers.get(question_id)
+        if not expected or (presented is not None and question_id not in presented):
+            continue
+        if presented is not None and isinstance(answer, int) and not isinstance(answer, bool) \
+                and question_id in key.options:
+            options = key.options[question_id]
+            if not 0 <= answer < len(options):
+                continue
+            order = orders.get(question_id)
+            answer = options[order[answer] if order else answer]
+        if normalize_answer(answer) == expected[0]:
+            score += expected[1]
+            correct += 1
+    return {
+        'score': score,
+        'max_score': max_score,
+        'percentage': (score / max_score * 100) if max_score > 0 else 0,
+        # Essay questions need manual grading
+        'is_graded': not has_essay,
+        'questions_correct': correct
+    }
+
+_keys: Dict[int, AnswerKey] = {}
+_keys_lock = threading.Lock()
+_wakeup: Optional[Callable[[], None]] = None
+
+class TestGradingService:
+    """Background grading of submitted tests.
+
+    Submitting only records the answers; a submitted row without a score is
+    the durable queue entry, so nothing is lost on restart. The worker
+    claims queued rows in batches, scores them against a cached per-test
+    answer key and writes the scores with one executemany per batch.
+    Grading is deterministic, so a row graded twice (e.g. by two worker
+    processes) ends up with the same result.
+    """
+
+    @staticmethod
+    def notify():
+        """Wake the worker after submissions were queued (thread-safe)"""
+        if _wakeup:
+            _wakeup()
+
+    @staticmethod
+    def get_answer_key(db: Session, test_id: int) -> Optional[AnswerKey]:
+        with _keys_lock:
+            key = _keys.get(test_id)
+        if key:
+            return key
+        test = db.query(Test).options(selectinload(Test.questions)).filter(Test.id == test_id).first()
+        if not test:
+            return None
+        if test.sampling_rules:
+            key = build_answer_key(test, QuestionBankRepository.get_course_questions(db, test.course_id))
+        else:
+            key = build_answer_key(test)
+        with _keys_lock:
+            _keys[test_id] = key
+        return key
+
+    @staticmethod
+    def invalidate(test_id: int = None):
+        """Drop one test's answer key, or every key (e.g. after a bank edit)"""
+        with _keys_lock:
+            if test_id is None:
+                _keys.clear()
+            else:
+                _keys.pop(test_id, None)
+
+    @staticmethod
+    def grade_batch(submissions: List[Tuple[int, int, int, Dict[str, Any], int]]) -> List[Tuple[int, Dict]]:
+        """Score and store (submission id, test id, student id, answers, user id) rows; returns result pushes"""
+        db = SessionLocal()
+        try:
+            keys = {test_id: TestGradingService.get_answer_key(db, test_id) for test_id in {row[1] for row in submissions}}
+            papers = {}
+            for test_id, key in keys.items():
+                if key and key.drawn:
+                    students = [row[2] for row in submissions if row[1] == test_id]
+                    papers[test_id] = QuestionBankRepository.get_papers(db, test_id, students)
+
+            scores, pushes = [], []
+            for submission_id, test_id, student_id, answers, user_id in submissions:
+                key = keys[test_id]
+                if key is None:
+                    continue
+                paper = papers[test_id].get(student_id, ([], [])) if key.drawn else None
+                result = score_answers(key, answers, paper)
+                scores.append(dict(result, id=submission_id))
+                pushes.append((user_id, {
+                    'type': 'test_graded',
+                    'test_id': test_id,
+                    'submission_id': submission_id,
+                    'score': result['score'],
+                    'max_score': result['max_score'],
+                    'percentage': result['percentage'],
+                    'is_graded': result['is_graded']
+                }))
+            TestRepository.update_scores_bulk(db, scores)
+            return pushes
+        finally:
+            db.close()
+
+    @staticmethod
+    def claim_batch(limit: int) -> List[Tuple[int, int, int, Dict[str, Any], int]]:
+        db = SessionLocal()
+        try:
+            return TestRepository.get_ungraded_submissions(db, limit)
+        finally:
+            db.close()
+
+
+async def run_grading_worker():
+    """Drain the submission queue whenever submissions arrive (and on a
+    slow poll for rows queued by other processes). Each claimed batch is
+    split across TEST_GRADING_WORKERS threads; results are pushed to the
+    students over the websocket."""
+    global _wakeup
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    _wakeup = lambda: loop.call_soon_threadsafe(wake.set)
+    workers = max(settings.TEST_GRADING_WORKERS, 1)
+
+    try:
+        while True:
+            wake.clear()
+            try:
+                while True:
+                    batch = await asyncio.to_thread(TestGradingService.claim_batch, settings.TEST_GRADING_BATCH_SIZE)
+                    if not batch:
+                        break
+                    size = -(-len(batch) // workers)
+                    results = await asyncio.gather(*[
+                        asyncio.to_thread(TestGradingService.grade_batch, batch[i:i + size])
+                        for i in range(0, len(batch), size)
+                    ])
+                    pushes = [push for result in results for push in result]
+                    logger.info(f"Graded {len(pushes)} test submissions")
+                    for user_id, message in pushes:
+                        await manager.send_personal_message(message, user_id)
+            except Exception as e:
+                logger.error(f"Error grading test submissions: {e}")
+
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=settings.TEST_GRADING_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _wakeup = None
@@ -0,0 +1,159 @@
+from sqlalchemy.orm import Session, selectinload
+from typing import Dict, Optional, Sequence
+import threading
+import numpy as np
+from models.test_models import Test, QuestionType
+from repositories.test_repository import TestRepository
+from services.test_grading_service import AUTO_GRADED, normalize_answer
+
+PERCENTILES = [25, 50, 75]
+HISTOGRAM_EDGES = np.arange(0, 101, 10)
+GROUP_FRACTION = 0.27  # upper/lower groups for the discrimination index
+WEAK_DISTRACTOR_RATE = 0.05  # distractors chosen less often than this do no work
+
+_cache: Dict[int, Dict] = {}
+_cache_lock = threading.Lock()
+
+def _round(value: float) -> float:
+    return round(float(value), 3)
+
+def compute_item_analysis(correct: np.ndarray, answered: np.ndarray, choices: np.ndarray,
+                          option_counts: Sequence[int], gradable: np.ndarray,
+                          scores: np.ndarray, max_score: float) -> Dict:
+    """Item statistics from a students x questions response matrix.
+
+    ``correct`` and ``answered`` are boolean S x Q matrices, ``choices``
+    holds the chosen option index for MCQ columns (-1 for blank or an
+    answer that is not one of the options), ``gradable`` marks auto-graded
+    columns and ``scores`` are the submissions' total scores.
+
+    Difficulty is the share of students answering correctly. The
+    discrimination index is the difficulty in the top 27% by total score
+    minus the difficulty in the bottom 27%.
+    """
+    students, questions = correct.shape
+    order = np.argsort(-scores, kind='stable')
+    group = max(int(round(students * GROUP_FRACTION)), 1) if students else 0
+    upper, lower = order[:group], order[students - group:]
+
+    difficulty = correct.mean(axis=0) if students else np.zeros(questions)
+    answered_rate = answered.mean(axis=0) if students else np.zeros(questions)
+    discrimination = (correct[upper].mean(axis=0) - correct[lower].mean(axis=0)) if group else np.zeros(questions)
+
+    items = []
+    for q in range(questions):
+        item = {
+            'answered_rate': _round(answered_rate[q]),
+            'difficulty': _round(difficulty[q]) if gradable[q] else None,
+            'discrimination': _round(discrimination[q]) if gradable[q] else None
+        }
+        if option_counts[q]:
+            counts = np.bincount(choices[:, q] + 1, minlength=option_counts[q] + 1)
+            upper_counts = np.bincount(choices[upper, q] + 1, minlength=option_counts[q] + 1)
+            lower_counts = np.bincount(choices[lower, q] + 1, minlength=option_counts[q] + 1)
+            item['options'] = [{
+                'count': int(counts[i + 1]),
+                'rate': _round(counts[i + 1] / students) if students else 0.0,
+                'upper_count': int(upper_counts[i + 1]),
+                'lower_count': int(lower_counts[i + 1])
+            } for i in range(option_counts[q])]
+            item['other_or_blank'] = int(counts[0])
+        items.append(item)
+
+    percentages = np.clip(scores / max_score * 100, 0, 100) if max_score > 0 else np.zeros(students)
+    histogram, _ = np.histogram(percentages, bins=HISTOGRAM_EDGES)
+    distribution = {
+        'count': int(students),
+        'mean': _round(percentages.mean()) if students else 0.0,
+        'std_dev': _round(percentages.std()) if students else 0.0,
+        'min': _round(percentages.min()) if students else 0.0,
+        'max': _round(percentages.max()) if students else 0.0,
+        'percentiles': {
+            f'p{p}': _round(value) for p, value in
+            zip(PERCENTILES, np.percentile(percentages, PERCENTILES) if students else [0.0] * len(PERCENTILES))
+        },
+        'histogram': {'edges': HISTOGRAM_EDGES.tolist(), 'counts': histogram.tolist()}
+    }
+    return {'items': items, 'score_distribution': distribution}
+
+class TestItemAnalysisService:
+    """Item analysis for a test's graded submissions.
+
+    Answers are loaded once as (answers, score) pairs and turned into
+    students x questions matrices; the statistics are then whole-matrix
+    NumPy operations. Reports are cached per test under a signature of
+    the graded submissions (count, score sum, latest submission), so the
+    matrix is rebuilt only after grading has changed something, including
+    in another worker process.
+    """
+
+    @staticmethod
+    def get_report(db: Session, test_id: int) -> Optional[Dict]:
+        signature = TestRepository.get_graded_signature(db, test_id)
+        with _cache_lock:
+            cached = _cache.get(test_id)
+            if cached and cached['signature'] == signature:
+                return cached['report']
+
+        report = TestItemAnalysisService.build_report(db, test_id)
+        if report is not None:
+            with _cache_lock:
+                _cache[test_id] = {'signature': signature, 'report': report}
+        return report
+
+    @staticmethod
+    def build_report(db: Session, test_id: int) -> Optional[Dict]:
+        test = db.query(Test).options(selectinload(Test.questions)).filter(Test.id == test_id).first()
+        if not test:
+            return None
+
+        questions = sorted(test.questions, key=lambda q: (q.order, q.id))
+        rows = TestRepository.get_graded_answers(db, test_id)
+        students, count = len(rows), len(questions)
+
+        correct = np.zeros((students, count), dtype=bool)
+        answered = np.zeros((students, count), dtype=bool)
+        choices = np.full((students, count), -1, dtype=np.int64)
+        scores = np.array([score or 0.0 for _, score in rows], dtype=float)
+
+        option_counts, gradable = [], np.zeros(count, dtype=bool)
+        for q, question in enumerate(questions):
+            question_id = str(question.id)
+            is_mcq = question.question_type == QuestionType.MCQ and bool(question.options)
+            options = {normalize_answer(option): i for i, option in enumerate(question.options or [])} if is_mcq else {}
+            key = normalize_answer(question.correct_answer)
+            gradable[q] = question.question_type in AUTO_GRADED
+            option_counts.append(len(question.options) if is_mcq else 0)
+
+            for s, (answers, _) in enumerate(rows):
+                answer = (answers or {}).get(question_id)
+                if answer is None or answer == '':
+                    continue
+                answered[s, q] = True
+                normalized = normalize_answer(answer)
+                correct[s, q] = gradable[q] and normalized == key
+                if is_mcq:
+                    choices[s, q] = options.get(normalized, -1)
+
+        report = compute_item_analysis(correct, answered, choices, option_counts, gradable, scores, test.total_points or 0.0)
+        for question, item in zip(questions, report['items']):
+            item.update({
+                'question_id': question.id,
+                'question_text': question.question_text,
+                'question_type': question.question_type.value,
+                'points': question.points
+            })
+            if 'options' in item:
+                key = normalize_answer(question.correct_answer)
+                for option, stats in zip(question.options, item['options']):
+                    stats['option'] = option
+                    stats['is_correct'] = normalize_answer(option) == key
+                    stats['weak_distractor'] = not stats['is_correct'] and stats['rate'] < WEAK_DISTRACTOR_RATE
+
+        report.update({
+            'test_id': test.id,
+            'title': test.title,
+            'graded_submissions': students,
+            'max_score': test.total_points
+        })
+        return report
@@ -0,0 +1,127 @@
+from sqlalchemy.orm import Session, selectinload
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+from datetime import datetime
+import hashlib
+import json
+import threading
+from models.test_models import Test
+from repositories.question_bank_repository import QuestionBankRepository
+from tables.test_tables import TestForStudent, QuestionForStudent
+
+class CompiledPaper(NamedTuple):
+    version: str  # content hash, also used as the ETag
+    body: bytes  # TestForStudent JSON, no correct answers
+    course_id: int
+    is_active: bool
+    start_time: datetime
+    end_time: datetime
+    question_ids: FrozenSet[str]
+    bank_questions: Optional[Dict[int, Dict[str, Any]]] = None  # question-bank tests only
+
+    def is_available(self, now: datetime = None) -> bool:
+        now = now or datetime.utcnow()
+        return self.is_active and self.start_time <= now <= self.end_time
+
+    @property
+    def drawn(self) -> bool:
+        return self.bank_questions is not None
+
+    def render(self, question_ids: List[int], option_orders: List[Optional[List[int]]]) -> bytes:
+        """A student's drawn paper: the shared header (whose questions list,
+        the last field, is empty) plus their questions in order, with MCQ
+        options shown in the stored permutation"""
+        questions = []
+        for position, (question_id, order) in enumerate(zip(question_ids, option_orders)):
+            question = dict(self.bank_questions[question_id], order=position)
+            if order:
+                question['options'] = [question['options'][i] for i in order]
+            questions.append(question)
+        return b''.join([self.body[:-len(b'"questions":[]}')], b'"questions":',
+                         json.dumps(questions, separators=(',', ':')).encode(), b'}'])
+
+_papers: Dict[int, CompiledPaper] = {}
+_invalidations: Dict[Optional[int], int] = {}  # the None entry counts invalidate-everything calls
+_lock = threading.Lock()
+
+def _generation(test_id: int) -> Tuple[int, int]:
+    return _invalidations.get(None, 0), _invalidations.get(test_id, 0)
+
+class TestPaperService:
+    """Per-process cache of the student view of each test.
+
+    The paper is serialized once (when the test opens, or on the first
+    request) and served as bytes, so an exam-start burst needs no Test /
+    TestQuestion loads or per-request serialization. Tests cannot be edited
+    once started, so entries only need dropping on update/delete before
+    the start; closed tests are evicted when new papers are compiled.
+
+    For question-bank tests the entry holds the answer-stripped bank
+    questions instead, and each student's stored draw is rendered from it.
+    """
+
+    @staticmethod
+    def get(db: Session, test_id: int) -> Optional[CompiledPaper]:
+        with _lock:
+            paper = _papers.get(test_id)
+            generation = _generation(test_id)
+        if paper:
+            return paper
+        return TestPaperService._compile(db, test_id, generation)
+
+    @staticmethod
+    def warm(db: Session, test_id: int) -> Optional[CompiledPaper]:
+        """Compile ahead of the burst, e.g. when the test opens"""
+        with _lock:
+            generation = _generation(test_id)
+        return TestPaperService._compile(db, test_id, generation)
+
+    @staticmethod
+    def invalidate(test_id: int = None):
+        """Drop one test's paper, or every paper (e.g. after a bank edit)"""
+        with _lock:
+            if test_id is None:
+                _papers.clear()
+            else:
+                _papers.pop(test_id, None)
+            _invalidations[test_id] = _invalidations.get(test_id, 0) + 1
+
+    @staticmethod
+    def _compile(db: Session, test_id: int, generation: Tuple[int, int]) -> Optional[CompiledPaper]:
+        test = db.query(Test).options(selectinload(Test.questions)).filter(Test.id == test_id).first()
+        if not test:
+            return None
+
+        view = TestForStudent.model_validate(test, from_attributes=True)
+        view.questions.sort(key=lambda q: q.order)
+        question_ids = {q.id for q in test.questions}
+        bank_questions = None
+        if test.sampling_rules:
+            bank_questions = {
+                q.id: QuestionForStudent.model_validate(q, from_attributes=True).model_dump(mode='json')
+                for q in QuestionBankRepository.get_course_questions(db, test.course_id)
+            }
+            question_ids = set(bank_questions)
+            view.questions = []
+        body = view.model_dump_json().encode()
+        digest = hashlib.sha256(body)
+        if bank_questions is not None:
+            digest.update(json.dumps(bank_questions, sort_keys=True).encode())
+        paper = CompiledPaper(
+            version=digest.hexdigest()[:16],
+            body=body,
+            course_id=test.course_id,
+            is_active=bool(test.is_active),
+            start_time=test.start_time,
+            end_time=test.end_time,
+            question_ids=frozenset(str(q) for q in question_ids),
+            bank_questions=bank_questions
+        )
+
+        now = datetime.utcnow()
+        with _lock:
+            # An update that landed while compiling wins; serve this copy uncached
+            if _generation(test_id) == generation:
+                for cached_id in [i for i, p in _papers.items() if p.end_time < now]:
+                    del _papers[cached_id]
+                _papers[test_id] = paper
+        return paper
@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session
 from datetime import datetime
-from models.test_models import Test, TestSubmission, TestQuestion, QuestionType
+from models.test_models import Test, TestSubmission, TestQuestion
 from repositories.test_repository import TestRepository
+from services.test_grading_service import build_answer_key, score_answers
 
 class TestService:
     @staticmethod
@@ -46,28 +47,13 @@ class TestService:
 
     @staticmethod
     def grade_submission(db: Session, submission: TestSubmission, test: Test):
-        score = 0.0
-        max_score = test.total_points
-        
-        # Auto-grade objective questions
-        for question in test.questions:
-            if str(question.id) in submission.answers:
-                student_answer = submission.answers[str(question.id)]
-                
-                if question.question_type in [QuestionType.MCQ, QuestionType.TRUE_FALSE, QuestionType.SHORT_ANSWER]:
-                    # Simple string comparison for now
-                    if str(student_answer).strip().lower() == str(question.correct_answer).strip().lower():
-                        score += question.points
-                
-                # Essay questions need manual grading
-        
-        submission.score = score
-        submission.max_score = max_score
-        submission.percentage = (score / max_score * 100) if max_score > 0 else 0
+        result = score_answers(build_answer_key(test), submission.answers)
+        submission.score = result['score']
+        submission.max_score = result['max_score']
+        submission.percentage = result['percentage']
         
         # If all questions are objective, mark as graded
-        has_essay = any(q.question_type == QuestionType.ESSAY for q in test.questions)
-        submission.is_graded = not has_essay
+        submission.is_graded = result['is_graded']
         
         db.commit()
         db.refresh(submission)
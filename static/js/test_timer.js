@@ -4,6 +4,10 @@ class TestTimer {
         this.onTimeUp = onTimeUp;
         this.timerInterval = null;
         this.isPaused = false;
+        this.savedAnswers = {};  // answers the server has acknowledged
+        this.answerSeqs = {};
+        this.saveInFlight = false;
+        this.saveTimeout = null;
     }
 
     start() {
@@ -99,8 +103,7 @@ class TestTimer {
         }, 3000);
     }
 
-    autoSave() {
-        // Save current answers
+    collectAnswers() {
         const answers = {};
         document.querySelectorAll('.question').forEach(question => {
             const questionId = question.dataset.questionId;
@@ -120,12 +123,64 @@ class TestTimer {
                 answers[questionId] = answer;
             }
         });
+        return answers;
+    }
+
+    // Save soon after a change, coalescing bursts of edits into one request
+    scheduleSave(delayMs = 2000) {
+        clearTimeout(this.saveTimeout);
+        this.saveTimeout = setTimeout(() => this.autoSave(), delayMs);
+    }
+
+    nextSeq(questionId) {
+        // Time-based so a reload (or another device) still sends newer seqs
+        const seq = Math.max(Date.now(), (this.answerSeqs[questionId] || 0) + 1);
+        this.answerSeqs[questionId] = seq;
+        return seq;
+    }
+
+    autoSave() {
+        const answers = this.collectAnswers();
         
         // Save to localStorage as backup
         const testId = document.getElementById('testId').value;
         localStorage.setItem(`test_${testId}_answers`, JSON.stringify(answers));
         
-        console.log('Answers auto-saved');
+        if (this.saveInFlight) {
+            return;
+        }
+        
+        // Send only the questions that changed since the last acknowledged save
+        const patches = Object.entries(answers)
+            .filter(([questionId, answer]) => this.savedAnswers[questionId] !== answer)
+            .map(([questionId, answer]) => ({ question_id: questionId, answer, seq: this.nextSeq(questionId) }));
+        if (patches.length === 0) {
+            return;
+        }
+        
+        this.saveInFlight = true;
+        fetch(`/api/tests/${testId}/autosave`, {
+            method: 'PATCH',
+            headers: {
+                'Content-Type': 'application/json',
+                'Authorization': `Bearer ${localStorage.getItem('access_token')}`
+            },
+            body: JSON.stringify({ patches })
+        })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`Autosave failed with status ${response.status}`);
+            }
+            patches.forEach(patch => { this.savedAnswers[patch.question_id] = patch.answer; });
+            console.log('Answers auto-saved');
+        })
+        .catch(error => {
+            // Unacknowledged answers are resent on the next save
+            console.error('Error auto-saving answers:', error);
+        })
+        .finally(() => {
+            this.saveInFlight = false;
+        });
     }
 }
 
@@ -158,6 +213,13 @@ document.addEventListener('DOMContentLoaded', () => {
             e.returnValue = 'Are you sure you want to leave? Your progress may not be saved.';
         });
         
+        // Autosave shortly after each answer change
+        const form = document.getElementById('testForm');
+        if (form) {
+            form.addEventListener('change', () => timer.scheduleSave());
+            form.addEventListener('input', () => timer.scheduleSave());
+        }
+        
         // Store timer reference globally
         window.testTimer = timer;
     }
@@ -194,6 +256,7 @@ document.addEventListener('DOMContentLoaded', () => {
             // Stop timer
             if (window.testTimer) {
                 window.testTimer.stop();
+                clearTimeout(window.testTimer.saveTimeout);
             }
             
             // Collect answers
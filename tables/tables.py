@@ -47,6 +47,10 @@ class StudentUpdate(BaseModel):
     parent_name: Optional[str] = None
     parent_phone: Optional[str] = None
 
+class StudentCardAssignment(BaseModel):
+    student_id: str  # student code, e.g. STU2024001
+    card_id: Optional[str] = None  # None unassigns the student's card
+
 class StudentResponse(StudentBase):
     id: int
     user_id: int
@@ -245,10 +249,33 @@ class GradeResponse(GradeBase):
     student_id: int
     course_id: int
     date: date
+    excluded: bool = False
     
     class Config:
         from_attributes = True
 
+class LetterBand(BaseModel):
+    min_percentage: float = Field(..., ge=0, le=100)
+    letter: str = Field(..., min_length=1, max_length=5)
+
+class GradeTransformRequest(BaseModel):
+    operation: str  # scale, curve, cap, drop_lowest, reband
+    grade_type: Optional[str] = None
+    factor: Optional[float] = None  # scale: new % = old % * factor + offset
+    offset: Optional[float] = None
+    target_mean: Optional[float] = Field(None, ge=0, le=100)  # curve
+    cap_percentage: Optional[float] = Field(None, ge=0)  # cap
+    drop_count: Optional[int] = Field(None, ge=0)  # drop_lowest, per student; 0 restores dropped grades
+    bands: Optional[List[LetterBand]] = None  # letter boundaries, highest first
+    dry_run: bool = True
+
+class GradingPolicyWeight(BaseModel):
+    grade_type: str = Field(..., min_length=1, max_length=50)
+    weight: float = Field(..., ge=0)
+
+class GradingPolicyUpdate(BaseModel):
+    weights: List[GradingPolicyWeight]  # empty list removes the policy
+
 # Fee Schemas
 class FeeRecordBase(BaseModel):
     fee_type: str
@@ -275,6 +302,11 @@ class FeeRecordResponse(FeeRecordBase):
     class Config:
         from_attributes = True
 
+class FeePayment(BaseModel):
+    fee_id: int
+    amount: float = Field(..., gt=0)
+    payment_date: Optional[date] = None
+
 # Notice Schemas
 class NoticeBase(BaseModel):
     title: str
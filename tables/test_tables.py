@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
-from models.test_models import QuestionType
+from models.test_models import QuestionType, QuestionDifficulty
 
 class QuestionBase(BaseModel):
     question_text: str
@@ -35,8 +35,15 @@ class TestBase(BaseModel):
             raise ValueError('end_time must be after start_time')
         return v
 
+class SamplingRule(BaseModel):
+    count: int = Field(..., gt=0)
+    tags: List[str] = []  # a question must have all of them
+    difficulty: Optional[QuestionDifficulty] = None
+
 class TestCreate(TestBase):
-    questions: List[QuestionCreate]
+    questions: List[QuestionCreate] = []
+    # Draw each student's paper from the course question bank instead of fixed questions
+    sampling_rules: Optional[List[SamplingRule]] = None
 
 class TestUpdate(BaseModel):
     title: Optional[str] = None
@@ -51,6 +58,7 @@ class TestResponse(TestBase):
     id: int
     teacher_id: int
     total_points: float
+    sampling_rules: Optional[List[Dict[str, Any]]] = None
     is_active: bool
     created_at: datetime
     questions: List[QuestionResponse] = []
@@ -58,6 +66,12 @@ class TestResponse(TestBase):
     class Config:
         from_attributes = True
 
+class QuestionForStudent(QuestionBase):
+    id: int
+
+    class Config:
+        from_attributes = True
+
 class TestForStudent(BaseModel):
     id: int
     title: str
@@ -68,7 +82,7 @@ class TestForStudent(BaseModel):
     end_time: datetime
     duration: int
     total_points: float
-    questions: List[QuestionBase]  # No correct answers
+    questions: List[QuestionForStudent]  # No correct answers
     
     class Config:
         from_attributes = True
@@ -76,6 +90,14 @@ class TestForStudent(BaseModel):
 class TestSubmissionCreate(BaseModel):
     answers: Dict[str, Any]
 
+class AnswerPatch(BaseModel):
+    question_id: str
+    answer: Any = None
+    seq: int  # client sequence number; the highest seq per question wins
+
+class AnswerAutosave(BaseModel):
+    patches: List[AnswerPatch]
+
 class TestSubmissionResponse(BaseModel):
     id: int
     test_id: int
@@ -104,3 +126,26 @@ class TestResult(BaseModel):
     feedback: Optional[str]
     questions_correct: int
     total_questions: int
+
+class BankQuestionCreate(QuestionCreate):
+    course_id: int
+    difficulty: QuestionDifficulty = QuestionDifficulty.MEDIUM
+    tags: List[str] = []
+
+class BankQuestionUpdate(BaseModel):
+    question_text: Optional[str] = None
+    options: Optional[List[str]] = None
+    correct_answer: Optional[str] = None
+    points: Optional[float] = None
+    difficulty: Optional[QuestionDifficulty] = None
+    tags: Optional[List[str]] = None
+    is_active: Optional[bool] = None
+
+class BankQuestionResponse(BankQuestionCreate):
+    id: int
+    teacher_id: Optional[int]
+    is_active: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
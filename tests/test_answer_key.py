@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+from models.test_models import QuestionType
+from services.test_grading_service import build_answer_key, score_answers
+
+def _question(id, question_type, correct_answer, points=1.0, options=None):
+    return SimpleNamespace(id=id, question_type=question_type, correct_answer=correct_answer,
+                           points=points, options=options)
+
+def test_score_answers_normalizes_and_skips_essays():
+    test = SimpleNamespace(total_points=6.0, questions=[
+        _question(1, QuestionType.MCQ, 'Paris', 2.0),
+        _question(2, QuestionType.TRUE_FALSE, 'True'),
+        _question(3, QuestionType.SHORT_ANSWER, ' photosynthesis '),
+        _question(4, QuestionType.ESSAY, None, 2.0)
+    ])
+    key = build_answer_key(test)
+
+    result = score_answers(key, {'1': ' paris', '2': 'false', '3': 'PHOTOSYNTHESIS', '4': 'long text', '99': 'x'})
+
+    assert result['score'] == 3.0
+    assert result['questions_correct'] == 2
+    assert result['percentage'] == 50.0
+    assert result['is_graded'] is False  # the essay still needs a teacher
+
+def test_score_answers_without_answers():
+    key = build_answer_key(SimpleNamespace(total_points=0.0, questions=[]))
+    assert score_answers(key, None) == {
+        'score': 0.0, 'max_score': 0.0, 'percentage': 0, 'is_graded': True, 'questions_correct': 0
+    }
+
+def test_drawn_paper_maps_positions_through_the_permutation():
+    bank = [
+        _question(10, QuestionType.MCQ, 'Mars', options=['Venus', 'Mars', 'Jupiter']),
+        _question(11, QuestionType.MCQ, 'Oxygen', 2.0, options=['Oxygen', 'Helium']),
+        _question(12, QuestionType.ESSAY, None, 5.0)
+    ]
+    key = build_answer_key(SimpleNamespace(total_points=0.0, sampling_rules=[{'count': 2}]), bank)
+    # Displayed as [Jupiter, Venus, Mars]; question 12 is not on this paper
+    paper = ([10, 11], [[2, 0, 1], [0, 1]])
+
+    result = score_answers(key, {'10': 2, '11': 'oxygen', '12': 'text'}, paper)
+
+    assert result['score'] == 3.0
+    assert result['max_score'] == 3.0
+    assert result['is_graded'] is True
+    assert score_answers(key, {'10': 1, '11': 5}, paper)['score'] == 0.0
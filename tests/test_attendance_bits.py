@@ -0,0 +1,32 @@
+import numpy as np
+from utils.attendance_bits import set_day, month_counts, decode_month, streaks, month_counts_array
+
+def test_month_encoding_round_trip():
+    bits = 0
+    for day, status in [(1, 'present'), (2, 'absent'), (3, 'late'), (31, 'present')]:
+        bits = set_day(bits, day, status)
+    bits = set_day(bits, 2, 'present')
+    bits = set_day(bits, 3, None)
+
+    calendar = decode_month(bits, 31)
+    assert calendar[:3] == ['present', 'present', None]
+    assert calendar[30] == 'present'
+    assert bits < 2 ** 63
+
+    counts = month_counts(bits)
+    assert (counts['present'], counts['absent'], counts['late'], counts['total']) == (3, 0, 0, 3)
+    assert month_counts_array(np.array([bits]))['present'].tolist() == [3]
+
+def test_streaks_skip_unrecorded_days():
+    september = set_day(set_day(set_day(0, 28, 'present'), 29, 'present'), 30, 'absent')
+    october = 0
+    for day in (1, 2, 5):  # 3rd and 4th are a weekend
+        october = set_day(october, day, 'present')
+
+    assert streaks([september, october], [30, 31]) == {'current': 3, 'longest': 3}
+    assert streaks([set_day(october, 6, 'late')], [31]) == {'current': 0, 'longest': 3}
+
+if __name__ == "__main__":
+    test_month_encoding_round_trip()
+    test_streaks_skip_unrecorded_days()
+    print("Attendance bitmap tests passed")
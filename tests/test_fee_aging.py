@@ -0,0 +1,31 @@
+import numpy as np
+from datetime import date
+from services.fee_analytics_service import compute_aging
+
+def test_aging_buckets_and_trend():
+    today = date(2026, 5, 1)
+    report = compute_aging(
+        grade=np.array(['9', '9', '9', '10', '10']),
+        section=np.array(['A', 'A', 'B', 'A', 'A']),
+        fee_type=np.array(['Tuition', 'Tuition', 'Lab', 'Tuition', 'Lab']),
+        due=np.array(['2026-04-21', '2026-02-15', '2026-01-01', '2026-04-01', '2026-06-01'], dtype='datetime64[D]'),
+        amount=np.array([100.0, 100.0, 50.0, 200.0, 80.0]),
+        paid=np.array([40.0, 0.0, 0.0, 200.0, 0.0]),
+        status=np.array(['partial', 'pending', 'overdue', 'paid', 'pending']),
+        today=today
+    )
+
+    # 10, 75 and 120 days overdue; paid and not-yet-due rows are not aged
+    assert report['totals']['aging'] == {'0-30': 60.0, '31-60': 0.0, '61-90': 100.0, '90+': 50.0}
+    assert report['totals']['outstanding'] == 290.0
+    assert report['status_counts'] == {'paid': 1, 'pending': 1, 'overdue': 3}
+
+    grade_9 = next(row for row in report['by_grade'] if row['grade_level'] == '9')
+    assert grade_9['overdue'] == 210.0 and grade_9['collection_rate'] == 16.0
+
+    assert [t['month'] for t in report['trend']] == ['2026-01', '2026-02', '2026-04']
+    assert report['trend'][-1]['collection_rate'] == 80.0
+
+if __name__ == "__main__":
+    test_aging_buckets_and_trend()
+    print("Fee aging tests passed")
@@ -0,0 +1,87 @@
+from datetime import date
+from services.fee_reconciliation_service import StatementMatcher, _parse_amount, line_key, parse_statement
+
+OPEN_FEES = [
+    # fee_id, student code, name, balance (oldest due first)
+    (1, 'S001', 'Asha Verma', 500.0),
+    (2, 'S001', 'Asha Verma', 500.0),
+    (3, 'S002', 'Rohan Mehta', 750.0),
+    (4, 'S003', 'Rohan Mehra', 750.0),
+]
+
+def line(amount, reference='', description=''):
+    return {'amount': amount, 'reference': reference, 'description': description, 'student_id': ''}
+
+def test_student_reference_takes_oldest_fee_once():
+    matcher = StatementMatcher(OPEN_FEES)
+
+    assert matcher.match(line(500, 'TUITION-S001'))['fee_id'] == 1
+    assert matcher.match(line(500, 'TUITION-S001'))['fee_id'] == 2
+    assert 'fee_id' not in matcher.match(line(500, 'TUITION-S001'))
+
+def test_partial_fee_reference_leaves_remaining_balance_matchable():
+    matcher = StatementMatcher(OPEN_FEES)
+
+    assert matcher.match(line(250, 'FEE-3'))['method'] == 'fee_reference'
+    assert matcher.match(line(500, 'S002 balance'))['fee_id'] == 3
+    # Fee 3 is now settled, so neither reference matches again
+    assert 'fee_id' not in matcher.match(line(500, 'FEE-3'))
+    assert 'fee_id' not in matcher.match(line(500, 'S002'))
+
+def test_name_fallback_needs_a_close_unique_name():
+    matcher = StatementMatcher(OPEN_FEES)
+
+    result = matcher.match(line(750, description='NEFT from ROHAN MEHTA fees'))
+    assert result['fee_id'] == 3 and result['method'] == 'name'
+
+    # A different first name is below the cutoff: reported with suggestions instead
+    result = matcher.match(line(750, description='NEFT ROHIT MEHRA'))
+    assert 'fee_id' not in result
+    assert result['suggestions'][0]['student_id'] == 'S003'
+    assert result['suggestions'][0]['fees'] == [{'fee_id': 4, 'balance': 750.0}]
+
+def test_parse_statement_header_aliases():
+    rows = list(parse_statement([
+        'Value Date,Narration,Ref No,Credit',
+        '05/03/2026,Fees Asha,FEE-1,"1,500.00"',
+        '',
+        '06/03/2026,Bad,,n/a'
+    ]))
+
+    assert rows[0][0] == 2 and rows[0][1]['amount'] == 1500.0 and rows[0][1]['reference'] == 'FEE-1'
+    assert rows[0][1]['date'].isoformat() == '2026-03-05'
+    assert rows[1][0] == 4 and rows[1][1]['amount'] is None
+
+def test_parse_amount_debit_formats_and_unreadable_amounts():
+    assert _parse_amount('1,500.00') == 1500.0
+    assert _parse_amount('Rs. 750') == 750.0
+    assert _parse_amount('500.00 Cr') == 500.0
+    # Debits in the usual bank notations are negative, so they are skipped
+    assert _parse_amount('-500') == -500.0
+    assert _parse_amount('(500.00)') == -500.0
+    assert _parse_amount('500.00 Dr') == -500.0
+    assert _parse_amount('500.00DR') == -500.0
+    # Anything that does not parse exactly is unreadable
+    assert _parse_amount('1.200,50') is None
+    assert _parse_amount('12-34') is None
+    assert _parse_amount('n/a') is None
+    assert _parse_amount('') is None
+
+def test_line_key_identifies_reimported_lines():
+    paid = dict(line(1000, ' utr 123 '), date=date(2026, 10, 1))
+
+    # Same reference, date and amount is the same line, whatever the narration
+    assert line_key(paid, 1) == line_key(dict(paid, reference='UTR 123', description='other'), 1)
+    assert line_key(paid, 1) != line_key(dict(paid, amount=999.99), 1)
+    assert line_key(paid, 1) != line_key(dict(paid, date=date(2026, 10, 2)), 1)
+    # Identical lines in one statement are told apart by their occurrence
+    assert line_key(paid, 1) != line_key(paid, 2)
+
+if __name__ == "__main__":
+    test_student_reference_takes_oldest_fee_once()
+    test_partial_fee_reference_leaves_remaining_balance_matchable()
+    test_name_fallback_needs_a_close_unique_name()
+    test_parse_statement_header_aliases()
+    test_parse_amount_debit_formats_and_unreadable_amounts()
+    test_line_key_identifies_reimported_lines()
+    print("Fee reconciliation tests passed")
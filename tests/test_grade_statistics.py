@@ -0,0 +1,34 @@
+import numpy as np
+from services.grade_statistics_service import GradeStatisticsService
+
+def test_grade_statistics():
+    student_ids = np.array([1, 1, 2, 2, 3, 3])
+    scores = np.array([9.0, 90.0, 7.0, 70.0, 5.0, 50.0])
+    max_scores = np.array([10.0, 100.0, 10.0, 100.0, 10.0, 100.0])
+
+    stats = GradeStatisticsService.compute(student_ids, scores, max_scores)
+
+    assert stats['total_grades'] == 6
+    assert stats['total_students'] == 3
+    assert stats['mean'] == 70.0
+    assert stats['median'] == 70.0
+    assert stats['grade_distribution'] == {'A': 2, 'B': 0, 'C': 2, 'D': 0, 'F': 2}
+    assert sum(stats['histogram']['counts']) == 6
+
+    students = stats['students']
+    assert [s['student_id'] for s in students] == [1, 2, 3]
+    assert [s['rank'] for s in students] == [1, 2, 3]
+    assert students[1]['z_score'] == 0.0
+    assert students[0]['z_score'] == -students[2]['z_score']
+
+def test_grade_statistics_ignores_zero_max_score():
+    stats = GradeStatisticsService.compute(
+        np.array([1]), np.array([5.0]), np.array([0.0])
+    )
+    assert stats['total_grades'] == 0
+    assert stats['students'] == []
+
+if __name__ == "__main__":
+    test_grade_statistics()
+    test_grade_statistics_ignores_zero_max_score()
+    print("Grade statistics tests passed")
@@ -0,0 +1,21 @@
+import numpy as np
+from services.grade_transform_service import GradeTransformService
+from utils.grading import percentage_to_letter, percentages_to_letters
+
+def test_drop_lowest_per_student():
+    student_ids = np.array([1, 2, 1, 1, 2, 3])
+    percentages = np.array([50.0, 40.0, 90.0, 70.0, 80.0, 10.0])
+
+    drop = GradeTransformService._lowest_per_student(student_ids, percentages, 1)
+
+    # Student 3 has a single grade, so nothing is dropped for them
+    assert drop.tolist() == [True, True, False, False, False, False]
+
+def test_vectorized_letters_match_scalar():
+    percentages = np.array([100.0, 93.0, 92.99, 80.0, 59.9, 0.0])
+    assert percentages_to_letters(percentages).tolist() == [percentage_to_letter(p) for p in percentages]
+
+if __name__ == "__main__":
+    test_drop_lowest_per_student()
+    test_vectorized_letters_match_scalar()
+    print("Grade transform tests passed")
@@ -0,0 +1,29 @@
+import numpy as np
+from services.test_item_analysis_service import compute_item_analysis
+
+def test_difficulty_discrimination_and_distractors():
+    # 4 students x 2 questions; q0 is an MCQ with options [a, b, c] (key a), q1 an essay
+    correct = np.array([[True, False], [True, False], [False, False], [False, False]])
+    answered = np.array([[True, True], [True, True], [True, False], [False, False]])
+    choices = np.array([[0, -1], [0, -1], [2, -1], [-1, -1]])
+    scores = np.array([9.0, 7.0, 3.0, 1.0])
+
+    report = compute_item_analysis(correct, answered, choices, [3, 0], np.array([True, False]), scores, 10.0)
+    mcq, essay = report['items']
+
+    assert mcq['difficulty'] == 0.5
+    assert mcq['discrimination'] == 1.0  # top student right, bottom student wrong
+    assert [o['count'] for o in mcq['options']] == [2, 0, 1]
+    assert mcq['other_or_blank'] == 1
+    assert essay['difficulty'] is None and essay['answered_rate'] == 0.5
+    assert 'options' not in essay
+
+    distribution = report['score_distribution']
+    assert distribution['mean'] == 50.0
+    assert distribution['histogram']['counts'][9] == 1  # 90%
+
+def test_no_submissions():
+    report = compute_item_analysis(np.zeros((0, 1), bool), np.zeros((0, 1), bool), np.zeros((0, 1), np.int64),
+                                   [2], np.array([True]), np.zeros(0), 5.0)
+    assert report['score_distribution']['count'] == 0
+    assert report['items'][0]['options'][0]['count'] == 0
@@ -0,0 +1,33 @@
+import numpy as np
+from utils import minhash
+
+ESSAY = ("The industrial revolution began in Britain in the late eighteenth century and spread "
+         "to Europe and North America, changing how goods were made, where people lived and "
+         "how they worked, as steam power and factories replaced workshops and hand tools.")
+
+def _signature(text):
+    return minhash.signature(minhash.shingles(text))
+
+def test_shingles_ignore_case_and_punctuation():
+    assert minhash.shingles("One, two THREE four") == minhash.shingles("one two three four!")
+    assert minhash.shingles("one two three four") == {"one two three", "two three four"}
+    assert minhash.shingles("just two") == {"just two"}
+    assert minhash.shingles("  ") == set()
+    assert minhash.signature(set()) is None
+
+def test_similarity_estimates_jaccard():
+    edited = ESSAY.replace("late eighteenth", "middle of the eighteenth").replace("hand tools", "manual labour")
+    a, b = minhash.shingles(ESSAY), minhash.shingles(edited)
+    jaccard = len(a & b) / len(a | b)
+    estimate = minhash.similarity(minhash.signature(a), minhash.signature(b))
+    assert abs(estimate - jaccard) < 0.15
+    assert minhash.similarity(_signature(ESSAY), _signature(ESSAY)) == 1.0
+    assert minhash.similarity(_signature(ESSAY), _signature("Photosynthesis turns light into sugar in plants")) < 0.1
+
+def test_band_keys_are_stable_and_shared_by_near_duplicates():
+    signature = _signature(ESSAY)
+    assert len(minhash.band_keys(signature)) == minhash.BANDS
+    assert np.array_equal(minhash.from_bytes(minhash.to_bytes(signature)), signature)
+
+    near = _signature(ESSAY.replace("Britain", "England"))
+    assert set(enumerate(minhash.band_keys(signature))) & set(enumerate(minhash.band_keys(near)))
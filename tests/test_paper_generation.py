@@ -0,0 +1,32 @@
+import pytest
+from models.test_models import QuestionType
+from services.paper_generation_service import PoolQuestion, assign_rule_candidates, draw_paper
+
+def _pool():
+    pool = []
+    for i in range(1, 13):
+        difficulty = 'hard' if i > 8 else 'easy'
+        tags = frozenset({'algebra'} if i % 2 else {'geometry'})
+        pool.append(PoolQuestion(i, QuestionType.MCQ, 4, difficulty, tags, 1.0))
+    return pool
+
+def test_specific_rules_get_their_questions_first():
+    rules = [{'count': 4}, {'count': 2, 'tags': ['Algebra'], 'difficulty': 'hard'}]
+    broad, narrow = assign_rule_candidates(_pool(), rules)
+    assert narrow == [9, 11]
+    assert not set(broad) & set(narrow)
+
+def test_rule_without_enough_questions_is_rejected():
+    with pytest.raises(ValueError):
+        assign_rule_candidates(_pool(), [{'count': 3, 'tags': ['geometry'], 'difficulty': 'hard'}])
+
+def test_draw_is_seeded_per_student():
+    candidates = assign_rule_candidates(_pool(), [{'count': 5}])
+    option_counts = {q.id: q.option_count for q in _pool()}
+    first = draw_paper(42, 7, candidates, [5], option_counts)
+    assert first == draw_paper(42, 7, candidates, [5], option_counts)
+    assert first != draw_paper(42, 8, candidates, [5], option_counts)
+
+    question_ids, option_orders = first
+    assert len(set(question_ids)) == 5
+    assert all(sorted(order) == [0, 1, 2, 3] for order in option_orders)
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import tempfile
+import pytest
+from fastapi import HTTPException
+from utils.uploads import content_type, receive_form, safe_filename, sniff_type
+
+def test_sniff_known_signatures():
+    assert sniff_type(b"%PDF-1.7\n") == "application/pdf"
+    assert sniff_type(b"\x00\x00\x00\x18ftypmp42") == "video/mp4"
+    assert sniff_type(b"RIFF\x00\x00\x00\x00AVI LIST") == "video/x-msvideo"
+    assert sniff_type(b"RIFF\x00\x00\x00\x00WAVEfmt ") is None
+    assert sniff_type(b"plain text") is None
+
+def test_content_must_match_extension():
+    assert content_type("docx", b"PK\x03\x04rest") == \
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    with pytest.raises(HTTPException):
+        content_type("pdf", b"MZ\x90\x00")
+    with pytest.raises(HTTPException):
+        content_type("txt", b"\x7fELF")
+    assert content_type("txt", b"notes") == "text/plain"
+
+def test_safe_filename_drops_directories():
+    assert safe_filename("../../etc/passwd") == "passwd"
+    assert safe_filename("C:\\Users\\me\\essay.docx") == "essay.docx"
+    assert safe_filename("") == "upload"
+
+BOUNDARY = "testboundary"
+
+class _StreamedRequest:
+    """Just enough of a Request for receive_form: headers and a chunked body"""
+
+    def __init__(self, body: bytes, chunk_size: int = 1024, content_length: bool = False):
+        self.headers = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+        if content_length:
+            self.headers["content-length"] = str(len(body))
+        self.body = body
+        self.chunk_size = chunk_size
+        self.sent = 0
+
+    async def stream(self):
+        for start in range(0, len(self.body), self.chunk_size):
+            chunk = self.body[start:start + self.chunk_size]
+            self.sent += len(chunk)
+            yield chunk
+
+def _multipart(filename: str, data: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+def _receive(request, upload_dir: str, max_size: int, allowed_extensions=None):
+    async def run():
+        async with receive_form(request, upload_dir, max_size, allowed_extensions) as form:
+            return form.file.size
+    return asyncio.run(run())
+
+def test_oversized_stream_is_cut_off_early():
+    with tempfile.TemporaryDirectory() as upload_dir:
+        request = _StreamedRequest(_multipart("notes.pdf", b"%PDF-" + b"x" * 100_000))
+        with pytest.raises(HTTPException) as error:
+            _receive(request, upload_dir, max_size=10_000)
+        assert error.value.status_code == 413
+        assert request.sent < 20_000
+        assert os.listdir(upload_dir) == []
+
+def test_disallowed_extension_is_rejected_before_file_data():
+    with tempfile.TemporaryDirectory() as upload_dir:
+        request = _StreamedRequest(_multipart("setup.exe", b"MZ" + b"x" * 100_000))
+        with pytest.raises(HTTPException) as error:
+            _receive(request, upload_dir, max_size=1_000_000, allowed_extensions=["pdf", "docx"])
+        assert error.value.status_code == 400
+        assert request.sent <= 1024
+        assert os.listdir(upload_dir) == []
+
+def test_allowed_upload_is_received():
+    with tempfile.TemporaryDirectory() as upload_dir:
+        request = _StreamedRequest(_multipart("notes.pdf", b"%PDF-" + b"x" * 5_000))
+        assert _receive(request, upload_dir, max_size=10_000, allowed_extensions=["pdf"]) == 5_005
+        assert os.listdir(upload_dir) == []
@@ -0,0 +1,87 @@
+"""2-bit-per-day attendance encoding.
+
+A month of attendance for one (student, course) is packed into a single
+integer: day d (1-based) occupies bits 2*(d-1) and 2*(d-1)+1. 31 days use
+62 bits, so a month fits in a signed 64-bit column.
+"""
+from typing import Dict, List, Optional
+import numpy as np
+
+NOT_RECORDED = 0
+STATUS_CODES = {'present': 1, 'absent': 2, 'late': 3}
+CODE_STATUSES = {code: status for status, code in STATUS_CODES.items()}
+
+# Low bit of every 2-bit day slot (days 1..31)
+LOW_BITS = int('01' * 31, 2)
+
+def day_shift(day: int) -> int:
+    return 2 * (day - 1)
+
+def day_mask(day: int) -> int:
+    return 3 << day_shift(day)
+
+def set_day(bits: int, day: int, status: Optional[str]) -> int:
+    """Return bits with the given day's slot set to status (None clears it)"""
+    code = STATUS_CODES.get(status, NOT_RECORDED)
+    return (bits & ~day_mask(day)) | (code << day_shift(day))
+
+def day_sets(bits: int) -> Dict[str, int]:
+    """Split packed bits into one-bit-per-slot sets for each status.
+
+    Each returned value has bit 2*(d-1) set when day d has that status.
+    """
+    low = bits & LOW_BITS
+    high = (bits >> 1) & LOW_BITS
+    return {
+        'present': low & ~high,
+        'absent': high & ~low,
+        'late': low & high,
+        'recorded': low | high
+    }
+
+def month_counts(bits: int) -> Dict:
+    """Present/absent/late/total counts and percentage via popcounts"""
+    sets = day_sets(bits)
+    counts = {status: sets[status].bit_count() for status in STATUS_CODES}
+    total = sets['recorded'].bit_count()
+    counts['total'] = total
+    counts['percentage'] = round(counts['present'] / total * 100, 2) if total else 0.0
+    return counts
+
+def decode_month(bits: int, days_in_month: int) -> List[Optional[str]]:
+    """Per-day statuses (None when nothing was recorded) for a calendar view"""
+    return [CODE_STATUSES.get((bits >> day_shift(day)) & 3) for day in range(1, days_in_month + 1)]
+
+def streaks(months: List[int], days_in_months: List[int]) -> Dict[str, int]:
+    """Current and longest run of consecutive recorded days marked present.
+
+    months are packed bitmaps in chronological order; days without a record
+    (weekends, holidays) neither extend nor break a streak.
+    """
+    current = longest = 0
+    for bits, days in zip(months, days_in_months):
+        sets = day_sets(bits)
+        recorded, present = sets['recorded'], sets['present']
+        while recorded:
+            slot = recorded & -recorded  # lowest recorded day
+            current = current + 1 if present & slot else 0
+            longest = max(longest, current)
+            recorded ^= slot
+    return {'current': current, 'longest': longest}
+
+def popcount_array(values: np.ndarray) -> np.ndarray:
+    """Vectorized popcount of an int64 array"""
+    as_bytes = np.ascontiguousarray(values, dtype=np.int64).view(np.uint8)
+    return np.unpackbits(as_bytes).reshape(-1, 64).sum(axis=1)
+
+def month_counts_array(bits: np.ndarray) -> Dict[str, np.ndarray]:
+    """month_counts over an array of packed months"""
+    bits = np.asarray(bits, dtype=np.int64)
+    low = bits & LOW_BITS
+    high = (bits >> 1) & LOW_BITS
+    return {
+        'present': popcount_array(low & ~high),
+        'absent': popcount_array(high & ~low),
+        'late': popcount_array(low & high),
+        'total': popcount_array(low | high)
+    }
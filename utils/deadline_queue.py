@@ -0,0 +1,112 @@
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+from datetime import date, datetime, time, timedelta, timezone
+import heapq
+import itertools
+import threading
+
+def local_midnight_after(day: date) -> datetime:
+    """UTC (naive) instant at which a date-only deadline has passed locally"""
+    midnight = datetime.combine(day + timedelta(days=1), time.min)
+    return midnight.astimezone(timezone.utc).replace(tzinfo=None)
+
+class DeadlineQueue:
+    """Min-heap of upcoming (kind, key) deadlines in naive UTC.
+
+    Rescheduling or cancelling only updates the _current map; superseded
+    heap entries are skipped when they surface (lazy deletion), so edits
+    are O(log n). Only the window up to the loaded horizon is held in
+    memory; later deadlines are picked up when the runner extends it.
+    Repositories call schedule()/cancel() from request handlers and worker
+    threads, so state is guarded by a lock and the runner is woken through
+    a thread-safe callback. Fired deadlines are remembered until
+    forget_fired() so that reloading a window that overlaps them does not
+    fire them twice.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[datetime, int, str, Hashable]] = []
+        self._current: Dict[Tuple[str, Hashable], datetime] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[Callable[[], None]] = None
+        self._horizon: Optional[datetime] = None
+        self._fired: Set[Tuple[str, Hashable, datetime]] = set()
+
+    def start(self, wakeup: Callable[[], None]):
+        self._wakeup = wakeup
+
+    def stop(self):
+        with self._lock:
+            self._wakeup = None
+            self._heap, self._current, self._horizon = [], {}, None
+            self._fired = set()
+
+    @property
+    def active(self) -> bool:
+        return self._wakeup is not None
+
+    def set_horizon(self, horizon: datetime):
+        with self._lock:
+            self._horizon = horizon
+
+    def schedule(self, kind: str, key: Hashable, when: datetime):
+        """Add or move a deadline; a no-op until the runner has started"""
+        if not self.active or when is None:
+            return
+        with self._lock:
+            if self._horizon is not None and when > self._horizon:
+                # Outside the loaded window; the next refill will load it
+                self._current.pop((kind, key), None)
+                return
+            if self._current.get((kind, key)) == when or (kind, key, when) in self._fired:
+                return
+            self._current[(kind, key)] = when
+            heapq.heappush(self._heap, (when, next(self._seq), kind, key))
+            earliest = self._heap[0][0] == when
+        if earliest and self._wakeup:
+            self._wakeup()
+
+    def cancel(self, kind: str, key: Hashable):
+        with self._lock:
+            self._current.pop((kind, key), None)
+
+    def pop_due(self, now: datetime) -> List[Tuple[str, Hashable, datetime]]:
+        """Remove and return every live deadline at or before `now`"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                when, _, kind, key = heapq.heappop(self._heap)
+                if self._current.get((kind, key)) == when:
+                    del self._current[(kind, key)]
+                    self._fired.add((kind, key, when))
+                    due.append((kind, key, when))
+        return due
+
+    def forget_fired(self, before: datetime):
+        """Drop fired deadlines at or before `before`; no reload reaches them"""
+        with self._lock:
+            self._fired = {fired for fired in self._fired if fired[2] > before}
+
+    def next_deadline(self) -> Optional[datetime]:
+        with self._lock:
+            while self._heap:
+                when, _, kind, key = self._heap[0]
+                if self._current.get((kind, key)) == when:
+                    return when
+                heapq.heappop(self._heap)
+        return None
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            counts = {}
+            for kind, _ in self._current:
+                counts[kind] = counts.get(kind, 0) + 1
+            return {
+                'pending': len(self._current),
+                'by_kind': counts,
+                'heap_entries': len(self._heap),
+                'fired': len(self._fired),
+                'horizon': self._horizon
+            }
+
+deadlines = DeadlineQueue()
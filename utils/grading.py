@@ -0,0 +1,42 @@
+from typing import List, Tuple, Optional
+import numpy as np
+
+# (minimum percentage, letter) pairs, highest band first
+DEFAULT_LETTER_BANDS: List[Tuple[float, str]] = [
+    (93, 'A'), (90, 'A-'),
+    (87, 'B+'), (83, 'B'), (80, 'B-'),
+    (77, 'C+'), (73, 'C'), (70, 'C-'),
+    (60, 'D'), (0, 'F')
+]
+
+GRADE_POINTS = {
+    'A+': 4.0, 'A': 4.0, 'A-': 3.7,
+    'B+': 3.3, 'B': 3.0, 'B-': 2.7,
+    'C+': 2.3, 'C': 2.0, 'C-': 1.7,
+    'D': 1.0, 'F': 0.0
+}
+
+def percentage_to_letter(percentage: float,
+                         bands: Optional[List[Tuple[float, str]]] = None) -> str:
+    """Convert a percentage to a letter grade using (minimum, letter) bands"""
+    for minimum, letter in bands or DEFAULT_LETTER_BANDS:
+        if percentage >= minimum:
+            return letter
+    return (bands or DEFAULT_LETTER_BANDS)[-1][1]
+
+def percentages_to_letters(percentages: np.ndarray,
+                           bands: Optional[List[Tuple[float, str]]] = None) -> np.ndarray:
+    """Vectorized percentage_to_letter over an array of percentages"""
+    ordered = sorted(bands or DEFAULT_LETTER_BANDS)
+    minimums = np.array([minimum for minimum, _ in ordered])
+    letters = np.array([letter for _, letter in ordered], dtype=object)
+    index = np.searchsorted(minimums, percentages, side='right') - 1
+    return letters[np.clip(index, 0, None)]
+
+def percentage_to_points(percentage: float) -> float:
+    """Convert a percentage to 4.0-scale grade points"""
+    return GRADE_POINTS[percentage_to_letter(percentage)]
+
+def grade_type_key(grade_type: Optional[str]) -> str:
+    """Normalize a grade type for policy matching ('Midterm ' -> 'midterm')"""
+    return (grade_type or '').strip().lower()
@@ -0,0 +1,79 @@
+"""MinHash signatures and LSH banding for near-duplicate text.
+
+Text is lowercased, split into word tokens and turned into overlapping
+word k-shingles. Each shingle is hashed to 32 bits and run through
+NUM_PERM universal hash functions h(x) = (a*x + b) mod P; the signature
+is the minimum of each function over the shingles. Two signatures agree
+in a position with probability equal to the Jaccard similarity of the
+shingle sets.
+
+For lookup the signature is cut into BANDS bands of ROWS rows and each
+band is hashed to a bucket key; documents sharing any bucket are
+candidate pairs. With 32 bands of 4 rows a pair is likely to become a
+candidate from a similarity of about (1/32)^(1/4) = 0.42 upwards.
+
+The hash parameters are derived from fixed strings, so signatures stay
+comparable across processes and restarts. Changing NUM_PERM, the
+shingle size or the banding makes stored signatures incomparable.
+"""
+from typing import Iterable, List, Optional, Set
+import hashlib
+import re
+import zlib
+import numpy as np
+
+SHINGLE_SIZE = 3  # words per shingle
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+PRIME = 4294967291  # largest prime below 2**32, so (a*x + b) fits in uint64
+CHUNK = 4096  # shingles hashed per block, bounds the (n, NUM_PERM) matrix
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def _parameter(name: str, i: int) -> int:
+    digest = hashlib.blake2b(f"minhash:{name}:{i}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % (PRIME - 1) + 1
+
+_A = np.array([_parameter('a', i) for i in range(NUM_PERM)], dtype=np.uint64)
+_B = np.array([_parameter('b', i) for i in range(NUM_PERM)], dtype=np.uint64)
+
+def shingles(text: Optional[str], size: int = SHINGLE_SIZE) -> Set[str]:
+    """Word shingles of text; a text shorter than size is one shingle"""
+    tokens = _TOKEN.findall((text or '').lower())
+    if not tokens:
+        return set()
+    if len(tokens) < size:
+        return {' '.join(tokens)}
+    return {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+def signature(items: Iterable[str]) -> Optional[np.ndarray]:
+    """MinHash signature (NUM_PERM uint32 values) of a shingle set, None if empty"""
+    hashes = np.fromiter((zlib.crc32(item.encode()) for item in items), dtype=np.uint64)
+    if not hashes.size:
+        return None
+    hashes %= np.uint64(PRIME)
+    result = np.full(NUM_PERM, PRIME, dtype=np.uint64)
+    for start in range(0, hashes.size, CHUNK):
+        block = hashes[start:start + CHUNK, None]
+        np.minimum(result, ((block * _A + _B) % np.uint64(PRIME)).min(axis=0), out=result)
+    return result.astype(np.uint32)
+
+def band_keys(sig: np.ndarray) -> List[int]:
+    """Signed 64-bit bucket key of each band, in band order"""
+    data = sig.astype('<u4')
+    return [
+        int.from_bytes(hashlib.blake2b(data[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest(),
+                       'little', signed=True)
+        for band in range(BANDS)
+    ]
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+def to_bytes(sig: np.ndarray) -> bytes:
+    return sig.astype('<u4').tobytes()
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype='<u4')
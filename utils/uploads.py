@@ -0,0 +1,318 @@
+"""Streaming multipart uploads.
+
+FastAPI's File()/Form() parameters spool the whole request body into a
+temporary file before the endpoint runs, so an oversized upload is only
+rejected after it has been received, and copying it to its destination
+then blocks the event loop. receive_form() instead parses the multipart
+body as it arrives: the file part is written straight to a temporary file
+next to its destination with async writes, hashed (SHA-256) and sniffed
+for its real type on the way, and the request is cut off as soon as it
+goes over the size limit. The endpoint then hands the file to the blob
+store, which moves it into place with an atomic rename, or it is deleted
+when the request fails.
+
+    async with receive_form(request, f"{settings.UPLOAD_DIR}/notes", settings.MAX_FILE_SIZE) as form:
+        course_id = form.require_int("course_id")
+        ...
+        file_path = BlobService.store(db, form.file)
+"""
+from fastapi import HTTPException, Request
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+import asyncio
+import hashlib
+import mimetypes
+import os
+import tempfile
+import aiofiles
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+SNIFF_BYTES = 2048  # leading bytes kept for type detection
+MAX_FIELD_BYTES = 1024 * 1024  # all non-file fields together
+FORM_OVERHEAD = 64 * 1024  # Content-Length allowance for boundaries and fields
+
+# (offset, magic bytes, detected type); first match wins
+SIGNATURES = [
+    (0, b'%PDF-', 'application/pdf'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),  # .doc/.xls/.ppt
+    (0, b'PK\x03\x04', 'application/zip'),  # .docx/.xlsx/.pptx containers
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'GIF8', 'image/gif'),
+    (4, b'ftypqt', 'video/quicktime'),
+    (4, b'ftyp', 'video/mp4'),
+    (4, b'moov', 'video/quicktime'),
+    (4, b'mdat', 'video/quicktime'),
+    (4, b'wide', 'video/quicktime'),
+    (8, b'AVI ', 'video/x-msvideo'),
+    (0, b'\x1aE\xdf\xa3', 'video/x-matroska'),
+    (0, b'FLV', 'video/x-flv'),
+    (0, b'0&\xb2u\x8ef\xcf\x11', 'video/x-ms-asf'),
+    (0, b'MZ', 'application/x-msdownload'),
+    (0, b'\x7fELF', 'application/x-executable'),
+]
+EXECUTABLE_TYPES = {'application/x-msdownload', 'application/x-executable'}
+
+# extension -> (detected types accepted for it, stored MIME type)
+EXTENSION_TYPES = {
+    'pdf': ({'application/pdf'}, 'application/pdf'),
+    'doc': ({'application/x-ole-storage'}, 'application/msword'),
+    'docx': ({'application/zip'}, 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    'jpg': ({'image/jpeg'}, 'image/jpeg'),
+    'jpeg': ({'image/jpeg'}, 'image/jpeg'),
+    'png': ({'image/png'}, 'image/png'),
+    'mp4': ({'video/mp4', 'video/quicktime'}, 'video/mp4'),
+    'mov': ({'video/quicktime', 'video/mp4'}, 'video/quicktime'),
+    'avi': ({'video/x-msvideo'}, 'video/x-msvideo'),
+    'mkv': ({'video/x-matroska'}, 'video/x-matroska'),
+    'flv': ({'video/x-flv'}, 'video/x-flv'),
+    'wmv': ({'video/x-ms-asf'}, 'video/x-ms-wmv'),
+}
+
+def sniff_type(head: bytes) -> Optional[str]:
+    """Type detected from a file's leading bytes, None if unrecognised"""
+    if head.startswith(b'RIFF') and head[8:12] != b'AVI ':
+        return None
+    for offset, magic, detected in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return detected
+    return None
+
+def content_type(extension: str, head: bytes) -> str:
+    """MIME type to store for a file; HTTP 400 when its content contradicts its extension"""
+    detected = sniff_type(head)
+    if extension in EXTENSION_TYPES:
+        accepted, mime_type = EXTENSION_TYPES[extension]
+        if detected not in accepted:
+            raise HTTPException(status_code=400, detail=f"File content does not match its .{extension} extension")
+        return mime_type
+    if detected in EXECUTABLE_TYPES:
+        raise HTTPException(status_code=400, detail="File type not allowed")
+    return detected or mimetypes.guess_type(f"x.{extension}")[0] or 'application/octet-stream'
+
+def file_extension(filename: str) -> str:
+    return os.path.splitext(filename)[1].lower().replace('.', '')
+
+def file_sha256(file_path: str) -> Optional[str]:
+    """SHA-256 of a file already on disk, None if it cannot be read"""
+    try:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except OSError:
+        return None
+
+def safe_filename(filename: str) -> str:
+    """Client file name without any directory part"""
+    return os.path.basename(filename.replace('\\', '/')).strip() or 'upload'
+
+class ReceivedFile:
+    """An uploaded file held in a temporary file until save()"""
+
+    def __init__(self, field_name: str, filename: str, temp_path: str):
+        self.field_name = field_name
+        self.filename = filename
+        self.extension = file_extension(filename)
+        self.temp_path = temp_path
+        self.size = 0
+        self.sha256: Optional[str] = None
+        self.mime_type: Optional[str] = None
+        self.path: Optional[str] = None
+
+    def save(self, path: str) -> str:
+        """Atomically move the upload to path (same filesystem as the temp file)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.temp_path, path)
+        self.path = path
+        return path
+
+    def discard(self):
+        if self.path is None and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+class UploadForm:
+    """Text fields and the (at most one) file of a streamed multipart form"""
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.file: Optional[ReceivedFile] = None
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self.fields.get(name, default)
+
+    def require(self, name: str) -> str:
+        value = self.fields.get(name)
+        if value is None:
+            raise HTTPException(status_code=422, detail=f"Form field '{name}' is required")
+        return value
+
+    def require_int(self, name: str) -> int:
+        try:
+            return int(self.require(name))
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Form field '{name}' must be an integer")
+
+class _Part:
+    def __init__(self):
+        self.headers: Dict[bytes, bytes] = {}
+        self.name: Optional[str] = None
+        self.data = bytearray()
+        self.file: Optional[ReceivedFile] = None
+        self.skip = False
+
+class _FormReceiver:
+    """Parser callbacks only record events; the events are applied after
+    each chunk so file data can be written with async I/O"""
+
+    def __init__(self, boundary: bytes, upload_dir: str, max_size: int,
+                 allowed_extensions: Optional[Sequence[str]], file_field: str):
+        self.upload_dir = upload_dir
+        self.max_size = max_size
+        self.allowed_extensions = allowed_extensions
+        self.file_field = file_field
+        self.form = UploadForm()
+        self.events: List[tuple] = []
+        self.header_field = b''
+        self.header_value = b''
+        self.part = _Part()
+        self.out = None
+        self.digest = hashlib.sha256()
+        self.head = bytearray()
+        self.field_bytes = 0
+        self.parser = MultipartParser(boundary, {
+            'on_part_begin': lambda: self.events.append(('begin',)),
+            'on_header_field': self._on_header_field,
+            'on_header_value': self._on_header_value,
+            'on_header_end': self._on_header_end,
+            'on_headers_finished': lambda: self.events.append(('headers_finished',)),
+            'on_part_data': lambda data, start, end: self.events.append(('data', data[start:end])),
+            'on_part_end': lambda: self.events.append(('end',)),
+        })
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def _on_header_end(self):
+        self.events.append(('header', self.header_field.lower(), self.header_value))
+        self.header_field = self.header_value = b''
+
+    async def feed(self, chunk: bytes):
+        self.parser.write(chunk)
+        events, self.events = self.events, []
+        for event in events:
+            if event[0] == 'begin':
+                self.part = _Part()
+            elif event[0] == 'header':
+                self.part.headers[event[1]] = event[2]
+            elif event[0] == 'headers_finished':
+                await self._start_part()
+            elif event[0] == 'data':
+                await self._part_data(event[1])
+            elif event[0] == 'end':
+                await self._end_part()
+
+    async def _start_part(self):
+        part = self.part
+        _, options = parse_options_header(part.headers.get(b'content-disposition', b''))
+        part.name = options.get(b'name', b'').decode('utf-8', errors='replace')
+        if b'filename' not in options:
+            return
+        if not options[b'filename']:
+            # Browsers send an empty part for a file input left blank
+            part.skip = True
+            return
+        if part.name != self.file_field or self.form.file is not None:
+            raise HTTPException(status_code=400, detail="Unexpected file in upload")
+
+        filename = safe_filename(options[b'filename'].decode('utf-8', errors='replace'))
+        if self.allowed_extensions is not None and file_extension(filename) not in self.allowed_extensions:
+            raise HTTPException(status_code=400, detail="File type not allowed")
+        fd, temp_path = tempfile.mkstemp(dir=self.upload_dir, prefix='.upload-')
+        os.close(fd)
+        part.file = self.form.file = ReceivedFile(part.name, filename, temp_path)
+        self.out = await aiofiles.open(temp_path, 'wb')
+
+    async def _part_data(self, data: bytes):
+        part = self.part
+        if part.skip:
+            return
+        if part.file is None:
+            self.field_bytes += len(data)
+            if self.field_bytes > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail="Form fields too large")
+            part.data.extend(data)
+            return
+
+        part.file.size += len(data)
+        if part.file.size > self.max_size:
+            raise HTTPException(status_code=413, detail="File too large")
+        if len(self.head) < SNIFF_BYTES:
+            self.head.extend(data[:SNIFF_BYTES - len(self.head)])
+        self.digest.update(data)
+        await self.out.write(data)
+
+    async def _end_part(self):
+        part = self.part
+        if part.skip:
+            return
+        if part.file is None:
+            self.form.fields[part.name] = part.data.decode('utf-8', errors='replace')
+            return
+
+        part.file.sha256 = self.digest.hexdigest()
+        part.file.mime_type = content_type(part.file.extension, bytes(self.head))
+        await self.out.flush()
+        await asyncio.to_thread(os.fsync, self.out.fileno())
+        await self.close()
+
+    async def close(self):
+        if self.out is not None:
+            out, self.out = self.out, None
+            await out.close()
+
+@asynccontextmanager
+async def receive_form(request: Request, upload_dir: str, max_size: int,
+                       allowed_extensions: Optional[Sequence[str]] = None,
+                       file_field: str = "file", file_required: bool = True) -> AsyncIterator[UploadForm]:
+    """Stream a multipart form, writing its file field under upload_dir.
+
+    Raises HTTP 413 as soon as the file exceeds max_size (or up front from
+    Content-Length), 400 for a disallowed extension (checked before any
+    file data is read) or content that does not match it. The temporary
+    file is removed on exit unless the body saved it.
+    """
+    length = request.headers.get('content-length')
+    if length and length.isdigit() and int(length) > max_size + FORM_OVERHEAD:
+        raise HTTPException(status_code=413, detail="File too large")
+
+    mime, params = parse_options_header(request.headers.get('content-type', ''))
+    if mime != b'multipart/form-data' or b'boundary' not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    os.makedirs(upload_dir, exist_ok=True)
+    receiver = _FormReceiver(params[b'boundary'], upload_dir, max_size, allowed_extensions, file_field)
+    form = receiver.form
+    try:
+        try:
+            async for chunk in request.stream():
+                await receiver.feed(chunk)
+            receiver.parser.finalize()
+        except FormParserError:
+            raise HTTPException(status_code=400, detail="Malformed multipart upload")
+
+        if form.file is not None and form.file.sha256 is None:
+            raise HTTPException(status_code=400, detail="Incomplete upload")
+        if form.file is None and file_required:
+            raise HTTPException(status_code=422, detail=f"Form field '{file_field}' is required")
+
+        yield form
+    finally:
+        await receiver.close()
+        if form.file is not None:
+            form.file.discard()